@@ -6,8 +6,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import sqlite3
 import os
+from datetime import datetime
+
+from carga_producoes import CargaIncremental, categorizar, concatenar
+from snapshot_parquet import ler_manifesto, particoes, ler_particao, ler_snapshot
+from tendencia_consumo import consumo_por_componente, consumo_por_periodo
 
 # ================================================================
 # CONFIGURAÇÃO DA PÁGINA
@@ -75,10 +79,18 @@ h1, h2, h3 {
 # BANCO DE DADOS - CAMINHO RELATIVO (FUNCIONA NO STREAMLIT CLOUD)
 # ================================================================
 DB_PATH = "instance/producao.db"  # ✅ Caminho correto para o Streamlit Cloud
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "instance/snapshots")  # flask exportar-snapshot
+
+# Leitores analíticos usam o snapshot Parquet quando ele existe; o banco
+# transacional fica só como alternativa (carga incremental)
+USAR_SNAPSHOT = ler_manifesto(SNAPSHOT_DIR) is not None
 
 # Validação visual
-st.sidebar.info(f"🔍 Banco carregado de: `{DB_PATH}`")
-if not os.path.exists(DB_PATH):
+if USAR_SNAPSHOT:
+    st.sidebar.info(f"🔍 Snapshot carregado de: `{SNAPSHOT_DIR}`")
+else:
+    st.sidebar.info(f"🔍 Banco carregado de: `{DB_PATH}`")
+if not USAR_SNAPSHOT and not os.path.exists(DB_PATH):
     st.error("❌ Banco de dados não encontrado!")
     st.code(f"Verifique se o arquivo existe em:\n{os.path.abspath(DB_PATH)}", language="bash")
     st.stop()
@@ -86,43 +98,54 @@ if not os.path.exists(DB_PATH):
 # ================================================================
 # FUNÇÃO PRINCIPAL DE CARREGAMENTO DE DADOS
 # ================================================================
-@st.cache_data(ttl=60)
-def load_producoes_com_consumo():
+@st.cache_data
+def ler_particao_snapshot(caminho, mtime):
+    """Uma partição mensal do snapshot; só é relida quando o arquivo muda (mtime)."""
+    return categorizar(ler_particao(caminho))
+
+
+def load_snapshot():
+    """Histórico a partir do snapshot Parquet (sem tocar o banco transacional)."""
+    frames = [ler_particao_snapshot(caminho, mtime) for _, caminho, mtime in particoes(SNAPSHOT_DIR)]
+    if not frames:
+        return categorizar(ler_snapshot(SNAPSHOT_DIR))
+    return concatenar(frames).sort_values("data_producao", ascending=False, kind="stable")
+
+
+@st.cache_resource
+def obter_carga_snapshot(gerado_em):
     """
-    Carrega dados de produção com consumo de produtos químicos.
-    🔧 CORREÇÃO 2: Remove mapeamento de tipo_espuma (sistema usa texto direto)
+    Carga incremental que parte do snapshot: histórico do Parquet + produções
+    lançadas depois dele (acima da marca d'água) e cancelamentos, lidas do
+    banco a cada rerun. Recriada quando sai um snapshot novo (gerado_em).
     """
-    conn = sqlite3.connect(DB_PATH)
-    
-    # Query simplificada - tipo_espuma já vem como texto do banco
-    query = """
-    SELECT 
-        p.id AS producao_id_interno,
-        p.producao_id AS bloco,
-        p.data_producao,
-        p.tipo_espuma,  -- Já é texto, não precisa de mapeamento
-        p.cor,
-        p.altura,
-        p.conformidade,
-        p.observacoes,
-        c.nome AS componente,
-        cp.quantidade_usada
-    FROM producao p
-    LEFT JOIN componenteproducao cp ON p.id = cp.producao_id
-    LEFT JOIN componente c ON cp.componente_id = c.id
-    ORDER BY p.data_producao DESC
+    return CargaIncremental(DB_PATH).partir_do_snapshot(load_snapshot(), ler_manifesto(SNAPSHOT_DIR))
+
+
+def idade_snapshot(gerado_em):
+    """'gerado em AAAA-MM-DD HH:MM (há N h)' a partir do manifesto."""
+    try:
+        gerado = datetime.fromisoformat(gerado_em)
+    except (TypeError, ValueError):
+        return "gerado em data desconhecida"
+    horas = (datetime.now() - gerado).total_seconds() / 3600
+    idade = f"há {horas:.0f} h" if horas < 48 else f"há {horas / 24:.0f} dias"
+    return f"gerado em {gerado:%Y-%m-%d %H:%M} ({idade})"
+
+
+@st.cache_resource
+def obter_carga():
+    """Estado da carga incremental, compartilhado entre sessões e reruns."""
+    return CargaIncremental(DB_PATH)
+
+
+def load_producoes_com_consumo(forcar=False):
     """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    # 🔧 CORREÇÃO 3: Conversão de tipos
-    df["data_producao"] = pd.to_datetime(df["data_producao"],errors="coerce")
-    df["quantidade_usada"] = pd.to_numeric(df["quantidade_usada"], errors="coerce")
-    df["cor"] = df["cor"].astype(str)
-    df["altura"] = pd.to_numeric(df["altura"], errors="coerce")
-    df["tipo_espuma"] = df["tipo_espuma"].astype(str)  # Já é texto, mantém como está
-    
-    return df
+    Carrega dados de produção com consumo de produtos químicos.
+    Incremental: a cada rerun busca só produções novas (id > último lido) e
+    cancelamentos; a recarga completa só ocorre se o esquema mudar ou se pedida.
+    """
+    return obter_carga().atualizar(forcar=forcar)
 
 # ================================================================
 # TOPO – LOGO + TÍTULO
@@ -145,7 +168,28 @@ with col_title:
 # ================================================================
 # CARREGAR DADOS COM CONSUMO
 # ================================================================
-df_completo = load_producoes_com_consumo()
+recarregar = st.sidebar.button("🔄 Recarregar tudo", help="Descarta o cache e relê todo o histórico")
+if USAR_SNAPSHOT:
+    manifesto = ler_manifesto(SNAPSHOT_DIR)
+    if recarregar:
+        ler_particao_snapshot.clear()
+        obter_carga_snapshot.clear()
+    if os.path.exists(DB_PATH):
+        carga = obter_carga_snapshot(manifesto.get("gerado_em"))
+        df_completo = carga.atualizar()
+        st.sidebar.caption(f"Snapshot {idade_snapshot(manifesto.get('gerado_em'))} + produções novas do banco "
+                           f"(última carga: {carga.ultima_carga['tipo']}, {carga.ultima_carga['linhas']} linha(s))")
+    else:
+        # Só o snapshot (banco fora do alcance): avisa a idade dos dados
+        df_completo = load_snapshot()
+        st.sidebar.warning(f"Sem acesso ao banco: dados do snapshot {idade_snapshot(manifesto.get('gerado_em'))}")
+else:
+    df_completo = load_producoes_com_consumo(forcar=recarregar)
+    ultima_carga = obter_carga().ultima_carga
+    st.sidebar.caption(f"Última carga: {ultima_carga['tipo']} ({ultima_carga['linhas']} linha(s))")
+
+# Produções canceladas ficam fora das análises (como no /dashboard)
+df_completo = df_completo[df_completo["status"] != "C"]
 
 # 🔧 REMOVIDO: Debug temporário (descomente se precisar debugar)
 # st.write("Valores únicos em tipo_espuma:", df_completo["tipo_espuma"].unique().tolist())
@@ -234,6 +278,7 @@ if tipo_selecionado == "Todos":
     st.markdown("### 📊 Produção por Tipo de Espuma")
     df_tipo = df_filtrado["tipo_espuma"].value_counts().reset_index()
     df_tipo.columns = ["Tipo", "Quantidade"]
+    df_tipo = df_tipo[df_tipo["Quantidade"] > 0]  # categórica: value_counts lista categorias sem uso
     fig = px.bar(
         df_tipo,
         x="Tipo",
@@ -258,8 +303,7 @@ st.markdown("### 🧪 Consumo de Produtos Químicos")
 
 if not df_consumo_filtrado.empty:
     # Total por componente
-    consumo_total = df_consumo_filtrado.groupby("componente")["quantidade_usada"].sum().reset_index()
-    consumo_total = consumo_total.sort_values("quantidade_usada", ascending=False)
+    consumo_total = consumo_por_componente(df_consumo_filtrado)
 
     # Gráfico
     fig_consumo = px.bar(
@@ -312,23 +356,13 @@ if not df_consumo_filtrado.empty:
         key="agreg_consumo"
     )
     
-    # Criar cópia e adicionar coluna de período formatado como string
-    df_tempo = df_consumo_filtrado.copy()
-    
-    if periodo_agreg == "Dia":
-        df_tempo["periodo_str"] = df_tempo["data_producao"].dt.strftime("%d/%m/%Y")
-    elif periodo_agreg == "Semana":
-        df_tempo["periodo_str"] = df_tempo["data_producao"].dt.to_period("W").apply(lambda r: r.start_time.strftime("%d/%m/%Y"))
-    else:  # Mês
-        df_tempo["periodo_str"] = df_tempo["data_producao"].dt.to_period("M").apply(lambda r: r.start_time.strftime("%d/%m/%Y"))
-    
-    # Agregar consumo por período (string)
-    consumo_tempo_total = df_tempo.groupby("periodo_str")["quantidade_usada"].sum().reset_index()
+    # Início do período vetorizado + agrupamento por data/códigos (ordem cronológica)
+    consumo_tempo_total, consumo_tempo_det = consumo_por_periodo(df_consumo_filtrado, periodo_agreg)
     
     # Gráfico 1: Consumo total ao longo do tempo
     fig_tendencia = px.line(
         consumo_tempo_total,
-        x="periodo_str",
+        x="periodo",
         y="quantidade_usada",
         markers=True,
         title="Consumo Total de Produtos Químicos"
@@ -340,18 +374,16 @@ if not df_consumo_filtrado.empty:
         paper_bgcolor="white",
         plot_bgcolor="white",
         font_color="#2c3e50",
-        xaxis=dict(tickangle=-45)
+        xaxis=dict(tickangle=-45, tickformat="%d/%m/%Y")
     )
     st.plotly_chart(fig_tendencia, use_container_width=True)
     
     # Gráfico 2: Consumo por produto químico ao longo do tempo (empilhado)
     st.markdown("#### Consumo por Produto Químico")
-    consumo_tempo_det = df_tempo.groupby(["periodo_str", "componente"])["quantidade_usada"].sum().reset_index()
-    
-    if len(consumo_tempo_det["periodo_str"].unique()) > 1:
+    if consumo_tempo_det["periodo"].nunique() > 1:
         fig_tendencia_det = px.area(
             consumo_tempo_det,
-            x="periodo_str",
+            x="periodo",
             y="quantidade_usada",
             color="componente",
             title="Consumo por Produto Químico ao Longo do Tempo",
@@ -364,7 +396,7 @@ if not df_consumo_filtrado.empty:
             plot_bgcolor="white",
             font_color="#2c3e50",
             legend_title="Produto Químico",
-            xaxis=dict(tickangle=-45)
+            xaxis=dict(tickangle=-45, tickformat="%d/%m/%Y")
         )
         st.plotly_chart(fig_tendencia_det, use_container_width=True)
     else:
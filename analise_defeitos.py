@@ -0,0 +1,224 @@
+# analise_defeitos.py
+# -----------------------
+# Motor de previsão de defeitos da /analise_preditiva, no servidor:
+#   - a planilha de garantia é lida com pandas (só as colunas produto,
+#     grupo e defeito) e gravada em registro_garantia
+#   - frequencia_defeito guarda a contagem por (produto, grupo, defeito),
+#     somada por UPSERT a cada planilha: prever é uma busca pela chave
+#   - SHA-256 do arquivo: reenviar a mesma planilha não duplica o histórico
+#   - defeitos excluídos configuráveis (DEFEITOS_EXCLUIDOS), aplicados na
+#     consulta: mudar a lista não exige reagregar
+# -----------------------
+import hashlib
+import io
+import os
+import unicodedata
+
+import pandas as pd
+from sqlalchemy import func, insert, delete, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, PlanilhaGarantia, RegistroGarantia, FrequenciaDefeito
+
+DEFEITOS_EXCLUIDOS_PADRAO = ["(AUTORIZADA PELO DIRETOR)", "(AUTORIZADA POR IVO BARRETO)"]
+MAX_PREVISOES = 5
+LINHAS_POR_LOTE = 1000
+TAMANHOS = {"produto": 120, "grupo": 120, "defeito": 255}
+
+
+class ErroPlanilhaGarantia(Exception):
+    """Arquivo de garantia inválido (mensagem pronta para o usuário)."""
+
+
+def defeitos_excluidos_do_ambiente():
+    """DEFEITOS_EXCLUIDOS (separados por ';') ou a lista padrão."""
+    valor = os.environ.get("DEFEITOS_EXCLUIDOS")
+    if valor is None:
+        return list(DEFEITOS_EXCLUIDOS_PADRAO)
+    return [d.strip() for d in valor.split(";") if d.strip()]
+
+
+# -----------------------
+# Leitura da planilha
+# -----------------------
+def _campo(coluna):
+    """Campo (produto/grupo/defeito) de uma coluna do arquivo, pelo nome."""
+    nome = unicodedata.normalize("NFKD", str(coluna)).encode("ascii", "ignore").decode().lower()
+    if "produto" in nome:
+        return "produto"
+    if "grupo" in nome or "regiao" in nome:
+        return "grupo"
+    if "defeito" in nome or "motivo" in nome:
+        return "defeito"
+    return None
+
+
+def ler_planilha_garantia(conteudo, nome):
+    """DataFrame (produto, grupo, defeito) só com as linhas completas."""
+    extensao = os.path.splitext(nome.lower())[1]
+    colunas = lambda c: _campo(c) is not None  # noqa: E731  (só as 3 colunas vão para a memória)
+    try:
+        if extensao == ".csv":
+            try:
+                df = pd.read_csv(io.BytesIO(conteudo), sep=None, engine="python", dtype=str,
+                                 usecols=colunas, encoding="utf-8-sig")
+            except UnicodeDecodeError:
+                df = pd.read_csv(io.BytesIO(conteudo), sep=None, engine="python", dtype=str,
+                                 usecols=colunas, encoding="latin-1")
+        elif extensao in (".xlsx", ".xls"):
+            df = pd.read_excel(io.BytesIO(conteudo), sheet_name=0, dtype=str, usecols=colunas)
+        else:
+            raise ErroPlanilhaGarantia("Formato não suportado: envie um arquivo .xlsx, .xls ou .csv")
+    except ImportError:
+        raise ErroPlanilhaGarantia("Leitura de Excel indisponível no servidor — envie o arquivo em CSV.")
+    except (ValueError, pd.errors.ParserError) as e:
+        raise ErroPlanilhaGarantia(f"Não foi possível ler o arquivo: {e}")
+
+    renomear = {}
+    for coluna in df.columns:
+        campo = _campo(coluna)
+        if campo not in renomear.values():
+            renomear[coluna] = campo
+    if len(renomear) < len(TAMANHOS):
+        raise ErroPlanilhaGarantia("Arquivo deve conter colunas: produto, grupo, defeito")
+
+    df = df[list(renomear)].rename(columns=renomear)
+    for campo, tamanho in TAMANHOS.items():
+        df[campo] = df[campo].fillna("").str.strip().str[:tamanho]
+    df = df[(df != "").all(axis=1)].reset_index(drop=True)
+    if df.empty:
+        raise ErroPlanilhaGarantia("Nenhum registro válido encontrado")
+    return df
+
+
+# -----------------------
+# Gravação / remoção
+# -----------------------
+def _somar_frequencias(contagens):
+    """UPSERT de [(produto, grupo, defeito, quantidade)] somando na contagem atual."""
+    linhas = [{"produto": p, "grupo": g, "defeito": d, "quantidade": int(q)} for p, g, d, q in contagens]
+    for inicio in range(0, len(linhas), LINHAS_POR_LOTE):
+        stmt = sqlite_insert(FrequenciaDefeito).values(linhas[inicio:inicio + LINHAS_POR_LOTE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["produto", "grupo", "defeito"],
+            set_={"quantidade": FrequenciaDefeito.quantidade + stmt.excluded.quantidade}
+        )
+        db.session.execute(stmt)
+
+
+def importar_planilha_garantia(conteudo, nome, usuario_id=None):
+    """
+    Grava a planilha (bytes) e soma suas contagens em frequencia_defeito.
+    Retorna (planilha, nova); nova=False se o mesmo arquivo já foi importado.
+    Não faz commit.
+    """
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+    existente = PlanilhaGarantia.query.filter_by(hash_conteudo=hash_conteudo).first()
+    if existente:
+        return existente, False
+
+    df = ler_planilha_garantia(conteudo, nome)
+    planilha = PlanilhaGarantia(nome_arquivo=nome[:255], hash_conteudo=hash_conteudo,
+                                linhas=len(df), usuario_id=usuario_id)
+    db.session.add(planilha)
+    db.session.flush()
+
+    for inicio in range(0, len(df), LINHAS_POR_LOTE):
+        lote = df.iloc[inicio:inicio + LINHAS_POR_LOTE]
+        db.session.execute(insert(RegistroGarantia), [
+            {"planilha_id": planilha.id, "produto": p, "grupo": g, "defeito": d}
+            for p, g, d in lote[["produto", "grupo", "defeito"]].itertuples(index=False)
+        ])
+
+    contagens = df.groupby(["produto", "grupo", "defeito"], sort=False).size()
+    _somar_frequencias((p, g, d, q) for (p, g, d), q in contagens.items())
+    return planilha, True
+
+
+def remover_planilha(planilha):
+    """Desconta a planilha das frequências e apaga seus registros. Não faz commit."""
+    contagens = (
+        db.session.query(RegistroGarantia.produto, RegistroGarantia.grupo, RegistroGarantia.defeito,
+                         func.count(RegistroGarantia.id))
+        .filter(RegistroGarantia.planilha_id == planilha.id)
+        .group_by(RegistroGarantia.produto, RegistroGarantia.grupo, RegistroGarantia.defeito)
+        .all()
+    )
+    _somar_frequencias((p, g, d, -q) for p, g, d, q in contagens)
+    db.session.execute(delete(FrequenciaDefeito).where(FrequenciaDefeito.quantidade <= 0))
+    db.session.execute(delete(RegistroGarantia).where(RegistroGarantia.planilha_id == planilha.id))
+    db.session.delete(planilha)
+
+
+SQL_RECONSTRUIR = [
+    "DELETE FROM frequencia_defeito",
+    """
+    INSERT INTO frequencia_defeito (produto, grupo, defeito, quantidade)
+    SELECT produto, grupo, defeito, COUNT(*)
+    FROM registro_garantia
+    GROUP BY produto, grupo, defeito
+    """,
+]
+
+
+def recalcular_frequencias():
+    """Reconstrói frequencia_defeito a partir dos registros (manutenção). Faz commit."""
+    for sql in SQL_RECONSTRUIR:
+        db.session.execute(text(sql))
+    db.session.commit()
+    return db.session.query(func.count(FrequenciaDefeito.id)).scalar()
+
+
+# -----------------------
+# Consulta
+# -----------------------
+def resumo_garantia():
+    """Totais do histórico + planilhas importadas (mais recentes primeiro)."""
+    registros, defeitos = db.session.query(
+        func.coalesce(func.sum(FrequenciaDefeito.quantidade), 0),
+        func.count(func.distinct(FrequenciaDefeito.defeito))
+    ).one()
+    planilhas = PlanilhaGarantia.query.order_by(PlanilhaGarantia.id.desc()).all()
+    return {"registros": registros, "defeitos": defeitos, "planilhas": planilhas}
+
+
+def opcoes_previsao():
+    """Produtos e grupos existentes no histórico (para os selects)."""
+    produtos = [p for (p,) in db.session.query(FrequenciaDefeito.produto).distinct().order_by(FrequenciaDefeito.produto)]
+    grupos = [g for (g,) in db.session.query(FrequenciaDefeito.grupo).distinct().order_by(FrequenciaDefeito.grupo)]
+    return {"produtos": produtos, "grupos": grupos}
+
+
+def prever_defeitos(produto, grupo, excluidos=(), limite=MAX_PREVISOES):
+    """
+    Defeitos mais prováveis para (produto, grupo) com a confiança em %.
+    Sem histórico da combinação usa o histórico inteiro (base='historico');
+    se todos os defeitos estiverem excluídos, ignora a exclusão.
+    """
+    base = "combinacao"
+    linhas = (db.session.query(FrequenciaDefeito.defeito, FrequenciaDefeito.quantidade)
+              .filter(FrequenciaDefeito.produto == produto, FrequenciaDefeito.grupo == grupo)
+              .all())
+    if not linhas:
+        base = "historico"
+        linhas = (db.session.query(FrequenciaDefeito.defeito, func.sum(FrequenciaDefeito.quantidade))
+                  .group_by(FrequenciaDefeito.defeito)
+                  .all())
+
+    excluidos = set(excluidos)
+    contagem = {d: q for d, q in linhas if d not in excluidos} or dict(linhas)
+    total = sum(contagem.values())
+    previsoes = sorted(contagem.items(), key=lambda item: item[1], reverse=True)[:limite]
+    return {
+        "produto": produto,
+        "grupo": grupo,
+        "base": base,
+        "total": total,
+        "previsoes": [{"defeito": d, "quantidade": q, "confianca": round(q / total * 100, 2)}
+                      for d, q in previsoes],
+    }
+
+
+__all__ = ["DEFEITOS_EXCLUIDOS_PADRAO", "ErroPlanilhaGarantia", "defeitos_excluidos_do_ambiente",
+           "ler_planilha_garantia", "importar_planilha_garantia", "remover_planilha", "recalcular_frequencias",
+           "resumo_garantia", "opcoes_previsao", "prever_defeitos"]
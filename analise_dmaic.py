@@ -0,0 +1,253 @@
+# analise_dmaic.py
+# -----------------------
+# Agregações DMAIC/Pareto da página Lean Six Sigma, no servidor:
+#   - a aba "new sheet" da planilha de garantia é lida uma vez com pandas
+#   - mesmo mapeamento de colunas que a página fazia no navegador
+#   - Pareto, problemas (produto × motivo), custo por grupo e por período
+#     com groupby vetorizado
+#   - resultado (JSON compacto para os gráficos) em cache pelo SHA-256 do
+#     arquivo: reenviar a mesma planilha não recalcula nada
+# -----------------------
+import hashlib
+import importlib.util
+import io
+
+import pandas as pd
+
+# python-calamine (opcional) lê .xlsx várias vezes mais rápido que o openpyxl
+MOTOR_EXCEL = "calamine" if importlib.util.find_spec("python_calamine") else None
+
+ABA = "new sheet"
+TOP_PROBLEMAS = 5
+TOP_PARETO = 10
+TOP_MOTIVOS = 5
+TOP_GRUPOS = 10
+
+# campo: nomes aceitos no cabeçalho (em ordem de preferência)
+COLUNAS = {
+    "codigo": ["MODELO", "COD", "CÓDIGO", "SKU"],
+    "produto": ["PRODUTO"],
+    "motivo": ["MOTIVO", "MOTIVO CONSTATADO", "DEFEITO"],
+    "data": ["DATA CHAMADA", "DATA", "DT CHAMADA"],
+    "grupo": ["GRUPO", "REGIÃO", "REGIAO"],
+    "valor_unitario": ["VALOR_UNITARIO", "VALOR UNITARIO", "VLR_UNIT"],
+    "total": ["TOTAL", "VALOR_TOTAL", "VLR_TOTAL"],
+}
+OBRIGATORIAS = ["produto", "motivo", "data", "grupo", "total"]
+NOMES_OBRIGATORIAS = {"produto": "PRODUTO", "motivo": "Motivo Constatado", "data": "Data Chamada",
+                      "grupo": "GRUPO", "total": "TOTAL"}
+
+
+class ErroPlanilhaDmaic(Exception):
+    """Planilha fora do formato esperado (mensagem pronta para o usuário)."""
+
+
+def hash_arquivo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+# -----------------------
+# Leitura e normalização
+# -----------------------
+def mapear_colunas(cabecalho):
+    """
+    Índice da coluna de cada campo. Nome idêntico tem prioridade sobre
+    "contém": assim "COD PRODUTO" não é tomada por PRODUTO quando a coluna
+    PRODUTO existe (a página corrigia isso forçando o índice).
+    """
+    cabecalho = [str(c).strip().upper() if c is not None and not pd.isna(c) else "" for c in cabecalho]
+    mapa = {}
+    for campo, nomes in COLUNAS.items():
+        indice = next((i for nome in nomes for i, h in enumerate(cabecalho) if h == nome), None)
+        if indice is None:
+            indice = next((i for nome in nomes for i, h in enumerate(cabecalho)
+                           if h and (nome in h or h in nome)), None)
+        mapa[campo] = indice
+    return mapa, cabecalho
+
+
+def valor_monetario(serie):
+    """
+    Converte valores como '1.234,56', '1234.56', '1.234' ou números para
+    float com 2 casas (mesmas regras da página, vetorizado). Inválidos = 0.
+    """
+    numeros = pd.to_numeric(serie.where(serie.map(lambda v: isinstance(v, (int, float)))), errors="coerce")
+    texto = serie.where(numeros.isna()).astype("string").str.replace(r"[R$\s]", "", regex=True).fillna("")
+
+    com_virgula = texto.str.contains(",", regex=False)
+    decimal_ponto = ~com_virgula & texto.str.contains(r"\.[^.]{2}$", regex=True)  # '1.234.56' → 1234.56
+
+    normalizado = texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    normalizado = normalizado.mask(decimal_ponto, texto.str.replace(r"\.(?=[^.]*\.)", "", regex=True))
+    return numeros.fillna(pd.to_numeric(normalizado, errors="coerce")).fillna(0).round(2)
+
+
+FORMATOS_DATA = ["%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"]
+
+
+def converter_datas(serie):
+    """
+    Células de data do Excel já vêm como datetime; textos dd/mm/aaaa [hh:mm]
+    são convertidos por formato fixo (vetorizado) e só o que sobrar passa
+    pelo parser genérico (lento, por elemento).
+    """
+    e_texto = serie.map(lambda v: isinstance(v, str))
+    datas = pd.to_datetime(serie.mask(e_texto), errors="coerce")
+    texto = serie.where(e_texto).astype("string").str.strip()
+    for formato in FORMATOS_DATA:
+        faltando = datas.isna() & texto.notna()
+        if not faltando.any():
+            return datas
+        datas = datas.fillna(pd.to_datetime(texto.where(faltando), format=formato, errors="coerce"))
+    faltando = datas.isna() & texto.notna()
+    if faltando.any():
+        datas = datas.fillna(pd.to_datetime(texto.where(faltando), dayfirst=True, errors="coerce", format="mixed"))
+    return datas
+
+
+def ler_planilha_dmaic(conteudo):
+    """DataFrame normalizado (produto, codigo, motivo, data, grupo, valor_unitario, total)."""
+    try:
+        bruto = pd.read_excel(io.BytesIO(conteudo), sheet_name=ABA, header=None, dtype=object, engine=MOTOR_EXCEL)
+    except ImportError:
+        raise ErroPlanilhaDmaic("Leitura de Excel indisponível no servidor (instale openpyxl).")
+    except ValueError as e:
+        if "not found" in str(e).lower():
+            raise ErroPlanilhaDmaic(f'A aba "{ABA}" não foi encontrada. Verifique o nome da aba no Excel.')
+        raise ErroPlanilhaDmaic(f"Não foi possível ler o arquivo: {e}")
+
+    if bruto.empty:
+        raise ErroPlanilhaDmaic("Planilha vazia")
+    mapa, cabecalho = mapear_colunas(bruto.iloc[0].tolist())
+    faltando = [NOMES_OBRIGATORIAS[c] for c in OBRIGATORIAS if mapa[c] is None]
+    if faltando:
+        raise ErroPlanilhaDmaic(f"Os seguintes campos não foram encontrados: {', '.join(faltando)}. "
+                                f"Colunas disponíveis: {', '.join(h for h in cabecalho if h)}")
+
+    linhas = bruto.iloc[1:]
+    preenchidas = linhas.apply(lambda coluna: coluna.notna() & coluna.astype("string").str.strip().ne(""))
+    linhas = linhas[preenchidas.any(axis=1)]
+
+    def texto(campo, padrao):
+        if mapa[campo] is None:
+            return pd.Series(padrao, index=linhas.index, dtype="string")
+        serie = linhas[mapa[campo]].astype("string").str.strip()
+        return serie.mask(serie.isna() | (serie == ""), padrao)
+
+    def numero(campo):
+        if mapa[campo] is None:
+            return pd.Series(0.0, index=linhas.index)
+        return valor_monetario(linhas[mapa[campo]])
+
+    datas = converter_datas(linhas[mapa["data"]])
+    df = pd.DataFrame({
+        "produto": texto("produto", "Desconhecido"),
+        "codigo": texto("codigo", ""),
+        "motivo": texto("motivo", "Desconhecido"),
+        "data": datas,
+        "grupo": texto("grupo", "Não disponível"),
+        "valor_unitario": numero("valor_unitario"),
+        "total": numero("total"),
+    })
+    df = df[(df["produto"] != "Desconhecido") | (df["motivo"] != "Desconhecido")].reset_index(drop=True)
+    if df.empty:
+        raise ErroPlanilhaDmaic("Nenhum registro válido encontrado")
+    for campo in ("produto", "motivo", "grupo"):
+        df[campo] = df[campo].astype("category")
+    return df
+
+
+# -----------------------
+# Agregações
+# -----------------------
+def _rotulos_valores(serie, casas=2):
+    return {"rotulos": [str(i) for i in serie.index], "valores": [round(float(v), casas) for v in serie.values]}
+
+
+def agregar_dmaic(df):
+    """Dicionário JSON-serializável com tudo que a página Lean Six Sigma desenha."""
+    total_atendimentos = len(df)
+    valor_total = float(df["total"].sum())
+
+    problemas = (
+        df.groupby(["produto", "motivo"], observed=True)["total"].agg(quantidade="size", custo="sum")
+        .reset_index()
+        .sort_values(["custo", "quantidade"], ascending=False, kind="stable")
+    )
+    por_produto = df.groupby("produto", observed=True).size()
+    problemas["taxa"] = problemas["quantidade"] / problemas["produto"].map(por_produto).astype(float) * 100
+    problemas["ticket_medio"] = problemas["custo"] / problemas["quantidade"]
+
+    topo = problemas.iloc[0]
+    do_topo = df[(df["produto"] == topo["produto"]) & (df["motivo"] == topo["motivo"])]
+    grupo_topo = do_topo["grupo"].value_counts(sort=True)
+    motivo_prioritario = df["motivo"] == topo["motivo"]
+
+    custo_motivo = df.groupby("motivo", observed=True)["total"].sum().sort_values(ascending=False, kind="stable")
+    acumulado = custo_motivo.cumsum() / valor_total * 100 if valor_total else custo_motivo * 0
+
+    diario = (df[motivo_prioritario & df["data"].notna()]
+              .groupby(df["data"].dt.normalize())["total"].sum().sort_index())
+    diario.index = diario.index.strftime("%Y-%m-%d")
+    mensal = df[df["data"].notna()].groupby(df["data"].dt.to_period("M"))["total"].sum().sort_index()
+    mensal.index = mensal.index.strftime("%Y-%m")
+
+    por_grupo = (df.groupby("grupo", observed=True)["total"].agg(quantidade="size", custo="sum")
+                 .sort_values("custo", ascending=False).head(TOP_GRUPOS))
+
+    return {
+        "indicadores": {
+            "total_atendimentos": total_atendimentos,
+            "valor_total": round(valor_total, 2),
+            "ticket_medio": round(valor_total / total_atendimentos, 2),
+            "produtos_unicos": int(df["produto"].nunique()),
+        },
+        "prioritario": {
+            "produto": str(topo["produto"]),
+            "motivo": str(topo["motivo"]),
+            "grupo": str(grupo_topo.index[0]) if len(grupo_topo) else "Não disponível",
+            "quantidade": int(topo["quantidade"]),
+            "custo": round(float(topo["custo"]), 2),
+            "taxa": round(float(topo["taxa"]), 1),
+            "ticket_medio": round(float(topo["ticket_medio"]), 2),
+            "ocorrencias_motivo": int(motivo_prioritario.sum()),
+        },
+        "problemas": [
+            [str(p.produto), str(p.motivo), int(p.quantidade), round(float(p.custo), 2), round(float(p.taxa), 1)]
+            for p in problemas.head(TOP_PROBLEMAS).itertuples(index=False)
+        ],
+        "pareto": {
+            **_rotulos_valores(custo_motivo.head(TOP_PARETO)),
+            "acumulado": [round(float(v), 2) for v in acumulado.head(TOP_PARETO)],
+        },
+        "motivos": _rotulos_valores(custo_motivo.head(TOP_MOTIVOS)),
+        "custo_diario": _rotulos_valores(diario),
+        "custo_mensal": _rotulos_valores(mensal),
+        "grupos": {
+            **_rotulos_valores(por_grupo["custo"]),
+            "quantidades": [int(q) for q in por_grupo["quantidade"]],
+        },
+    }
+
+
+def analisar_planilha(conteudo, cache=None):
+    """
+    Agregações da planilha (bytes). `cache` (CacheRespostas ou None) guarda o
+    resultado pelo hash do conteúdo; o arquivo só é lido quando não há cache.
+    Retorna (resultado, veio_do_cache).
+    """
+    chave = hash_arquivo(conteudo)
+    if cache is not None:
+        resultado = cache.obter(chave, 0)
+        if resultado is not None:
+            return resultado, True
+
+    resultado = agregar_dmaic(ler_planilha_dmaic(conteudo))
+    resultado["hash"] = chave
+    if cache is not None:
+        cache.gravar(chave, 0, resultado)
+    return resultado, False
+
+
+__all__ = ["ABA", "ErroPlanilhaDmaic", "hash_arquivo", "mapear_colunas", "valor_monetario", "converter_datas",
+           "ler_planilha_dmaic", "agregar_dmaic", "analisar_planilha"]
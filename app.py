@@ -4,6 +4,12 @@ from models import *
 from flask_migrate import Migrate
 from routes import routes
 from flask_login import LoginManager
+from sqlite_perfil import perfil_do_ambiente, aplicar_perfil_sqlite
+from analise_defeitos import defeitos_excluidos_do_ambiente
+from fila_tarefas import agenda_do_ambiente
+from metricas import instalar_metricas
+from diagnostico_sql import instalar_diagnostico_sql, LENTA_MS_PADRAO, MINIMO_REPETICOES_PADRAO
+from captura_trafego import instalar_captura_trafego
 
 # -----------------------
 # DIRETÓRIO BASE E TEMPLATES
@@ -21,7 +27,10 @@ app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY", "123")  # Use env vars e
 # -----------------------
 # BANCO DE DADOS (LOCAL x RENDER)
 # -----------------------
-if os.environ.get("RENDER"):
+if os.environ.get("DB_PATH"):
+    # Caminho explícito (scripts de verificação/benchmark usam um banco temporário)
+    db_path = os.environ["DB_PATH"]
+elif os.environ.get("RENDER"):
     # Render só permite escrita em /data
     db_path = "/data/producao.db"
 else:
@@ -32,12 +41,79 @@ else:
 
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
 
+# Perfil SQLite (WAL, busy_timeout, mmap...) — SQLITE_PERFIL=0 desliga
+app.config['SQLITE_PERFIL'] = perfil_do_ambiente()
+
+# Cache do /dashboard em arquivo ao lado do banco (compartilhado entre workers);
+# DASHBOARD_CACHE=0 desliga
+if os.environ.get("DASHBOARD_CACHE", "1") != "0":
+    app.config['DASHBOARD_CACHE_PATH'] = os.path.join(os.path.dirname(db_path), "cache_dashboard.db")
+app.config['DASHBOARD_CACHE_MAX'] = int(os.environ.get("DASHBOARD_CACHE_MAX", 64))
+
+# Cache das análises DMAIC (Lean Six Sigma) pelo hash da planilha; DMAIC_CACHE=0 desliga
+if os.environ.get("DMAIC_CACHE", "1") != "0":
+    app.config['DMAIC_CACHE_PATH'] = os.path.join(os.path.dirname(db_path), "cache_dmaic.db")
+app.config['DMAIC_CACHE_MAX'] = int(os.environ.get("DMAIC_CACHE_MAX", 16))
+
+# Snapshot Parquet do histórico (flask exportar-snapshot) lido pelo DashEspumas.py
+app.config['SNAPSHOT_DIR'] = os.environ.get("SNAPSHOT_DIR", os.path.join(os.path.dirname(db_path), "snapshots"))
+
+# Relatórios em segundo plano (/relatorios): threads do pool e segundos em que
+# um resultado pronto é reaproveitado para os mesmos parâmetros
+app.config['RELATORIOS_WORKERS'] = int(os.environ.get("RELATORIOS_WORKERS", 2))
+app.config['RELATORIOS_TTL'] = int(os.environ.get("RELATORIOS_TTL", 600))
+
+# Fila de tarefas (tabela `tarefa`): threads por processo do servidor, sobem
+# na 1ª requisição. TAREFAS_WORKERS=0 desliga (use `flask executar-tarefas` em
+# outro processo). Agenda diária desligada por padrão: TAREFAS_AGENDA="nome=HH:MM;..."
+# ou TAREFAS_AGENDA=padrao (AGENDA_PADRAO, manutenção de madrugada)
+app.config['TAREFAS_WORKERS'] = int(os.environ.get("TAREFAS_WORKERS", 2))
+app.config['TAREFAS_AGENDA'] = agenda_do_ambiente()
+
+# Métricas por rota em /metrics (METRICAS=1 liga). O acumulado de cada worker
+# vai para um arquivo ao lado do banco. Acesso com "Authorization: Bearer
+# <METRICAS_TOKEN>" (coletor Prometheus) ou por usuário logado
+app.config['METRICAS'] = os.environ.get("METRICAS", "0") == "1"
+app.config['METRICAS_PATH'] = os.path.join(os.path.dirname(db_path), "metricas.db")
+app.config['METRICAS_TOKEN'] = os.environ.get("METRICAS_TOKEN")
+
+# Diagnóstico de SQL para desenvolvimento (SQL_DIAGNOSTICO=1): avisa N+1 (mesmo
+# SQL repetido SQL_N1_MINIMO vezes na requisição) e comandos acima de
+# SQL_LENTA_MS com o EXPLAIN QUERY PLAN, em arquivo com rotação (um por processo:
+# sql_diagnostico.<pid>.log)
+app.config['SQL_DIAGNOSTICO'] = os.environ.get("SQL_DIAGNOSTICO", "0") == "1"
+app.config['SQL_DIAGNOSTICO_PATH'] = os.environ.get(
+    "SQL_DIAGNOSTICO_PATH", os.path.join(os.path.dirname(db_path), "sql_diagnostico.log"))
+app.config['SQL_LENTA_MS'] = float(os.environ.get("SQL_LENTA_MS", LENTA_MS_PADRAO))
+app.config['SQL_N1_MINIMO'] = int(os.environ.get("SQL_N1_MINIMO", MINIMO_REPETICOES_PADRAO))
+
+# Captura do tráfego real para o replay_trafego.py (CAPTURA_TRAFEGO=1): uma
+# linha JSON sanitizada por requisição, em arquivo com rotação (um por processo:
+# captura_trafego.<pid>.jsonl; o replay lê todos a partir de CAPTURA_TRAFEGO_PATH)
+app.config['CAPTURA_TRAFEGO'] = os.environ.get("CAPTURA_TRAFEGO", "0") == "1"
+app.config['CAPTURA_TRAFEGO_PATH'] = os.environ.get(
+    "CAPTURA_TRAFEGO_PATH", os.path.join(os.path.dirname(db_path), "captura_trafego.jsonl"))
+
+# Defeitos ignorados na análise preditiva (DEFEITOS_EXCLUIDOS="A;B;C")
+app.config['DEFEITOS_EXCLUIDOS'] = defeitos_excluidos_do_ambiente()
+
 # -----------------------
 # EXTENSÕES
 # -----------------------
 db.init_app(app)
 migrate = Migrate(app, db)
 
+with app.app_context():
+    if app.config['SQLITE_PERFIL']:
+        aplicar_perfil_sqlite(db.engine, app.config['SQLITE_PERFIL'])
+    if app.config['METRICAS']:
+        instalar_metricas(app, db.engine, app.config['METRICAS_PATH'])
+    if app.config['SQL_DIAGNOSTICO']:
+        instalar_diagnostico_sql(app, db.engine, app.config['SQL_DIAGNOSTICO_PATH'],
+                                 app.config['SQL_LENTA_MS'], app.config['SQL_N1_MINIMO'])
+    if app.config['CAPTURA_TRAFEGO']:
+        instalar_captura_trafego(app, app.config['CAPTURA_TRAFEGO_PATH'])
+
 login_manager = LoginManager()
 login_manager.login_view = "login"
 login_manager.init_app(app)
@@ -0,0 +1,187 @@
+# benchmark_rotas.py
+# ----------------------------------------------------------------
+# Benchmark das rotas principais sobre um banco sintético
+# (dados_sinteticos.py): chama cada rota pelo test client do Flask,
+# mede a latência (p50/p95) e conta os comandos SQL, e compara com a
+# linha de base gravada em JSON (uma por escala).
+#
+# Falha (exit 1) se, em relação à linha de base da mesma escala:
+#   - alguma rota executar mais comandos SQL (o número é determinístico)
+#   - o p50 ou o p95 subir mais que --tolerancia (fração) E mais que
+#     --folga-ms (ruído de milissegundos em rotas rápidas não conta)
+# Sem linha de base para a escala, a execução atual vira a linha de base.
+#
+# O banco gerado fica em cache (--banco) e cada execução roda numa cópia,
+# então todas partem dos mesmos dados (o POST /cadastro_producao grava).
+#
+# Uso:  python benchmark_rotas.py --escala 100k
+#       python benchmark_rotas.py --escala 1k --repeticoes 50 --salvar
+# ----------------------------------------------------------------
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dados_sinteticos import ESCALAS, EMAIL_PADRAO, SENHA_PADRAO, DATA_FINAL, gerar_banco
+
+BASELINE_PADRAO = "benchmark_rotas.json"
+TOLERANCIA_PADRAO = 0.25
+FOLGA_MS_PADRAO = 2.0
+
+
+def casos(client):
+    """(nome, função(i) → resposta) das rotas medidas; `i` = número da chamada."""
+    def dashboard(i):
+        # Período diferente a cada chamada: mede o cálculo, não o acerto no cache
+        fim = DATA_FINAL - timedelta(days=i)
+        return client.get(f"/dashboard?data_inicio={fim - timedelta(days=365)}&data_fim={fim}")
+
+    def cadastro(i):
+        return client.post("/cadastro_producao", data={
+            "producao_id": f"BENCH{i:06d}", "data_producao": DATA_FINAL.isoformat(), "tipo_espuma": 1,
+            "cor": "BRANCA", "altura": 90, "conformidade": "Conforme",
+            "componente_1": 110.0, "componente_2": 5.0, "componente_3": 60.0,
+        })
+
+    return [
+        ("GET /controle-producao", lambda i: client.get("/controle-producao")),
+        ("GET /dashboard", dashboard),
+        ("GET /estoque", lambda i: client.get("/estoque", follow_redirects=True)),  # a tela vive no controle
+        ("GET /movimentacoes/<id>", lambda i: client.get("/movimentacoes/1")),
+        ("POST /api/ia-analise-producao", lambda i: client.post("/api/ia-analise-producao", json={
+            "tipo_espuma_id": 1, "altura": 90, "componentes": {"componente_1": 110.0, "componente_2": 5.0}})),
+        ("POST /cadastro_producao", cadastro),
+    ]
+
+
+def medir(engine, chamada, repeticoes, aquecimento):
+    """Roda `chamada` aquecimento + repeticoes vezes; mede só as repetições."""
+    from contador_sql import contar_sql
+
+    latencias, consultas, status = [], [], {}
+    for i in range(aquecimento + repeticoes):
+        with contar_sql(engine) as contador:
+            inicio = time.perf_counter()
+            resposta = chamada(i)
+            resposta.get_data()  # respostas em fluxo só terminam aqui
+            duracao = time.perf_counter() - inicio
+        if i < aquecimento:
+            continue
+        latencias.append(duracao * 1000)
+        consultas.append(contador.total)
+        status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+    return {
+        "p50_ms": round(float(np.percentile(latencias, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencias, 95)), 3),
+        "consultas": max(consultas),
+        "status": {str(s): n for s, n in sorted(status.items())},
+    }
+
+
+def executar(banco, repeticoes, aquecimento, filtro=None):
+    """Sobe o app apontando para `banco` e mede as rotas. Retorna {rota: medida}."""
+    os.environ["DB_PATH"] = banco
+    os.environ.setdefault("TAREFAS_WORKERS", "0")  # sem tarefas agendadas disputando o banco
+    os.environ.setdefault("METRICAS", "0")         # mede a rota, não o middleware de métricas
+    from app import app
+    from models import db
+
+    client = app.test_client()
+    resposta = client.post("/login", data={"email": EMAIL_PADRAO.format(1), "senha": SENHA_PADRAO})
+    if resposta.status_code != 302:
+        raise SystemExit("❌ login no banco sintético falhou")
+    with app.app_context():
+        engine = db.engine
+
+    resultados = {}
+    for nome, chamada in casos(client):
+        if filtro and filtro not in nome:
+            continue
+        resultados[nome] = medir(engine, chamada, repeticoes, aquecimento)
+        r = resultados[nome]
+        print(f"  {nome:<32} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+              f"{r['consultas']:>3} SQL  HTTP {','.join(r['status'])}")
+    return resultados
+
+
+def comparar(atual, base, tolerancia, folga_ms):
+    """Lista de regressões (texto) de `atual` contra `base`; respostas com erro sempre contam."""
+    regressoes = []
+    for rota, medida in atual.items():
+        if any(not s.startswith(("2", "3")) for s in medida["status"]):
+            regressoes.append(f"{rota}: respostas com erro {medida['status']}")
+        anterior = base.get(rota)
+        if anterior is None:
+            continue
+        if medida["consultas"] > anterior["consultas"]:
+            regressoes.append(f"{rota}: {medida['consultas']} comandos SQL (linha de base {anterior['consultas']})")
+        for campo in ("p50_ms", "p95_ms"):
+            limite = anterior[campo] * (1 + tolerancia)
+            if medida[campo] > limite and medida[campo] - anterior[campo] > folga_ms:
+                regressoes.append(f"{rota}: {campo[:3]} {medida[campo]:.2f} ms "
+                                  f"(linha de base {anterior[campo]:.2f} ms, limite {limite:.2f} ms)")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das rotas sobre um banco sintético.")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="1k")
+    parser.add_argument("--banco", help="banco sintético em cache (gerado se não existir)")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--aquecimento", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PADRAO, help="arquivo JSON da linha de base")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="aumento de latência aceito (fração, padrão 0.25 = 25%%)")
+    parser.add_argument("--folga-ms", type=float, default=FOLGA_MS_PADRAO,
+                        help="aumento absoluto abaixo do qual a latência não conta como regressão")
+    parser.add_argument("--rota", help="mede só as rotas cujo nome contém este texto")
+    parser.add_argument("--salvar", action="store_true", help="grava o resultado como nova linha de base")
+    args = parser.parse_args()
+
+    banco = args.banco or os.path.join(tempfile.gettempdir(), f"benchmark_rotas_{args.escala}.db")
+    if not os.path.exists(banco):
+        print(f"Gerando banco sintético ({args.escala}) em {banco}...")
+        gerar_banco(banco, ESCALAS[args.escala], verbose=True)
+    copia = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    shutil.copyfile(banco, copia)
+
+    print(f"Benchmark {args.escala}: {args.repeticoes} repetições (+{args.aquecimento} de aquecimento)")
+    resultados = executar(copia, args.repeticoes, args.aquecimento, args.rota)
+
+    linhas_base = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            linhas_base = json.load(f)
+    base = linhas_base.get(args.escala)
+
+    regressoes = comparar(resultados, base["rotas"] if base else {}, args.tolerancia, args.folga_ms)
+    if args.salvar or base is None:
+        linhas_base[args.escala] = {
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "maquina": platform.machine(),
+            "repeticoes": args.repeticoes,
+            "rotas": dict((base or {}).get("rotas", {}), **resultados),
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(linhas_base, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n💾 Linha de base '{args.escala}' gravada em {args.baseline}")
+
+    if regressoes:
+        print(f"\n❌ {len(regressoes)} regressão(ões) em relação à linha de base:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        sys.exit(1)
+    if base:
+        print(f"\n✅ Sem regressões (tolerância {args.tolerancia:.0%}, folga {args.folga_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmark_sqlite.py
+# ----------------------------------------------------------------
+# Benchmark de concorrência do SQLite: N escritores (lançamento de produção
+# + baixa de estoque) e M leitores (agregação estilo dashboard) contra um
+# banco temporário, rodando SEM e COM o perfil de sqlite_perfil.py.
+# Reporta vazão (operações/s) e erros de lock.
+#
+# Uso:  python benchmark_sqlite.py --escritores 4 --leitores 4 --segundos 10
+# ----------------------------------------------------------------
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+from sqlite_perfil import PERFIL_PADRAO, aplicar_perfil_sqlite
+
+COMPONENTES = [1, 2, 3]
+
+
+def preparar_banco(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for componente_id in COMPONENTES:
+            conn.execute(text("INSERT INTO componente (id, nome, ativo) VALUES (:id, :nome, 1)"),
+                         {"id": componente_id, "nome": f"COMP {componente_id}"})
+            conn.execute(text("INSERT INTO estoque (componente_id, quantidade) VALUES (:id, 1e12)"),
+                         {"id": componente_id})
+
+
+def escritor(engine, numero, parar, resultado):
+    sequencia = 0
+    while not parar.is_set():
+        sequencia += 1
+        try:
+            with engine.begin() as conn:
+                producao_id = conn.execute(text(
+                    "INSERT INTO producao (producao_id, data_producao, tipo_espuma, cor, conformidade, altura, usuario_id, status) "
+                    "VALUES (:bloco, :data, 'D28', 'azul', 'Conforme', 60, 1, 'A')"
+                ), {"bloco": f"W{numero}-{sequencia}",
+                    "data": (date(2025, 1, 1) + timedelta(days=sequencia % 365)).isoformat()}).lastrowid
+                for componente_id in COMPONENTES:
+                    conn.execute(text(
+                        "INSERT INTO componenteproducao (producao_id, componente_id, quantidade_usada) VALUES (:p, :c, 10)"
+                    ), {"p": producao_id, "c": componente_id})
+                    conn.execute(text(
+                        "UPDATE estoque SET quantidade = quantidade - 10 WHERE componente_id = :c"
+                    ), {"c": componente_id})
+            resultado["ok"] += 1
+        except OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            resultado["lock"] += 1
+
+
+def leitor(engine, parar, resultado):
+    while not parar.is_set():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(
+                    "SELECT p.tipo_espuma, cp.componente_id, SUM(cp.quantidade_usada) "
+                    "FROM componenteproducao cp JOIN producao p ON p.id = cp.producao_id "
+                    "WHERE p.status != 'C' AND p.data_producao BETWEEN '2025-01-01' AND '2025-03-31' "
+                    "GROUP BY p.tipo_espuma, cp.componente_id"
+                )).fetchall()
+            resultado["ok"] += 1
+        except OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            resultado["lock"] += 1
+
+
+def rodar(perfil, escritores, leitores, segundos):
+    caminho = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    engine = create_engine(f"sqlite:///{caminho}", pool_size=escritores + leitores)
+    if perfil:
+        aplicar_perfil_sqlite(engine, perfil)
+    preparar_banco(engine)
+
+    parar = threading.Event()
+    # Um contador por thread (+= em dict compartilhado não é atômico); somados no final
+    parciais_escrita = [{"ok": 0, "lock": 0} for _ in range(escritores)]
+    parciais_leitura = [{"ok": 0, "lock": 0} for _ in range(leitores)]
+
+    threads = [threading.Thread(target=escritor, args=(engine, i, parar, parciais_escrita[i]))
+               for i in range(escritores)]
+    threads += [threading.Thread(target=leitor, args=(engine, parar, parciais_leitura[i]))
+                for i in range(leitores)]
+
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(segundos)
+    parar.set()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    engine.dispose()
+
+    escrita = {chave: sum(p[chave] for p in parciais_escrita) for chave in ("ok", "lock")}
+    leitura = {chave: sum(p[chave] for p in parciais_leitura) for chave in ("ok", "lock")}
+    return escrita, leitura, duracao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de concorrência do SQLite (com/sem perfil)")
+    parser.add_argument("--escritores", type=int, default=4)
+    parser.add_argument("--leitores", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"🔧 {args.escritores} escritor(es), {args.leitores} leitor(es), {args.segundos:.0f}s por rodada\n")
+    for nome, perfil in (("sem perfil", None), ("com perfil", PERFIL_PADRAO)):
+        escrita, leitura, duracao = rodar(perfil, args.escritores, args.leitores, args.segundos)
+        print(f"=== {nome} ===")
+        print(f"   escritas: {escrita['ok'] / duracao:8.1f}/s  (erros de lock: {escrita['lock']})")
+        print(f"   leituras: {leitura['ok'] / duracao:8.1f}/s  (erros de lock: {leitura['lock']})\n")
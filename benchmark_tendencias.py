@@ -0,0 +1,108 @@
+# benchmark_tendencias.py
+# ----------------------------------------------------------------
+# Benchmark do pipeline de consumo/tendência do DashEspumas.py sobre um
+# conjunto gerado (padrão: 1 milhão de linhas de consumo):
+#   - antes: colunas object + período via .dt.to_period().apply(strftime)
+#            e groupby por string
+#   - depois: categóricas + tendencia_consumo (início do período vetorizado,
+#            groupby por data/códigos)
+# Reporta memória do frame e tempo por agrupamento, e confere que os dois
+# caminhos dão os mesmos totais (exit 1 se divergirem).
+#
+# Uso:  python benchmark_tendencias.py --linhas 1000000
+# ----------------------------------------------------------------
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from carga_producoes import categorizar
+from tendencia_consumo import AGRUPAMENTOS, consumo_por_componente, consumo_por_periodo
+
+TIPOS = ["D20", "D23", "D26", "D28", "D33", "D45", "AG80"]
+COMPONENTES = ["POLIOL", "ÁGUA", "TDI", "SILICONE", "AMINA", "ESTANHO", "CLORETO"]
+CORES = ["Branca", "Azul", "Rosa", "Amarela", "Verde"]
+
+
+def gerar(linhas, semente=42):
+    """Frame no formato da carga do banco (colunas object), ~7 componentes por bloco."""
+    rng = np.random.default_rng(semente)
+    blocos = -(-linhas // len(COMPONENTES))  # arredonda para cima
+    datas = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365, blocos), unit="D")
+    bloco = np.repeat(np.arange(blocos), len(COMPONENTES))[:linhas]
+    return pd.DataFrame({
+        "producao_id_interno": bloco + 1,
+        "bloco": pd.Series(bloco).map("B{:07d}".format).astype(object),
+        "data_producao": datas[bloco],
+        "tipo_espuma": np.array(TIPOS, dtype=object)[rng.integers(0, len(TIPOS), blocos)][bloco],
+        "cor": np.array(CORES, dtype=object)[rng.integers(0, len(CORES), blocos)][bloco],
+        "conformidade": np.where(rng.random(blocos) < 0.9, "Conforme", "Não Conforme").astype(object)[bloco],
+        "componente": np.tile(np.array(COMPONENTES, dtype=object), blocos)[:linhas],
+        "quantidade_usada": rng.gamma(4.0, 12.0, linhas).round(2),
+    })
+
+
+# ----------------------------------------------------------------
+# Caminho antigo (como estava no DashEspumas.py)
+# ----------------------------------------------------------------
+def antigo(df, agrupamento):
+    df_tempo = df.copy()
+    if agrupamento == "Dia":
+        df_tempo["periodo_str"] = df_tempo["data_producao"].dt.strftime("%d/%m/%Y")
+    elif agrupamento == "Semana":
+        df_tempo["periodo_str"] = df_tempo["data_producao"].dt.to_period("W").apply(lambda r: r.start_time.strftime("%d/%m/%Y"))
+    else:
+        df_tempo["periodo_str"] = df_tempo["data_producao"].dt.to_period("M").apply(lambda r: r.start_time.strftime("%d/%m/%Y"))
+    total = df_tempo.groupby("periodo_str")["quantidade_usada"].sum().reset_index()
+    detalhado = df_tempo.groupby(["periodo_str", "componente"])["quantidade_usada"].sum().reset_index()
+    por_componente = df.groupby("componente")["quantidade_usada"].sum().reset_index()
+    return total, detalhado, por_componente
+
+
+def novo(df, agrupamento):
+    total, detalhado = consumo_por_periodo(df, agrupamento)
+    return total, detalhado, consumo_por_componente(df)
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def mesmos_totais(a, b):
+    """Compara totais por rótulo de período (ordem independente)."""
+    serie_a = a.set_index("periodo_str")["quantidade_usada"].sort_index()
+    serie_b = b.set_index("periodo_str")["quantidade_usada"].sort_index()
+    return serie_a.index.equals(serie_b.index) and np.allclose(serie_a.values, serie_b.values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de tendência de consumo (object x categórico)")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df_object = gerar(args.linhas)
+    df_categorico, t_categorizar = cronometrar(lambda d: categorizar(d.copy()), df_object)
+
+    mem_object = df_object.memory_usage(deep=True).sum() / 2**20
+    mem_categorico = df_categorico.memory_usage(deep=True).sum() / 2**20
+    print(f"🔧 {len(df_object):,} linhas de consumo")
+    print(f"   memória: object {mem_object:8.1f} MiB → categórico {mem_categorico:8.1f} MiB "
+          f"({mem_object / mem_categorico:.1f}x menor; conversão {t_categorizar:.2f}s)\n")
+
+    divergencias = 0
+    for agrupamento in AGRUPAMENTOS:
+        (total_a, _, _), t_antigo = cronometrar(antigo, df_object, agrupamento)
+        (total_n, _, _), t_novo = cronometrar(novo, df_categorico, agrupamento)
+        ok = mesmos_totais(total_a, total_n)
+        divergencias += not ok
+        print(f"{'✅' if ok else '❌'} {agrupamento:<7} antes {t_antigo:7.2f}s   depois {t_novo:7.3f}s   "
+              f"({t_antigo / t_novo:6.1f}x)   {len(total_n)} período(s)")
+
+    if divergencias:
+        print(f"\n❌ {divergencias} agrupamento(s) com totais divergentes")
+        sys.exit(1)
+    print("\n✅ Mesmos totais nos dois caminhos")
@@ -0,0 +1,241 @@
+# cache_respostas.py
+# -----------------------
+# Cache de respostas JSON em arquivo SQLite, por chave e versão. Usado pelo
+# /dashboard (chave = período, versão = versao_dados) e pelas análises DMAIC
+# (chave = hash da planilha, versão sempre 0).
+#   - arquivo SQLite local: compartilhado entre os workers do gunicorn
+#   - LRU com limite de entradas
+#   - invalidação por "versão dos dados": com a versão nova, as entradas
+#     antigas deixam de valer
+#   - contadores de acerto/erro (hits/misses) para medir se compensa
+#   - acerto não trava o arquivo: só um SELECT; contadores e o "último
+#     acesso" do LRU ficam na memória do processo e são gravados de tempos em
+#     tempos, sem esperar pelo lock (se o arquivo estiver ocupado, ficam para
+#     a próxima)
+#   - com `versao_dados` (versão no banco principal, incrementada no mesmo
+#     commit dos dados), uma invalidação que falhe não deixa entrada velha
+#     valendo: invalidar() só limpa as entradas e nunca derruba a requisição
+# -----------------------
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+MAX_ENTRADAS_PADRAO = 64
+INTERVALO_CONTADORES = 5.0  # segundos entre gravações dos contadores/acessos pendentes
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = [
+    "CREATE TABLE IF NOT EXISTS entrada (chave TEXT PRIMARY KEY, versao INTEGER NOT NULL, valor TEXT NOT NULL, ultimo_acesso REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_entrada_acesso ON entrada (ultimo_acesso)",
+    "CREATE TABLE IF NOT EXISTS contador (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO contador (nome, valor) VALUES ('versao', 0), ('hits', 0), ('misses', 0)",
+]
+
+
+class CacheRespostas:
+    """
+    Cache LRU em arquivo. Com caminho=None fica desligado (sempre miss, sem contar).
+    `versao_dados` = função que devolve a versão dos dados; sem ela, vale o
+    contador do próprio arquivo (incrementado por invalidar()).
+    """
+
+    def __init__(self, caminho, max_entradas=MAX_ENTRADAS_PADRAO, versao_dados=None):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.versao_dados = versao_dados
+        self._local = threading.local()
+        # Contabilidade dos acertos ainda não gravada no arquivo
+        self._trava = threading.Lock()
+        self._pendentes = {"hits": 0, "misses": 0}
+        self._acessos = {}  # chave -> último acesso
+        self._ultima_gravacao = time.monotonic()
+
+    @property
+    def ativo(self):
+        return bool(self.caminho)
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for sql in _ESQUEMA:
+                conn.execute(sql)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def chave(data_inicio, data_fim):
+        return f"{data_inicio.isoformat() if data_inicio else ''}|{data_fim.isoformat() if data_fim else ''}"
+
+    # -----------------------
+    # Versão dos dados
+    # -----------------------
+    def versao(self):
+        if not self.ativo:
+            return 0
+        if self.versao_dados:
+            return self.versao_dados()
+        return self._versao_do_arquivo(self._conexao())
+
+    @staticmethod
+    def _versao_do_arquivo(conn):
+        return conn.execute("SELECT valor FROM contador WHERE nome = 'versao'").fetchone()[0]
+
+    def invalidar(self):
+        """
+        Incrementa a versão do arquivo e descarta as entradas antigas. Chamado
+        depois do commit principal: com o arquivo ocupado além do timeout,
+        registra o aviso e segue (retorna False) em vez de falhar a requisição.
+        """
+        if not self.ativo:
+            return True
+        try:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE contador SET valor = valor + 1 WHERE nome = 'versao'")
+                conn.execute("DELETE FROM entrada")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            logger.warning("Cache %s: invalidação não gravada (%s)", self.caminho, e)
+            return False
+        return True
+
+    # -----------------------
+    # Leitura / gravação
+    # -----------------------
+    def obter(self, chave, versao):
+        """Valor da chave na versão informada, ou None. Só lê: hit/miss e LRU vão para a memória."""
+        if not self.ativo:
+            return None
+        linha = self._conexao().execute(
+            "SELECT valor FROM entrada WHERE chave = ? AND versao = ?", (chave, versao)
+        ).fetchone()
+        with self._trava:
+            self._pendentes["hits" if linha else "misses"] += 1
+            if linha:
+                self._acessos[chave] = time.time()
+            gravar_agora = time.monotonic() - self._ultima_gravacao >= INTERVALO_CONTADORES
+        if gravar_agora:
+            self._gravar_pendentes(esperar=False)
+        return json.loads(linha[0]) if linha else None
+
+    def _retirar_pendentes(self):
+        with self._trava:
+            pendentes, acessos = self._pendentes, self._acessos
+            self._pendentes, self._acessos = {"hits": 0, "misses": 0}, {}
+            self._ultima_gravacao = time.monotonic()
+        return pendentes, acessos
+
+    def _devolver_pendentes(self, pendentes, acessos):
+        with self._trava:
+            for nome, valor in pendentes.items():
+                self._pendentes[nome] += valor
+            for chave, instante in acessos.items():
+                self._acessos[chave] = max(instante, self._acessos.get(chave, 0))
+
+    def _aplicar_pendentes(self, conn, pendentes, acessos):
+        """Grava contadores e acessos pendentes (dentro de uma transação já aberta)."""
+        conn.executemany("UPDATE contador SET valor = valor + ? WHERE nome = ?",
+                         [(valor, nome) for nome, valor in pendentes.items() if valor])
+        conn.executemany("UPDATE entrada SET ultimo_acesso = max(ultimo_acesso, ?) WHERE chave = ?",
+                         [(instante, chave) for chave, instante in acessos.items()])
+
+    def _gravar_pendentes(self, esperar=True):
+        """
+        Melhor esforço: com esperar=False não aguarda o lock do arquivo; se
+        estiver ocupado, os pendentes voltam para a memória.
+        """
+        pendentes, acessos = self._retirar_pendentes()
+        if not any(pendentes.values()) and not acessos:
+            return
+        conn = self._conexao()
+        try:
+            if not esperar:
+                conn.execute("PRAGMA busy_timeout = 0")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._aplicar_pendentes(conn, pendentes, acessos)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError:
+            self._devolver_pendentes(pendentes, acessos)
+        finally:
+            if not esperar:
+                conn.execute("PRAGMA busy_timeout = 5000")
+
+    def gravar(self, chave, versao, valor):
+        """
+        Grava o valor calculado na versão `versao`, os contadores pendentes e
+        aplica o limite LRU. Arquivo ocupado: registra o aviso e não grava.
+        """
+        if not self.ativo:
+            return
+        pendentes, acessos = self._retirar_pendentes()
+        try:
+            conn = self._conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._aplicar_pendentes(conn, pendentes, acessos)
+                # Se os dados mudaram durante o cálculo, o valor já nasce velho: não grava
+                atual = self.versao_dados() if self.versao_dados else self._versao_do_arquivo(conn)
+                if atual == versao:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entrada (chave, versao, valor, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                        (chave, versao, json.dumps(valor), time.time())
+                    )
+                    conn.execute(
+                        "DELETE FROM entrada WHERE chave IN ("
+                        "  SELECT chave FROM entrada ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entradas,)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            self._devolver_pendentes(pendentes, acessos)
+            logger.warning("Cache %s: valor não gravado (%s)", self.caminho, e)
+
+    def obter_ou_calcular(self, data_inicio, data_fim, calcular):
+        """Devolve o valor em cache para o período ou calcula, grava e devolve."""
+        if not self.ativo:
+            return calcular()
+        chave = self.chave(data_inicio, data_fim)
+        versao = self.versao()
+        valor = self.obter(chave, versao)
+        if valor is None:
+            valor = calcular()
+            self.gravar(chave, versao, valor)
+        return valor
+
+    def estatisticas(self):
+        if not self.ativo:
+            return {"ativo": False}
+        self._gravar_pendentes(esperar=False)
+        conn = self._conexao()
+        contadores = dict(conn.execute("SELECT nome, valor FROM contador").fetchall())
+        entradas = conn.execute("SELECT COUNT(*) FROM entrada").fetchone()[0]
+        consultas = contadores["hits"] + contadores["misses"]
+        return {
+            "ativo": True,
+            "hits": contadores["hits"],
+            "misses": contadores["misses"],
+            "taxa_acerto": round(contadores["hits"] / consultas, 4) if consultas else None,
+            "entradas": entradas,
+            "max_entradas": self.max_entradas,
+            "versao_dados": self.versao(),
+        }
+
+
+__all__ = ["CacheRespostas", "MAX_ENTRADAS_PADRAO"]
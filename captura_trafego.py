@@ -0,0 +1,166 @@
+# captura_trafego.py
+# -----------------------
+# Captura de tráfego real para teste de carga (CAPTURA_TRAFEGO=1):
+#   - cada requisição vira uma linha JSON (instante, método, caminho,
+#     endpoint, query string, formulário/JSON, status, duração) num arquivo
+#     local com rotação, um por processo (<nome>.<pid>.jsonl, como o log do
+#     diagnostico_sql.py), lidos juntos depois pelo replay_trafego.py
+#   - sanitizada: campos sensíveis (senha, token, ...) mascarados em
+#     qualquer nível, textos longos cortados, arquivos enviados registrados só
+#     pelo nome do campo e tamanho, sem cabeçalhos nem cookies; o usuário
+#     entra só como "autenticado" (o replay usa as próprias credenciais)
+#   - estáticos, /metrics e o próprio replay (cabeçalho CABECALHO_REPLAY)
+#     ficam de fora
+# Desligada (padrão): nada é instalado.
+# -----------------------
+import glob
+import json
+import logging
+import os
+import re
+import time
+
+from flask import g, request
+from flask_login import current_user
+
+from diagnostico_sql import ArquivoPorProcesso
+
+CAMPOS_SENSIVEIS = ("senha", "password", "token", "secret", "segredo", "csrf", "authorization", "cookie", "email")
+MASCARA = "***"
+MAX_TEXTO = 500                      # caracteres por valor registrado
+TAMANHO_ARQUIVO_PADRAO = 50 * 1024 * 1024
+ARQUIVOS_PADRAO = 5
+ENDPOINTS_IGNORADOS = ("static", "metrics")
+CABECALHO_REPLAY = "X-Replay-Trafego"  # enviado pelo replay_trafego.py
+
+
+def _sensivel(chave):
+    chave = str(chave).lower()
+    return any(palavra in chave for palavra in CAMPOS_SENSIVEIS)
+
+
+def sanitizar(valor, chave=""):
+    """Cópia de `valor` com campos sensíveis mascarados e textos cortados."""
+    if _sensivel(chave):
+        return MASCARA
+    if isinstance(valor, dict):
+        return {k: sanitizar(v, k) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [sanitizar(v, chave) for v in valor]
+    if isinstance(valor, str) and len(valor) > MAX_TEXTO:
+        return valor[:MAX_TEXTO]
+    return valor
+
+
+def _multidict(dados):
+    """MultiDict → dict (lista só quando o campo se repete), sanitizado."""
+    return {chave: sanitizar(valores if len(valores) > 1 else valores[0], chave)
+            for chave, valores in dados.lists()}
+
+
+def registro_da_requisicao():
+    """Dict sanitizado da requisição atual (sem status/duração)."""
+    registro = {
+        "t": round(time.time(), 4),
+        "metodo": request.method,
+        "caminho": request.path,
+        "endpoint": request.endpoint,
+        "autenticado": bool(getattr(current_user, "is_authenticated", False)),
+    }
+    if request.args:
+        registro["args"] = _multidict(request.args)
+    if request.is_json:
+        registro["json"] = sanitizar(request.get_json(silent=True))
+    elif request.form:
+        registro["form"] = _multidict(request.form)
+    if request.files:
+        registro["arquivos"] = {}
+        for campo, arquivo in request.files.items():
+            tamanho = arquivo.stream.seek(0, os.SEEK_END)
+            arquivo.stream.seek(0)
+            registro["arquivos"][campo] = {"tamanho": tamanho, "tipo": arquivo.mimetype,
+                                           "extensao": os.path.splitext(arquivo.filename or "")[1]}
+    return registro
+
+
+class CapturaTrafego:
+    """Instalada por `instalar_captura_trafego`; fica em app.extensions["captura_trafego"]."""
+
+    def __init__(self, caminho, tamanho=TAMANHO_ARQUIVO_PADRAO, arquivos=ARQUIVOS_PADRAO):
+        self.caminho = caminho
+        self.logger = logging.getLogger(f"controle_producao.captura.{os.path.abspath(caminho)}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            # Um arquivo por processo: a rotação de um worker não corta a gravação de outro
+            handler = ArquivoPorProcesso(caminho, tamanho, arquivos)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def iniciar_requisicao(self):
+        if request.endpoint in ENDPOINTS_IGNORADOS or CABECALHO_REPLAY in request.headers:
+            return
+        g.captura_trafego = (time.perf_counter(), registro_da_requisicao())
+
+    def _gravar(self, status):
+        captura = g.pop("captura_trafego", None)
+        if captura is not None:
+            inicio, registro = captura
+            registro["status"] = status
+            registro["duracao_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+            self.logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+    def encerrar_requisicao(self, resposta):
+        self._gravar(resposta.status_code)
+        return resposta
+
+    def encerrar_com_erro(self, erro=None):
+        # Exceção não tratada: o after_request não roda, mas a requisição conta
+        self._gravar(500)
+
+
+def instalar_captura_trafego(app, caminho, tamanho=TAMANHO_ARQUIVO_PADRAO, arquivos=ARQUIVOS_PADRAO):
+    """Liga a captura no app (hooks before/after_request)."""
+    captura = CapturaTrafego(caminho, tamanho, arquivos)
+    app.extensions["captura_trafego"] = captura
+    app.before_request(captura.iniciar_requisicao)
+    app.after_request(captura.encerrar_requisicao)
+    app.teardown_request(captura.encerrar_com_erro)
+    return captura
+
+
+def arquivos_da_captura(caminho):
+    """
+    Arquivos da captura `caminho`: os de cada processo (<nome>.<pid><ext>) e
+    os girados (.1, .2, ...), além do próprio caminho se existir.
+    """
+    raiz, extensao = os.path.splitext(caminho)
+    do_processo = re.compile(re.escape(os.path.basename(raiz)) + r"\.\d+" + re.escape(extensao) + "$")
+    atuais = [caminho] + sorted(a for a in glob.glob(glob.escape(raiz) + ".*" + glob.escape(extensao))
+                                if do_processo.match(os.path.basename(a)))
+    arquivos = []
+    for atual in atuais:
+        girados = [a for a in glob.glob(glob.escape(atual) + ".*") if a.rsplit(".", 1)[1].isdigit()]
+        arquivos += [a for a in girados + [atual] if os.path.exists(a)]
+    return list(dict.fromkeys(arquivos))
+
+
+def ler_captura(caminho):
+    """
+    Registros de todos os arquivos da captura (processos e girados), em
+    ordem de instante. Linhas inválidas (gravação cortada) são ignoradas.
+    """
+    registros = []
+    for arquivo in arquivos_da_captura(caminho):
+        with open(arquivo, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    continue
+    registros.sort(key=lambda r: r.get("t", 0))
+    return registros
+
+
+__all__ = ["CAMPOS_SENSIVEIS", "MASCARA", "CABECALHO_REPLAY", "CapturaTrafego", "sanitizar", "registro_da_requisicao",
+           "instalar_captura_trafego", "arquivos_da_captura", "ler_captura"]
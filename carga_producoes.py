@@ -0,0 +1,150 @@
+# carga_producoes.py
+# -----------------------
+# Carga incremental (por marca d'água) de produção × consumo para o
+# DashEspumas.py. Em vez de refazer o join producao ⋈ componenteproducao ⋈
+# componente inteiro a cada atualização, guarda o último producao.id lido e
+# busca só:
+#   - as linhas de produções novas (id > marca d'água, pela chave primária)
+#   - o conjunto de produções canceladas (índice status/data, só leitura de índice)
+# A recarga completa só acontece se o esquema do banco mudar, se o banco for
+# trocado (marca d'água maior que o último id) ou quando pedida. Pode partir
+# de um snapshot Parquet (partir_do_snapshot) em vez do banco vazio.
+# -----------------------
+import sqlite3
+import threading
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+SQL_PRODUCOES = """
+SELECT
+    p.id AS producao_id_interno,
+    p.producao_id AS bloco,
+    p.data_producao,
+    p.tipo_espuma,
+    p.cor,
+    p.altura,
+    p.conformidade,
+    p.observacoes,
+    COALESCE(p.status, 'A') AS status,
+    c.nome AS componente,
+    cp.quantidade_usada
+FROM producao p
+LEFT JOIN componenteproducao cp ON p.id = cp.producao_id
+LEFT JOIN componente c ON cp.componente_id = c.id
+WHERE p.id > ?
+ORDER BY p.data_producao DESC
+"""
+
+SQL_CANCELADAS = "SELECT id FROM producao WHERE status = 'C'"
+
+
+# Poucos valores distintos e muitas linhas: categóricas (códigos inteiros)
+# ocupam uma fração da memória de strings object e agrupam pelos códigos.
+# `status` fica fora porque é alterado no lugar pelos cancelamentos.
+COLUNAS_CATEGORICAS = ["tipo_espuma", "componente", "cor", "conformidade"]
+
+
+def converter_tipos(df):
+    df["data_producao"] = pd.to_datetime(df["data_producao"], errors="coerce")
+    df["quantidade_usada"] = pd.to_numeric(df["quantidade_usada"], errors="coerce")
+    df["cor"] = df["cor"].astype(str)
+    df["altura"] = pd.to_numeric(df["altura"], errors="coerce")
+    df["tipo_espuma"] = df["tipo_espuma"].astype(str)
+    return df
+
+
+def categorizar(df):
+    """Converte COLUNAS_CATEGORICAS para category (no lugar) e devolve o frame."""
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("category")
+    return df
+
+
+def concatenar(frames):
+    """pd.concat preservando as categóricas (une as categorias em vez de cair para object)."""
+    frames = [f for f in frames if f is not None]
+    resultado = pd.concat(frames, ignore_index=True)
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in resultado.columns and resultado[coluna].dtype != "category":
+            # Categorias como object: o snapshot Parquet traz dtype "string", o banco object
+            partes = [f[coluna].astype("category") for f in frames]
+            resultado[coluna] = union_categoricals(
+                [p.cat.set_categories(p.cat.categories.astype(object)) for p in partes], ignore_order=True
+            )
+    return resultado
+
+
+class CargaIncremental:
+    """DataFrame de produção × consumo mantido por marca d'água (producao.id)."""
+
+    def __init__(self, caminho_banco):
+        self.caminho_banco = caminho_banco
+        self.df = None
+        self.marca_dagua = 0
+        self.versao_esquema = None
+        self.canceladas = frozenset()
+        self.ultima_carga = {"tipo": None, "linhas": 0}
+        self._trava = threading.Lock()
+
+    def partir_do_snapshot(self, df, manifesto):
+        """
+        Começa do histórico do snapshot Parquet (snapshot_parquet.py) em vez
+        de ler tudo do banco: as próximas atualizações buscam só as produções
+        acima da marca d'água do manifesto e as mudanças de cancelamento.
+        """
+        with self._trava:
+            self.df = df
+            self.marca_dagua = manifesto["marca_dagua"]
+            self.versao_esquema = manifesto["versao_esquema"]
+            self.canceladas = frozenset(manifesto["canceladas"])
+            self.ultima_carga = {"tipo": "snapshot", "linhas": len(df)}
+        return self
+
+    def _precisa_recarga(self, conn):
+        if self.df is None:
+            return True
+        versao_esquema = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if versao_esquema != self.versao_esquema:
+            return True
+        # Banco substituído/restaurado: o maior id ficou abaixo da marca d'água
+        maior_id = conn.execute("SELECT MAX(id) FROM producao").fetchone()[0] or 0
+        return maior_id < self.marca_dagua
+
+    def _ler(self, conn, a_partir_de):
+        return categorizar(converter_tipos(pd.read_sql_query(SQL_PRODUCOES, conn, params=(a_partir_de,))))
+
+    def atualizar(self, forcar=False):
+        """Aplica as novidades do banco ao DataFrame em memória e o devolve."""
+        with self._trava:
+            conn = sqlite3.connect(self.caminho_banco)
+            try:
+                if forcar or self._precisa_recarga(conn):
+                    self.df = self._ler(conn, 0)
+                    self.versao_esquema = conn.execute("PRAGMA schema_version").fetchone()[0]
+                    self.ultima_carga = {"tipo": "completa", "linhas": len(self.df)}
+                else:
+                    novas = self._ler(conn, self.marca_dagua)
+                    if not novas.empty:
+                        # Novas primeiro, mantendo a ordem por data decrescente da carga original
+                        self.df = concatenar([novas, self.df])
+                    self.ultima_carga = {"tipo": "incremental", "linhas": len(novas)}
+
+                if not self.df.empty:
+                    self.marca_dagua = int(self.df["producao_id_interno"].max())
+
+                # Mudanças de status: só cancelamentos (A → C) alteram linhas já carregadas
+                canceladas = frozenset(r[0] for r in conn.execute(SQL_CANCELADAS))
+                if canceladas != self.canceladas:
+                    ids = self.df["producao_id_interno"]
+                    self.df.loc[ids.isin(canceladas), "status"] = "C"
+                    self.df.loc[ids.isin(self.canceladas - canceladas), "status"] = "A"
+                    self.canceladas = canceladas
+            finally:
+                conn.close()
+            return self.df
+
+
+__all__ = ["CargaIncremental", "SQL_PRODUCOES", "SQL_CANCELADAS", "COLUNAS_CATEGORICAS",
+           "converter_tipos", "categorizar", "concatenar"]
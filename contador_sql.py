@@ -0,0 +1,55 @@
+# contador_sql.py
+# -----------------------
+# Contador de comandos SQL via eventos do SQLAlchemy. Usado pelos scripts de
+# verificação para garantir um número máximo de consultas por requisição
+# (pega regressões de N+1 / lazy load).
+# -----------------------
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class ContadorSQL:
+    """Acumula os comandos executados enquanto estiver ativo."""
+
+    def __init__(self):
+        self.comandos = []
+
+    @property
+    def total(self):
+        return len(self.comandos)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.comandos.append(statement)
+
+
+@contextmanager
+def contar_sql(engine):
+    """
+    Conta os comandos SQL executados no engine dentro do bloco:
+
+        with contar_sql(db.engine) as contador:
+            client.get("/controle-producao")
+        print(contador.total)
+    """
+    contador = ContadorSQL()
+    event.listen(engine, "before_cursor_execute", contador._registrar)
+    try:
+        yield contador
+    finally:
+        event.remove(engine, "before_cursor_execute", contador._registrar)
+
+
+def assert_max_consultas(engine, maximo, funcao, *args, **kwargs):
+    """
+    Executa `funcao` e levanta AssertionError se ela disparar mais de `maximo`
+    comandos SQL. Retorna (resultado, contador) para inspeção.
+    """
+    with contar_sql(engine) as contador:
+        resultado = funcao(*args, **kwargs)
+    if contador.total > maximo:
+        lista = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(contador.comandos))
+        raise AssertionError(f"{contador.total} comandos SQL (máximo {maximo}):\n{lista}")
+    return resultado, contador
+
+
+__all__ = ["ContadorSQL", "contar_sql", "assert_max_consultas"]
@@ -0,0 +1,272 @@
+# dados_sinteticos.py
+# ----------------------------------------------------------------
+# Gerador reprodutível de bancos SQLite para benchmark (mesma semente =
+# mesmo banco): tipos de espuma com ficha técnica, componentes, usuários,
+# produções com consumo, cancelamentos (com devolução), recebimentos
+# semanais e as tabelas derivadas coerentes com os dados (saldos do estoque,
+# rollup producao_diaria e perfis do assistente IA).
+#
+# As linhas são gravadas por executemany direto no sqlite3 (o ORM levaria
+# horas na escala de 1M); as tabelas derivadas saem das mesmas funções que o
+# app usa na manutenção.
+#
+# Uso:  python dados_sinteticos.py --escala 100k --banco /tmp/bench_100k.db
+#       python dados_sinteticos.py --blocos 5000 --tipos 4
+# ----------------------------------------------------------------
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+from models import db, PerfilFormulacao, TipoEspuma
+from perfil_formulacao import _aplicar_producao, atualizar_estatisticas_robustas
+from producao_diaria import recalcular_producao_diaria
+from estoque_ledger import reconciliar_saldos
+
+ESCALAS = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+SEMENTE_PADRAO = 42
+DATA_FINAL = date(2025, 12, 31)  # fixa: o banco não muda com o dia em que é gerado
+DIAS_PADRAO = 3 * 365
+EMAIL_PADRAO = "benchmark{}@bonsono.com.br"  # benchmark1@..., benchmark2@...
+SENHA_PADRAO = "benchmark"
+LOTE = 50_000  # linhas por executemany
+
+TIPOS = ["D20", "D23", "D26", "D28", "D33", "D45", "AG80", "D18", "D40", "D50"]
+CORES = ["BRANCA", "AZUL", "ROSA", "AMARELA", "VERDE"]
+# (nome, quantidade base por bloco); POLIOL e ÁGUA alimentam a relação água/poliol
+COMPONENTES = [("POLIOL", 100.0), ("ÁGUA", 4.5), ("TDI", 55.0), ("SILICONE", 1.2), ("AMINA", 0.3),
+               ("ESTANHO", 0.25), ("CLORETO", 8.0), ("CARBONATO", 20.0), ("CORANTE", 0.5), ("MELAMINA", 12.0)]
+PROPORCAO_NAO_CONFORME = 0.08
+PROPORCAO_CANCELADA = 0.02
+SOBRA_RECEBIMENTO = 1.10  # recebimento semanal = consumo da semana + 10%
+
+
+def _lotes(linhas, tamanho=LOTE):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _app_do_banco(caminho):
+    """App mínimo (só o db) para rodar as funções de manutenção no banco gerado."""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{caminho}"
+    db.init_app(app)
+    return app
+
+
+def _revisao_atual():
+    """Revisão head das migrações (o banco gerado já nasce "migrado"), ou None."""
+    try:
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        pasta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+        config = Config()
+        config.set_main_option("script_location", pasta)
+        return ScriptDirectory.from_config(config).get_current_head()
+    except Exception:
+        return None
+
+
+def gerar_banco(caminho, blocos, tipos=7, componentes=7, usuarios=5, dias=DIAS_PADRAO, semente=SEMENTE_PADRAO,
+                verbose=False):
+    """
+    Cria o banco em `caminho` (sobrescreve) com `blocos` produções. Retorna um
+    dict com as contagens por tabela.
+    """
+    if not 1 <= tipos <= len(TIPOS) or not 2 <= componentes <= len(COMPONENTES):
+        raise ValueError(f"tipos em 1..{len(TIPOS)} e componentes em 2..{len(COMPONENTES)}")
+    rng = random.Random(semente)
+    inicio_geracao = time.perf_counter()
+
+    def log(mensagem):
+        if verbose:
+            print(f"  [{time.perf_counter() - inicio_geracao:6.1f}s] {mensagem}")
+
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    engine = create_engine(f"sqlite:///{caminho}")
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=OFF")  # banco descartável: sem journal durante a carga
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+
+    # -----------------------
+    # Cadastros
+    # -----------------------
+    from werkzeug.security import generate_password_hash
+    senha_hash = generate_password_hash(SENHA_PADRAO)
+    conn.executemany("INSERT INTO usuario (id, nome, email, senha_hash, ativo) VALUES (?, ?, ?, ?, 1)",
+                     [(i, f"Benchmark {i}", EMAIL_PADRAO.format(i), senha_hash) for i in range(1, usuarios + 1)])
+
+    componentes_base = COMPONENTES[:componentes]
+    conn.executemany("INSERT INTO componente (id, nome, ativo) VALUES (?, ?, 1)",
+                     [(i, nome) for i, (nome, _) in enumerate(componentes_base, 1)])
+
+    # Formulação de cada tipo: POLIOL/ÁGUA/TDI sempre; os demais com 70% de chance
+    formulacoes = {}
+    for tipo_id, nome in enumerate(TIPOS[:tipos], 1):
+        fator = rng.uniform(0.8, 1.3)
+        formulacoes[tipo_id] = [(cid, base * fator * rng.uniform(0.9, 1.1))
+                                for cid, (_, base) in enumerate(componentes_base, 1)
+                                if cid <= 3 or rng.random() < 0.7]
+        conn.execute("INSERT INTO tipo_espuma (id, nome) VALUES (?, ?)", (tipo_id, nome))
+        conn.execute("INSERT INTO ficha_tecnica (id, tipo_espuma_id, descricao) VALUES (?, ?, ?)",
+                     (tipo_id, tipo_id, f"Ficha {nome}"))
+        conn.executemany("INSERT INTO ficha_tecnica_componente (ficha_tecnica_id, componente_id) VALUES (?, ?)",
+                         [(tipo_id, cid) for cid, _ in formulacoes[tipo_id]])
+    nomes_tipo = dict(enumerate(TIPOS[:tipos], 1))
+    nomes_componente = {cid: nome for cid, (nome, _) in enumerate(componentes_base, 1)}
+    log(f"cadastros: {tipos} tipos, {componentes} componentes, {usuarios} usuários")
+
+    # -----------------------
+    # Produções + consumo + saídas (e devolução dos cancelamentos)
+    # -----------------------
+    data_inicial = DATA_FINAL - timedelta(days=dias - 1)
+    consumo_semana = {}  # (semana, componente_id) → quantidade
+    perfis = {tipo_id: PerfilFormulacao(tipo_espuma_id=tipo_id, total=0, nao_conformes=0, altura_n=0,
+                                        altura_media=0.0, altura_m2=0.0, relacao_n=0, relacao_media=0.0,
+                                        relacao_m2=0.0, componentes={})
+              for tipo_id in formulacoes}
+
+    def producoes():
+        # Datas em ordem (como no uso real): o id cresce com a data
+        for producao_id in range(1, blocos + 1):
+            yield producao_id, data_inicial + timedelta(days=(producao_id - 1) * dias // blocos)
+
+    contagem = {"producao": 0, "componenteproducao": 0, "movimentacao": 0}
+    for lote in _lotes(producoes()):
+        linhas_producao, linhas_consumo, linhas_mov = [], [], []
+        for producao_id, data_producao in lote:
+            data_iso = data_producao.isoformat()
+            tipo_id = rng.randint(1, tipos)
+            conformidade = "Não Conforme" if rng.random() < PROPORCAO_NAO_CONFORME else "Conforme"
+            status = "C" if rng.random() < PROPORCAO_CANCELADA else "A"
+            altura = round(rng.uniform(60, 120), 1)
+            linhas_producao.append((producao_id, f"B{producao_id:07d}", data_iso, nomes_tipo[tipo_id],
+                                    rng.choice(CORES), conformidade, altura, rng.randint(1, usuarios), status))
+            itens = []
+            for cid, base in formulacoes[tipo_id]:
+                quantidade = round(base * rng.gauss(1.0, 0.04), 3)
+                itens.append((cid, nomes_componente[cid], quantidade))
+                linhas_consumo.append((producao_id, cid, quantidade))
+                linhas_mov.append((cid, "saida", quantidade, data_iso, producao_id, None))
+                semana = (data_producao - data_inicial).days // 7
+                consumo_semana[(semana, cid)] = consumo_semana.get((semana, cid), 0.0) + quantidade
+                if status == "C":
+                    linhas_mov.append((cid, "entrada", quantidade, data_iso, producao_id,
+                                       f"Cancelamento da produção B{producao_id:07d}"))
+            if status == "A":
+                _aplicar_producao(perfis[tipo_id], SimpleNamespace(conformidade=conformidade, altura=altura), itens)
+
+        conn.executemany(
+            "INSERT INTO producao (id, producao_id, data_producao, tipo_espuma, cor, conformidade, altura, "
+            "usuario_id, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas_producao)
+        conn.executemany("INSERT INTO componenteproducao (producao_id, componente_id, quantidade_usada) "
+                         "VALUES (?, ?, ?)", linhas_consumo)
+        conn.executemany("INSERT INTO movimentacao (componente_id, tipo, quantidade, data, producao_id, observacao) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", linhas_mov)
+        contagem["producao"] += len(linhas_producao)
+        contagem["componenteproducao"] += len(linhas_consumo)
+        contagem["movimentacao"] += len(linhas_mov)
+        log(f"produções: {contagem['producao']}/{blocos}")
+
+    # -----------------------
+    # Recebimentos semanais (cobrem o consumo da semana com sobra)
+    # -----------------------
+    semanas = sorted({semana for semana, _ in consumo_semana})
+    for semana in semanas:
+        data_recebimento = (data_inicial + timedelta(days=semana * 7)).isoformat()
+        numero = f"NF{semana + 1:05d}"
+        recebimento_id = conn.execute(
+            "INSERT INTO recebimento_estoque (numero_documento, fornecedor, data, status, usuario_id, criado_em) "
+            "VALUES (?, ?, ?, 'A', 1, ?)", (numero, "Fornecedor Benchmark", data_recebimento, f"{data_recebimento} 00:00:00.000000")
+        ).lastrowid
+        linhas = [(cid, "entrada", round(consumo_semana[(semana, cid)] * SOBRA_RECEBIMENTO, 3), data_recebimento,
+                   recebimento_id, f"Recebimento {numero}")
+                  for cid in nomes_componente if (semana, cid) in consumo_semana]
+        conn.executemany("INSERT INTO movimentacao (componente_id, tipo, quantidade, data, recebimento_id, "
+                         "observacao) VALUES (?, ?, ?, ?, ?, ?)", linhas)
+        contagem["movimentacao"] += len(linhas)
+    contagem["recebimento_estoque"] = len(semanas)
+    conn.executemany("INSERT INTO estoque (componente_id, quantidade) VALUES (?, 0)",
+                     [(cid,) for cid in nomes_componente])
+    revisao = _revisao_atual()
+    if revisao:
+        conn.execute("CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)")
+        conn.execute("INSERT INTO alembic_version (version_num) VALUES (?)", (revisao,))
+    conn.commit()
+    conn.close()
+    log(f"recebimentos: {len(semanas)}")
+
+    # -----------------------
+    # Tabelas derivadas, pelas funções de manutenção do app
+    # -----------------------
+    app = _app_do_banco(caminho)
+    with app.app_context():
+        reconciliar_saldos()
+        contagem["producao_diaria"] = recalcular_producao_diaria()
+        nomes = dict(db.session.query(TipoEspuma.id, TipoEspuma.nome))
+        for tipo_id, perfil in perfis.items():
+            if perfil.total:
+                db.session.add(perfil)
+                atualizar_estatisticas_robustas(perfil, nomes[tipo_id])
+        db.session.commit()
+        contagem["perfil_formulacao"] = sum(1 for p in perfis.values() if p.total)
+        db.session.remove()
+        db.engine.dispose()
+    log("saldos, rollup diário e perfis recalculados")
+
+    conn = sqlite3.connect(caminho)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    log("concluído")
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco sintético para benchmark.")
+    escala = parser.add_mutually_exclusive_group()
+    escala.add_argument("--escala", choices=sorted(ESCALAS), default="1k")
+    escala.add_argument("--blocos", type=int, help="número de produções (em vez de --escala)")
+    parser.add_argument("--banco", help="arquivo de saída (padrão: temporário)")
+    parser.add_argument("--tipos", type=int, default=7)
+    parser.add_argument("--componentes", type=int, default=7)
+    parser.add_argument("--usuarios", type=int, default=5)
+    parser.add_argument("--dias", type=int, default=DIAS_PADRAO)
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    args = parser.parse_args()
+
+    blocos = args.blocos or ESCALAS[args.escala]
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), f"sintetico_{blocos}.db")
+    print(f"Gerando {blocos} produções em {caminho}")
+    inicio = time.perf_counter()
+    contagem = gerar_banco(caminho, blocos, args.tipos, args.componentes, args.usuarios, args.dias, args.semente,
+                           verbose=True)
+    for tabela, linhas in contagem.items():
+        print(f"  {tabela:<22} {linhas:>12,}")
+    print(f"✅ {caminho} ({os.path.getsize(caminho) / 1024 ** 2:.1f} MB) em {time.perf_counter() - inicio:.1f}s")
+    print(f"   login: {EMAIL_PADRAO.format(1)} / {SENHA_PADRAO}")
+
+
+__all__ = ["ESCALAS", "EMAIL_PADRAO", "SENHA_PADRAO", "DATA_FINAL", "gerar_banco"]
+
+if __name__ == "__main__":
+    main()
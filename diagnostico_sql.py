@@ -0,0 +1,245 @@
+# diagnostico_sql.py
+# -----------------------
+# Modo de diagnóstico de SQL (desenvolvimento/perfilamento, SQL_DIAGNOSTICO=1):
+#   - eventos before/after_cursor_execute agrupam os comandos de cada
+#     requisição pelo SQL normalizado (literais → ?, listas IN colapsadas)
+#   - N+1: o mesmo SQL normalizado repetido >= `minimo_repeticoes` vezes na
+#     requisição, com parâmetros diferentes, vira um aviso com o local de
+#     chamada (arquivo:linha da 1ª chamada no código do projeto)
+#   - comando lento (>= `lenta_ms`): registrado com a duração, os
+#     parâmetros, o local de chamada e o EXPLAIN QUERY PLAN (SQLite)
+#   - tudo vai para um arquivo com rotação POR PROCESSO (<nome>.<pid>.log):
+#     RotatingFileHandler não é seguro com vários processos no mesmo arquivo
+#     (um worker gira e os outros continuam gravando no arquivo renomeado)
+# Comandos fora de requisição (tarefas em segundo plano, CLI) entram só no
+# log de lentos, sem agrupamento.
+# -----------------------
+import logging
+import os
+import re
+import sys
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+LENTA_MS_PADRAO = 100
+MINIMO_REPETICOES_PADRAO = 5
+TAMANHO_LOG_PADRAO = 5 * 1024 * 1024  # bytes por arquivo antes de girar
+ARQUIVOS_LOG_PADRAO = 3               # arquivos antigos mantidos (.1, .2, .3)
+MAX_PARAMETROS_LOG = 300              # caracteres dos parâmetros no log
+CHAVE_INICIO = "diagnostico_sql_inicio"
+
+_DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+_ESTE_ARQUIVO = os.path.abspath(__file__)
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql):
+    """
+    SQL sem literais e com espaços colapsados: comandos que só mudam os
+    valores (ids, listas IN de qualquer tamanho) caem no mesmo grupo.
+    """
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_LISTA.sub("(?...)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+def local_de_chamada():
+    """
+    "arquivo.py:linha em funcao" do frame mais interno do projeto (fora de
+    bibliotecas e deste módulo), ou None.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        arquivo = os.path.abspath(frame.f_code.co_filename)
+        if (arquivo != _ESTE_ARQUIVO and arquivo.startswith(_DIRETORIO_PROJETO + os.sep)
+                and "site-packages" not in arquivo):
+            return f"{os.path.relpath(arquivo, _DIRETORIO_PROJETO)}:{frame.f_lineno} em {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _resumir(parametros):
+    texto = repr(parametros)
+    return texto if len(texto) <= MAX_PARAMETROS_LOG else texto[:MAX_PARAMETROS_LOG] + "..."
+
+
+class _Grupo:
+    """Comandos de uma requisição com o mesmo SQL normalizado."""
+    __slots__ = ("sql", "quantidade", "segundos", "parametros", "local")
+
+    def __init__(self, sql, local):
+        self.sql = sql
+        self.quantidade = 0
+        self.segundos = 0.0
+        self.parametros = set()
+        self.local = local
+
+
+class DiagnosticoSQL:
+    """
+    Instalado por `instalar_diagnostico_sql`; fica em
+    app.extensions["diagnostico_sql"]. `logger` recebe os avisos.
+    """
+
+    def __init__(self, logger, lenta_ms=LENTA_MS_PADRAO, minimo_repeticoes=MINIMO_REPETICOES_PADRAO):
+        self.logger = logger
+        self.lenta_segundos = lenta_ms / 1000.0
+        self.minimo_repeticoes = minimo_repeticoes
+        self.n_mais_1 = 0  # avisos emitidos (para os scripts de verificação)
+        self.lentas = 0
+
+    # -----------------------
+    # Eventos do SQLAlchemy
+    # -----------------------
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(CHAVE_INICIO, []).append(time.perf_counter())
+
+    def _depois(self, conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get(CHAVE_INICIO)
+        if not inicios:
+            return
+        duracao = time.perf_counter() - inicios.pop()
+        grupos = g.get("diagnostico_sql") if has_app_context() else None
+
+        local = None
+        if grupos is not None:
+            normalizado = normalizar_sql(statement)
+            grupo = grupos.get(normalizado)
+            if grupo is None:
+                local = local_de_chamada()
+                grupo = grupos[normalizado] = _Grupo(normalizado, local)
+            grupo.quantidade += 1
+            grupo.segundos += duracao
+            if len(grupo.parametros) < self.minimo_repeticoes:
+                grupo.parametros.add(repr(parameters))
+
+        if duracao >= self.lenta_segundos:
+            self._registrar_lenta(conn, statement, parameters, executemany, duracao, local or local_de_chamada())
+
+    # -----------------------
+    # Comando lento
+    # -----------------------
+    def _plano(self, conn, statement, parameters, executemany):
+        """EXPLAIN QUERY PLAN pela conexão DBAPI (não dispara os eventos)."""
+        if conn.dialect.name != "sqlite":
+            return None
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+            linhas = cursor.fetchall()
+        except Exception as e:  # comando que o EXPLAIN não aceita: registra o motivo
+            return f"    (sem plano: {e})"
+        finally:
+            cursor.close()
+        # (id, parent, notused, detail): indenta pela árvore do plano
+        nivel = {0: 0}
+        saida = []
+        for id_, pai, _, detalhe in linhas:
+            nivel[id_] = nivel.get(pai, 0) + 1
+            saida.append("    " + "  " * nivel[id_] + detalhe)
+        return "\n".join(saida)
+
+    def _registrar_lenta(self, conn, statement, parameters, executemany, duracao, local):
+        self.lentas += 1
+        plano = self._plano(conn, statement, parameters, executemany)
+        self.logger.warning(
+            "SQL LENTO %.1f ms | %s | %s\n  %s\n  parâmetros: %s%s",
+            duracao * 1000, _rota_atual(), local or "-", _RE_ESPACOS.sub(" ", statement).strip(),
+            _resumir(parameters), f"\n  plano:\n{plano}" if plano else ""
+        )
+
+    # -----------------------
+    # Requisição
+    # -----------------------
+    def iniciar_requisicao(self):
+        g.diagnostico_sql = {}
+
+    def encerrar_requisicao(self, _erro=None):
+        grupos = g.pop("diagnostico_sql", None)
+        if not grupos:
+            return
+        for grupo in grupos.values():
+            if grupo.quantidade >= self.minimo_repeticoes and len(grupo.parametros) > 1:
+                self.n_mais_1 += 1
+                self.logger.warning(
+                    "N+1 %d× (%.1f ms) | %s | %s\n  %s",
+                    grupo.quantidade, grupo.segundos * 1000, _rota_atual(), grupo.local or "-", grupo.sql
+                )
+
+
+def _rota_atual():
+    try:
+        return f"{request.method} {request.path} ({request.endpoint})"
+    except RuntimeError:  # fora de requisição (tarefa em segundo plano, CLI)
+        return "<fora de requisição>"
+
+
+def arquivo_do_processo(caminho, pid=None):
+    """"dir/nome.ext" → "dir/nome.<pid>.ext": um arquivo por processo."""
+    raiz, extensao = os.path.splitext(caminho)
+    return f"{raiz}.{pid or os.getpid()}{extensao}"
+
+
+class ArquivoPorProcesso(RotatingFileHandler):
+    """
+    RotatingFileHandler em arquivo_do_processo(caminho): cada processo gira só
+    o próprio arquivo. Se o processo mudar depois de instalado (fork do
+    gunicorn --preload), o filho passa a gravar no arquivo do seu pid.
+    """
+
+    def __init__(self, caminho, tamanho, arquivos):
+        self.caminho_base = caminho
+        self.pid = os.getpid()
+        super().__init__(arquivo_do_processo(caminho, self.pid), maxBytes=tamanho, backupCount=arquivos,
+                         encoding="utf-8", delay=True)
+
+    def emit(self, record):
+        pid = os.getpid()
+        if pid != self.pid:
+            self.pid = pid
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(arquivo_do_processo(self.caminho_base, pid))
+        super().emit(record)
+
+
+def logger_rotativo(caminho, tamanho=TAMANHO_LOG_PADRAO, arquivos=ARQUIVOS_LOG_PADRAO):
+    """Logger próprio (não propaga para o log do app) gravando no arquivo deste processo."""
+    logger = logging.getLogger(f"controle_producao.sql.{os.path.abspath(caminho)}")
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = ArquivoPorProcesso(caminho, tamanho, arquivos)
+        handler.setFormatter(logging.Formatter("%(asctime)s [%(process)d] %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+def instalar_diagnostico_sql(app, engine, caminho, lenta_ms=LENTA_MS_PADRAO,
+                             minimo_repeticoes=MINIMO_REPETICOES_PADRAO):
+    """
+    Liga o diagnóstico no app: hooks de requisição + eventos de SQL no engine.
+    Retorna o DiagnosticoSQL (também em app.extensions["diagnostico_sql"]).
+    """
+    diagnostico = DiagnosticoSQL(logger_rotativo(caminho), lenta_ms, minimo_repeticoes)
+    app.extensions["diagnostico_sql"] = diagnostico
+    app.before_request(diagnostico.iniciar_requisicao)
+    app.teardown_request(diagnostico.encerrar_requisicao)
+    event.listen(engine, "before_cursor_execute", diagnostico._antes)
+    event.listen(engine, "after_cursor_execute", diagnostico._depois)
+    return diagnostico
+
+
+__all__ = ["LENTA_MS_PADRAO", "MINIMO_REPETICOES_PADRAO", "DiagnosticoSQL", "normalizar_sql", "local_de_chamada",
+           "arquivo_do_processo", "ArquivoPorProcesso", "logger_rotativo", "instalar_diagnostico_sql"]
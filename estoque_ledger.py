@@ -0,0 +1,285 @@
+# estoque_ledger.py
+# -----------------------
+# Razão de estoque: mantém Estoque.quantidade sincronizado com as
+# movimentações aplicando o delta na mesma transação do lançamento.
+# -----------------------
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, case, exists, select, update, insert
+from sqlalchemy.exc import OperationalError
+from models import db, Estoque, Movimentacao, RecebimentoEstoque
+
+TENTATIVAS_OCUPADO = 5
+ESPERA_INICIAL_OCUPADO = 0.05  # s, dobra a cada tentativa (com jitter)
+
+
+def delta_movimentacao(tipo, quantidade):
+    """Converte o tipo da movimentação ('entrada'/'saida') no delta de saldo."""
+    if tipo == 'entrada':
+        return quantidade
+    if tipo == 'saida':
+        return -quantidade
+    return 0
+
+
+def aplicar_delta(componente_id, delta):
+    """
+    Soma `delta` ao saldo do componente sem ler o registro antes (UPDATE atômico).
+    Cria o registro de estoque se ainda não existir. Não faz commit.
+    """
+    resultado = db.session.execute(
+        update(Estoque)
+        .where(Estoque.componente_id == componente_id)
+        .values(quantidade=Estoque.quantidade + delta)
+    )
+    if resultado.rowcount == 0:
+        db.session.add(Estoque(componente_id=componente_id, quantidade=delta))
+        db.session.flush()
+
+
+def registrar_movimentacao(componente_id, tipo, quantidade, **campos):
+    """
+    Lança uma Movimentacao e atualiza o saldo pelo delta correspondente.
+    Campos extras (data, producao_id, observacao) vão direto para a Movimentacao.
+    Não faz commit: quem chama decide o fim da transação.
+    """
+    mov = Movimentacao(componente_id=componente_id, tipo=tipo, quantidade=quantidade, **campos)
+    db.session.add(mov)
+    aplicar_delta(componente_id, delta_movimentacao(tipo, quantidade))
+    return mov
+
+
+def aplicar_deltas(deltas):
+    """
+    Aplica vários deltas {componente_id: delta} com um único UPDATE ... CASE.
+    Cria os registros de estoque que faltarem. Não faz commit nem sincroniza
+    objetos Estoque já carregados na sessão (recarregue-os se precisar do saldo).
+    """
+    deltas = {cid: d for cid, d in deltas.items() if d}
+    if not deltas:
+        return
+
+    resultado = db.session.execute(
+        update(Estoque)
+        .where(Estoque.componente_id.in_(deltas))
+        .values(quantidade=Estoque.quantidade + case(deltas, value=Estoque.componente_id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount < len(deltas):
+        existentes = {cid for (cid,) in db.session.query(Estoque.componente_id)
+                      .filter(Estoque.componente_id.in_(deltas))}
+        for cid in deltas.keys() - existentes:
+            db.session.add(Estoque(componente_id=cid, quantidade=deltas[cid]))
+        db.session.flush()
+
+
+def registrar_movimentacoes(lancamentos):
+    """
+    Versão em lote de registrar_movimentacao: `lancamentos` é uma lista de dicts
+    com componente_id, tipo, quantidade (+ data, producao_id, observacao).
+    Um INSERT em lote para as movimentações e um UPDATE para os saldos.
+    Não faz commit.
+    """
+    if not lancamentos:
+        return
+
+    db.session.execute(insert(Movimentacao), lancamentos)
+
+    deltas = defaultdict(float)
+    for lanc in lancamentos:
+        deltas[lanc["componente_id"]] += delta_movimentacao(lanc["tipo"], lanc["quantidade"])
+    aplicar_deltas(deltas)
+
+
+# -----------------------
+# Baixa condicional (lançamento de produção)
+# -----------------------
+def baixar_saldos(consumos):
+    """
+    Baixa {componente_id: quantidade} dos saldos sem lê-los antes: um único
+    UPDATE ... WHERE quantidade >= consumo (checagem e subtração no mesmo
+    comando, sem janela para outro lançamento passar no meio).
+    Retorna os componentes sem saldo; se a lista não for vazia quem chama
+    deve fazer rollback (o UPDATE pode ter baixado parte dos componentes).
+    Não grava movimentações nem faz commit.
+    """
+    consumos = {cid: qtd for cid, qtd in consumos.items() if qtd > 0}
+    if not consumos:
+        return []
+
+    consumo = case(consumos, value=Estoque.componente_id)
+    baixados = set(db.session.execute(
+        update(Estoque)
+        .where(Estoque.componente_id.in_(consumos), Estoque.quantidade >= consumo)
+        .values(quantidade=Estoque.quantidade - consumo)
+        .returning(Estoque.componente_id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    return [cid for cid in consumos if cid not in baixados]
+
+
+def baixar_estoque(consumos, **campos):
+    """
+    baixar_saldos + INSERT em lote de uma saída por componente. Campos extras
+    (data, producao_id, observacao) vão para todas as movimentações.
+    Retorna os componentes sem saldo (nada lançado; faça rollback). Não faz commit.
+    """
+    faltas = baixar_saldos(consumos)
+    if faltas:
+        return faltas
+
+    lancamentos = [dict(campos, componente_id=cid, tipo='saida', quantidade=qtd)
+                   for cid, qtd in consumos.items() if qtd > 0]
+    if lancamentos:
+        db.session.execute(insert(Movimentacao), lancamentos)
+    return []
+
+
+def banco_ocupado(erro):
+    """True para SQLITE_BUSY/SQLITE_LOCKED ("database is locked")."""
+    mensagem = str(getattr(erro, "orig", erro)).lower()
+    return "locked" in mensagem or "busy" in mensagem
+
+
+def repetir_se_ocupado(funcao, tentativas=TENTATIVAS_OCUPADO, espera=ESPERA_INICIAL_OCUPADO):
+    """
+    Executa a unidade de trabalho `funcao()` (que faz o próprio commit) e, se o
+    SQLite responder "database is locked" — busy_timeout esgotado ou leitura
+    WAL desatualizada ao virar escrita —, faz rollback e repete com espera
+    exponencial. Outros erros e a última tentativa sobem normalmente.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return funcao()
+        except OperationalError as e:
+            db.session.rollback()
+            if tentativa == tentativas or not banco_ocupado(e):
+                raise
+            time.sleep(espera * 2 ** (tentativa - 1) * (0.5 + random.random()))
+
+
+# -----------------------
+# Recebimento (documento com várias linhas)
+# -----------------------
+def lancar_recebimento(recebimento, linhas):
+    """
+    Grava o documento e todas as linhas [(componente_id, quantidade)] como
+    entradas: um INSERT em lote de movimentações + um UPDATE de saldos.
+    Não faz commit.
+    """
+    db.session.add(recebimento)
+    db.session.flush()  # id do documento para as linhas
+
+    referencia = recebimento.numero_documento or f"#{recebimento.id}"
+    registrar_movimentacoes([
+        {
+            'componente_id': componente_id,
+            'tipo': 'entrada',
+            'quantidade': quantidade,
+            'data': recebimento.data,
+            'recebimento_id': recebimento.id,
+            'observacao': f"Recebimento {referencia}"
+        }
+        for componente_id, quantidade in linhas
+    ])
+    return recebimento
+
+
+def estornar_recebimento(recebimento):
+    """
+    Estorna o documento inteiro sem ler saldos antes de escrever:
+      1. reivindica o documento (UPDATE ... SET status='E' WHERE status != 'E');
+         se outro estorno chegou antes, nada é alterado e retorna None
+      2. baixa as entradas pelo mesmo UPDATE condicional do lançamento de
+         produção (baixar_estoque) e lança as saídas
+    Se algum componente não tiver saldo para devolver, retorna
+    [(componente_id, saldo, necessario)] e quem chama deve fazer rollback.
+    Retorna [] no sucesso. Não faz commit.
+    """
+    agora = datetime.now()
+    reivindicado = db.session.execute(
+        update(RecebimentoEstoque)
+        .where(RecebimentoEstoque.id == recebimento.id, RecebimentoEstoque.status != 'E')
+        .values(status='E', estornado_em=agora)
+    ).rowcount
+    if not reivindicado:
+        return None
+
+    por_componente = defaultdict(float)
+    for componente_id, quantidade in (
+        db.session.query(Movimentacao.componente_id, Movimentacao.quantidade)
+        .filter(Movimentacao.recebimento_id == recebimento.id, Movimentacao.tipo == 'entrada')
+    ):
+        por_componente[componente_id] += quantidade
+
+    referencia = recebimento.numero_documento or f"#{recebimento.id}"
+    faltas = baixar_estoque(por_componente, data=agora.date(), recebimento_id=recebimento.id,
+                            observacao=f"Estorno do recebimento {referencia}")
+    if faltas:
+        # Só para a mensagem: os componentes em falta não foram baixados
+        saldos = dict(db.session.query(Estoque.componente_id, Estoque.quantidade)
+                      .filter(Estoque.componente_id.in_(faltas)))
+        return [(cid, saldos.get(cid, 0), por_componente[cid]) for cid in faltas]
+    return []
+
+
+def saldo_atual(componente_id):
+    """Saldo de um componente (0 se não houver registro de estoque)."""
+    saldo = db.session.query(Estoque.quantidade).filter_by(componente_id=componente_id).scalar()
+    return saldo or 0
+
+
+def saldos_atuais():
+    """Mapa {componente_id: quantidade} em uma única consulta, sem escrita."""
+    return dict(db.session.query(Estoque.componente_id, Estoque.quantidade).all())
+
+
+def reconciliar_saldos():
+    """
+    Reconstrói todos os saldos a partir do histórico completo de movimentações.
+    Uso raro (correção manual / manutenção): varre a tabela inteira e faz commit.
+    Retorna a lista de (componente_id, saldo_anterior, saldo_novo) que divergiam.
+
+    Tudo numa transação que começa por uma escrita (o INSERT dos componentes
+    sem linha de estoque): o lock de escrita é tomado antes de ler os saldos,
+    então nenhum lançamento concorrente cabe entre a leitura e o UPDATE
+    set-based — o saldo gravado é sempre a soma de todas as movimentações.
+    """
+    saldo = func.sum(case(
+        (Movimentacao.tipo == 'entrada', Movimentacao.quantidade),
+        (Movimentacao.tipo == 'saida', -Movimentacao.quantidade),
+        else_=0
+    ))
+    saldos = select(Movimentacao.componente_id, saldo.label('saldo')).group_by(Movimentacao.componente_id).subquery()
+    saldo_do_componente = (select(saldo).where(Movimentacao.componente_id == Estoque.componente_id)
+                           .scalar_subquery())
+
+    def reconciliar():
+        novos = db.session.execute(
+            insert(Estoque)
+            .from_select(['componente_id', 'quantidade'],
+                         select(saldos.c.componente_id, saldos.c.saldo)
+                         .where(~exists().where(Estoque.componente_id == saldos.c.componente_id)))
+            .returning(Estoque.componente_id, Estoque.quantidade)
+        ).all()
+        divergencias = db.session.execute(
+            select(Estoque.componente_id, Estoque.quantidade, saldos.c.saldo)
+            .join(saldos, saldos.c.componente_id == Estoque.componente_id)
+            .where(Estoque.quantidade != saldos.c.saldo)
+        ).all()
+        if divergencias:
+            db.session.execute(
+                update(Estoque)
+                .where(Estoque.componente_id.in_([cid for cid, _, _ in divergencias]))
+                .values(quantidade=saldo_do_componente)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return [tuple(d) for d in divergencias] + [(cid, None, novo) for cid, novo in novos]
+
+    return repetir_se_ocupado(reconciliar)
+
+
+__all__ = ["delta_movimentacao", "aplicar_delta", "aplicar_deltas", "registrar_movimentacao", "registrar_movimentacoes", "baixar_saldos", "baixar_estoque", "banco_ocupado", "repetir_se_ocupado", "lancar_recebimento", "estornar_recebimento", "saldo_atual", "saldos_atuais", "reconciliar_saldos"]
@@ -0,0 +1,172 @@
+# exportacao.py
+# -----------------------
+# Exportação em fluxo (CSV/XLSX) de produções, consumo e movimentações.
+#   - SELECT só das colunas exportadas (sem objetos ORM), lido em lotes com
+#     yield_per: a memória não cresce com o período exportado
+#   - CSV: gerador que devolve um pedaço de texto a cada lote
+#   - XLSX: openpyxl write_only (linhas vão para disco) e o arquivo final é
+#     enviado em pedaços
+# -----------------------
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import select
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX opcional: sem openpyxl só o CSV fica disponível
+    Workbook = None
+
+from models import db, Producao, ComponenteProducao, Componente, Movimentacao, Usuario
+from producao_lista import filtros_da_requisicao
+
+LINHAS_POR_LOTE = 1000
+BYTES_POR_PEDACO = 64 * 1024
+FORMATOS = {"csv": "text/csv; charset=utf-8",
+            "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+
+
+# -----------------------
+# Consultas (colunas, statement) por conjunto
+# -----------------------
+def _filtrar_producao(stmt, filtros):
+    if not filtros.get("incluir_canceladas"):
+        stmt = stmt.where(Producao.status != "C")
+    if filtros.get("data_inicio"):
+        stmt = stmt.where(Producao.data_producao >= filtros["data_inicio"])
+    if filtros.get("data_fim"):
+        stmt = stmt.where(Producao.data_producao <= filtros["data_fim"])
+    if filtros.get("tipo_espuma"):
+        stmt = stmt.where(Producao.tipo_espuma == filtros["tipo_espuma"])
+    if filtros.get("conformidade"):
+        stmt = stmt.where(Producao.conformidade == filtros["conformidade"])
+    if filtros.get("bloco"):
+        stmt = stmt.where(Producao.producao_id.contains(filtros["bloco"]))
+    return stmt
+
+
+def _producoes(filtros):
+    colunas = ["Bloco", "Data", "Tipo", "Cor", "Altura (cm)", "Conformidade", "Status", "Observações", "Usuário"]
+    stmt = (
+        select(Producao.producao_id, Producao.data_producao, Producao.tipo_espuma, Producao.cor,
+               Producao.altura, Producao.conformidade, Producao.status, Producao.observacoes, Usuario.nome)
+        .outerjoin(Usuario, Usuario.id == Producao.usuario_id)
+        .order_by(Producao.data_producao, Producao.id)
+    )
+    return colunas, _filtrar_producao(stmt, filtros)
+
+
+def _consumo(filtros):
+    colunas = ["Bloco", "Data", "Tipo", "Componente", "Consumo (kg)"]
+    stmt = (
+        select(Producao.producao_id, Producao.data_producao, Producao.tipo_espuma,
+               Componente.nome, ComponenteProducao.quantidade_usada)
+        .join(Producao, Producao.id == ComponenteProducao.producao_id)
+        .join(Componente, Componente.id == ComponenteProducao.componente_id)
+        .order_by(Producao.data_producao, Producao.id, ComponenteProducao.id)
+    )
+    return colunas, _filtrar_producao(stmt, filtros)
+
+
+def _movimentacoes(filtros):
+    colunas = ["ID", "Data", "Componente", "Tipo", "Quantidade (kg)", "Bloco", "Recebimento", "Observação"]
+    stmt = (
+        select(Movimentacao.id, Movimentacao.data, Componente.nome, Movimentacao.tipo, Movimentacao.quantidade,
+               Producao.producao_id, Movimentacao.recebimento_id, Movimentacao.observacao)
+        .join(Componente, Componente.id == Movimentacao.componente_id)
+        .outerjoin(Producao, Producao.id == Movimentacao.producao_id)
+        .order_by(Movimentacao.id)
+    )
+    if filtros.get("data_inicio"):
+        stmt = stmt.where(Movimentacao.data >= filtros["data_inicio"])
+    if filtros.get("data_fim"):
+        stmt = stmt.where(Movimentacao.data <= filtros["data_fim"])
+    if filtros.get("tipo") in ("entrada", "saida"):
+        stmt = stmt.where(Movimentacao.tipo == filtros["tipo"])
+    if filtros.get("componente_id"):
+        stmt = stmt.where(Movimentacao.componente_id == filtros["componente_id"])
+    return colunas, stmt
+
+
+CONJUNTOS = {
+    "producoes": _producoes,
+    "consumo": _consumo,
+    "movimentacoes": _movimentacoes,
+}
+
+
+def filtros_exportacao(args):
+    """Filtros da listagem de produções + tipo/componente das movimentações."""
+    filtros = filtros_da_requisicao(args)
+    filtros["incluir_canceladas"] = args.get("incluir_canceladas") == "1"
+    filtros["tipo"] = (args.get("tipo") or "").strip() or None
+    filtros["componente_id"] = args.get("componente_id", type=int)
+    return filtros
+
+
+# -----------------------
+# Leitura em lotes e escrita
+# -----------------------
+def _linhas(stmt):
+    """Linhas do statement em lotes de LINHAS_POR_LOTE (cursor aberto, sem carregar tudo)."""
+    resultado = db.session.execute(stmt.execution_options(yield_per=LINHAS_POR_LOTE))
+    for lote in resultado.partitions():
+        yield lote
+
+
+def _celula_csv(valor):
+    if hasattr(valor, "strftime"):
+        return valor.strftime("%d/%m/%Y")
+    return "" if valor is None else valor
+
+
+def gerar_csv(colunas, stmt):
+    """Gerador de pedaços de texto CSV (separador ';', BOM para o Excel)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=";")
+    buffer.write("\ufeff")
+    escritor.writerow(colunas)
+    for lote in _linhas(stmt):
+        escritor.writerows([_celula_csv(v) for v in linha] for linha in lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gerar_xlsx(colunas, stmt, titulo):
+    """Gerador de pedaços binários de um XLSX montado em disco (write_only)."""
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet(title=titulo[:31])
+    planilha.append(colunas)
+    for lote in _linhas(stmt):
+        for linha in lote:
+            planilha.append(list(linha))
+
+    descritor, caminho = tempfile.mkstemp(suffix=".xlsx")
+    os.close(descritor)
+    try:
+        livro.save(caminho)
+        with open(caminho, "rb") as arquivo:
+            while pedaco := arquivo.read(BYTES_POR_PEDACO):
+                yield pedaco
+    finally:
+        os.remove(caminho)
+
+
+def exportar(conjunto, formato, filtros):
+    """(gerador, mimetype, nome_arquivo) da exportação pedida."""
+    if formato == "xlsx" and Workbook is None:
+        raise ValueError("Exportação XLSX indisponível (instale openpyxl) — use CSV.")
+    colunas, stmt = CONJUNTOS[conjunto](filtros)
+    nome = f"{conjunto}_{datetime.now():%Y%m%d_%H%M}.{formato}"
+    if formato == "xlsx":
+        return gerar_xlsx(colunas, stmt, conjunto), FORMATOS[formato], nome
+    return gerar_csv(colunas, stmt), FORMATOS[formato], nome
+
+
+__all__ = ["CONJUNTOS", "FORMATOS", "filtros_exportacao", "gerar_csv", "gerar_xlsx", "exportar"]
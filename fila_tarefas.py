@@ -0,0 +1,358 @@
+# fila_tarefas.py
+# -----------------------
+# Tarefas em segundo plano sem broker externo (um servidor, SQLite):
+#   - a fila é a tabela `tarefa` do próprio banco: sobrevive a reinícios e é
+#     vista por todos os processos do gunicorn
+#   - cada worker (thread) reserva a próxima tarefa com um único
+#     UPDATE ... RETURNING; o lock de escrita do SQLite garante que dois
+#     workers, mesmo em processos diferentes, nunca pegam a mesma
+#   - progresso (0-100 % + mensagem) gravado pela própria tarefa
+#   - falha: nova tentativa com espera exponencial até max_tentativas
+#   - sinal de vida das tarefas em execução; as de um processo que morreu
+#     voltam para a fila
+#   - agenda diária (nome=HH:MM, desligada por padrão): chave_unica impede
+#     que dois processos agendem a mesma execução; só dispara dentro de
+#     JANELA_AGENDA após o horário, então um reinício no meio do dia não roda
+#     a manutenção da madrugada em horário de trabalho
+# -----------------------
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+
+from models import db, Tarefa
+
+WORKERS_PADRAO = 2
+INTERVALO_PADRAO = 1.0  # segundos entre consultas à fila quando ela está vazia
+INTERVALO_AGENDA = 30  # segundos entre rodadas do agendador (agenda + sinal de vida + abandonadas)
+TEMPO_ABANDONO = 300  # segundos sem sinal de vida = worker morreu
+ESPERA_TENTATIVA = 30  # segundos antes da 2ª tentativa (dobra a cada falha)
+INTERVALO_PROGRESSO = 1.0  # no máximo uma gravação de progresso por segundo
+JANELA_AGENDA = timedelta(minutes=30)  # atraso máximo para ainda disparar uma execução diária
+
+# Sugestão de execuções diárias (HH:MM, horário do servidor), ligada com
+# TAREFAS_AGENDA=padrao; sem TAREFAS_AGENDA não há agenda
+AGENDA_PADRAO = {
+    "reconciliar-estoque": "02:00",
+    "recalcular-producao-diaria": "02:30",
+    "exportar-snapshot": "03:00",
+    "limpar-historico": "04:00",
+}
+
+PENDENTE, EXECUTANDO, CONCLUIDA, ERRO = "pendente", "executando", "concluida", "erro"
+
+
+def agenda_do_ambiente():
+    """TAREFAS_AGENDA ("nome=HH:MM;..."), AGENDA_PADRAO se "padrao", {} se ausente ou "0"."""
+    valor = os.environ.get("TAREFAS_AGENDA", "").strip()
+    if valor == "padrao":
+        return dict(AGENDA_PADRAO)
+    agenda = {}
+    for item in valor.split(";"):
+        if "=" in item:
+            nome, horario = item.split("=", 1)
+            datetime.strptime(horario.strip(), "%H:%M")  # formato inválido falha na subida do app
+            agenda[nome.strip()] = horario.strip()
+    return agenda
+
+
+class Progresso:
+    """
+    Passado como 1º argumento à tarefa: progresso(percentual, mensagem).
+    Grava em conexão própria (não faz commit do trabalho da tarefa); chame
+    entre commits, com a tarefa sem transação de escrita aberta. Melhor
+    esforço: se o banco estiver ocupado, a atualização é descartada.
+    """
+
+    def __init__(self, tarefa_id):
+        self.tarefa_id = tarefa_id
+        self._ultima = 0.0
+
+    def __call__(self, percentual, mensagem=None):
+        agora = time.monotonic()
+        if percentual < 100 and agora - self._ultima < INTERVALO_PROGRESSO:
+            return
+        self._ultima = agora
+        valores = {"progresso": max(0.0, min(100.0, float(percentual))), "atualizado_em": datetime.now()}
+        if mensagem is not None:
+            valores["mensagem"] = str(mensagem)[:255]
+        try:
+            with db.engine.begin() as conexao:
+                conexao.execute(update(Tarefa).where(Tarefa.id == self.tarefa_id).values(**valores))
+        except OperationalError:
+            pass
+
+
+class FilaTarefas:
+    """
+    Registro de tarefas + workers do processo. Uso:
+
+        fila = FilaTarefas(app)
+
+        @fila.tarefa("reconciliar-estoque")
+        def reconciliar(progresso, **parametros):
+            ...
+            return {"divergencias": 3}   # JSON: vira tarefa.resultado
+
+        fila.enfileirar("reconciliar-estoque")
+        fila.iniciar()
+    """
+
+    def __init__(self, app, workers=WORKERS_PADRAO, intervalo=INTERVALO_PADRAO, agenda=None):
+        self.app = app
+        self.workers = workers
+        self.intervalo = intervalo
+        self.agenda = dict(agenda or {})
+        self._tarefas = {}
+        self._threads = []
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._em_execucao = set()
+        self._trava = threading.Lock()
+
+    @property
+    def ativa(self):
+        return bool(self._threads)
+
+    def tarefa(self, nome, max_tentativas=3):
+        """Decorador que registra a função como tarefa `nome`."""
+        def registrar(funcao):
+            self._tarefas[nome] = {"funcao": funcao, "max_tentativas": max_tentativas}
+            return funcao
+        return registrar
+
+    @property
+    def nomes(self):
+        return sorted(self._tarefas)
+
+    # -----------------------
+    # Enfileirar
+    # -----------------------
+    def enfileirar(self, nome, parametros=None, agendada_para=None, chave_unica=None, usuario_id=None):
+        """
+        Grava a tarefa na fila e acorda os workers do processo. Retorna o id,
+        ou None se já existe uma tarefa com a mesma chave_unica. Faz commit.
+        """
+        if nome not in self._tarefas:
+            raise KeyError(f"Tarefa desconhecida: {nome}")
+        agora = datetime.now()
+        stmt = sqlite_insert(Tarefa).values(
+            nome=nome, parametros=json.dumps(parametros or {}), status=PENDENTE, progresso=0.0,
+            tentativas=0, max_tentativas=self._tarefas[nome]["max_tentativas"], chave_unica=chave_unica,
+            usuario_id=usuario_id, agendada_para=agendada_para or agora, criado_em=agora,
+        )
+        if chave_unica:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["chave_unica"])
+        tarefa_id = db.session.execute(stmt.returning(Tarefa.id)).scalar()
+        db.session.commit()
+        self._acordar.set()
+        return tarefa_id
+
+    # -----------------------
+    # Execução
+    # -----------------------
+    def _identificacao(self):
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:120]
+
+    def _reservar(self):
+        """Marca a próxima tarefa pendente como executando (atômico). Retorna o id ou None."""
+        agora = datetime.now()
+        proxima = (
+            select(Tarefa.id)
+            .where(Tarefa.status == PENDENTE, Tarefa.agendada_para <= agora, Tarefa.nome.in_(list(self._tarefas)))
+            .order_by(Tarefa.agendada_para, Tarefa.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        tarefa_id = db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.id == proxima, Tarefa.status == PENDENTE)
+            .values(status=EXECUTANDO, worker=self._identificacao(), iniciado_em=agora, atualizado_em=agora,
+                    tentativas=Tarefa.tentativas + 1, erro=None)
+            .returning(Tarefa.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        db.session.commit()
+        return tarefa_id
+
+    def executar(self, tarefa_id):
+        """Executa uma tarefa já reservada e grava o desfecho. Faz commit."""
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        definicao = self._tarefas[tarefa.nome]
+        parametros = json.loads(tarefa.parametros or "{}")
+        try:
+            resultado = definicao["funcao"](Progresso(tarefa_id), **parametros)
+        except Exception as e:  # noqa: BLE001  (a falha vira status da tarefa)
+            db.session.rollback()
+            self.app.logger.exception("Tarefa %s (%s) falhou", tarefa_id, tarefa.nome)
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            tarefa.erro = f"{e.__class__.__name__}: {e}"
+            if tarefa.tentativas < tarefa.max_tentativas:
+                tarefa.status = PENDENTE
+                tarefa.agendada_para = datetime.now() + timedelta(seconds=ESPERA_TENTATIVA * 2 ** (tarefa.tentativas - 1))
+            else:
+                tarefa.status = ERRO
+                tarefa.concluido_em = datetime.now()
+        else:
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            tarefa.status = CONCLUIDA
+            tarefa.progresso = 100.0
+            tarefa.resultado = json.dumps(resultado, default=str) if resultado is not None else None
+            tarefa.concluido_em = datetime.now()
+        tarefa.atualizado_em = datetime.now()
+        db.session.commit()
+        return tarefa.status
+
+    def executar_proxima(self):
+        """Reserva e executa uma tarefa. Retorna o id executado ou None (fila vazia)."""
+        tarefa_id = self._reservar()
+        if tarefa_id is None:
+            return None
+        with self._trava:
+            self._em_execucao.add(tarefa_id)
+        try:
+            self.executar(tarefa_id)
+        finally:
+            with self._trava:
+                self._em_execucao.discard(tarefa_id)
+            db.session.remove()
+        return tarefa_id
+
+    def executar_pendentes(self, limite=None):
+        """Executa tarefas no thread atual até a fila esvaziar (CLI/scripts). Retorna quantas."""
+        total = 0
+        while limite is None or total < limite:
+            if self.executar_proxima() is None:
+                break
+            total += 1
+        return total
+
+    # -----------------------
+    # Manutenção da fila
+    # -----------------------
+    def agendar_recorrentes(self, agora=None):
+        """
+        Enfileira as execuções diárias cujo horário de hoje passou há menos de
+        JANELA_AGENDA (uma vez por dia). Fora da janela (servidor parado no
+        horário) a execução do dia é pulada, não recuperada.
+        """
+        agora = agora or datetime.now()
+        agendadas = []
+        for nome, horario in self.agenda.items():
+            if nome not in self._tarefas:
+                continue
+            hora = datetime.combine(agora.date(), datetime.strptime(horario, "%H:%M").time())
+            if hora <= agora < hora + JANELA_AGENDA and self.enfileirar(nome, agendada_para=hora,
+                                                 chave_unica=f"{nome}@{agora.date().isoformat()}"):
+                agendadas.append(nome)
+        return agendadas
+
+    def sinal_de_vida(self):
+        """Atualiza atualizado_em das tarefas que este processo está executando."""
+        with self._trava:
+            ids = list(self._em_execucao)
+        if ids:
+            with db.engine.begin() as conexao:
+                conexao.execute(update(Tarefa).where(Tarefa.id.in_(ids)).values(atualizado_em=datetime.now()))
+
+    def recuperar_abandonadas(self, tempo=TEMPO_ABANDONO):
+        """Tarefas executando sem sinal de vida há `tempo` s voltam à fila (ou viram erro). Faz commit."""
+        limite = datetime.now() - timedelta(seconds=tempo)
+        total = db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.status == EXECUTANDO, Tarefa.atualizado_em < limite)
+            .values(status=case((Tarefa.tentativas < Tarefa.max_tentativas, PENDENTE), else_=ERRO),
+                    erro="Worker interrompido durante a execução", worker=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return total
+
+    def limpar(self, dias=30):
+        """Apaga tarefas concluídas/com erro finalizadas há mais de `dias` dias. Faz commit."""
+        limite = datetime.now() - timedelta(days=dias)
+        total = db.session.execute(
+            delete(Tarefa).where(Tarefa.status.in_([CONCLUIDA, ERRO]), Tarefa.concluido_em < limite)
+        ).rowcount
+        db.session.commit()
+        return total
+
+    # -----------------------
+    # Threads
+    # -----------------------
+    def _laco_worker(self):
+        with self.app.app_context():
+            while not self._parar.is_set():
+                try:
+                    executada = self.executar_proxima()
+                except OperationalError as e:  # banco ocupado / tabela ainda não migrada
+                    db.session.rollback()
+                    self.app.logger.warning("Fila de tarefas: %s", e.orig)
+                    executada = None
+                if executada is None:
+                    self._acordar.wait(self.intervalo)
+                    self._acordar.clear()
+
+    def _laco_agendador(self):
+        with self.app.app_context():
+            while not self._parar.is_set():
+                try:
+                    self.sinal_de_vida()
+                    self.recuperar_abandonadas()
+                    self.agendar_recorrentes()
+                except OperationalError as e:
+                    db.session.rollback()
+                    self.app.logger.warning("Agendador de tarefas: %s", e.orig)
+                finally:
+                    db.session.remove()
+                self._parar.wait(INTERVALO_AGENDA)
+
+    def iniciar(self):
+        """Sobe os workers (threads daemon) e o agendador deste processo (uma vez)."""
+        with self._trava:
+            if self._threads:
+                return
+            self._parar.clear()
+            threads = [threading.Thread(target=self._laco_worker, name=f"tarefa-{i + 1}", daemon=True)
+                       for i in range(self.workers)]
+            threads.append(threading.Thread(target=self._laco_agendador, name="tarefa-agenda", daemon=True))
+            for thread in threads:
+                thread.start()
+            self._threads = threads
+
+    def parar(self, esperar=True, tempo=None):
+        """Pede aos threads que parem após a tarefa atual."""
+        self._parar.set()
+        self._acordar.set()
+        if esperar:
+            for thread in self._threads:
+                thread.join(tempo)
+        self._threads = []
+
+
+def tarefa_para_dict(tarefa):
+    return {
+        "id": tarefa.id,
+        "nome": tarefa.nome,
+        "parametros": json.loads(tarefa.parametros or "{}"),
+        "status": tarefa.status,
+        "progresso": round(tarefa.progresso, 1),
+        "mensagem": tarefa.mensagem,
+        "resultado": json.loads(tarefa.resultado) if tarefa.resultado else None,
+        "erro": tarefa.erro,
+        "tentativas": tarefa.tentativas,
+        "max_tentativas": tarefa.max_tentativas,
+        "agendada_para": tarefa.agendada_para.isoformat(timespec="seconds"),
+        "iniciado_em": tarefa.iniciado_em.isoformat(timespec="seconds") if tarefa.iniciado_em else None,
+        "concluido_em": tarefa.concluido_em.isoformat(timespec="seconds") if tarefa.concluido_em else None,
+    }
+
+
+__all__ = ["WORKERS_PADRAO", "AGENDA_PADRAO", "JANELA_AGENDA", "PENDENTE", "EXECUTANDO", "CONCLUIDA", "ERRO",
+           "agenda_do_ambiente", "Progresso", "FilaTarefas", "tarefa_para_dict"]
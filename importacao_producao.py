@@ -0,0 +1,390 @@
+# importacao_producao.py
+# -----------------------
+# Importação em lote de produções a partir de planilha (CSV ou XLSX).
+#   - o arquivo é validado linha a linha, em fluxo (csv.reader / openpyxl read_only)
+#   - fichas técnicas, componentes, blocos já cadastrados e saldos são lidos
+#     uma vez para o lote inteiro; o saldo é consumido em memória na ordem das linhas
+#   - Producao, ComponenteProducao e Movimentacao entram com INSERTs em lote,
+#     perfil estatístico e rollup diário com uma atualização por tipo/dia,
+#     tudo numa única transação
+#   - devolve um relatório de erros por linha
+#
+# Colunas: bloco, data, tipo, cor, altura, conformidade, [observacoes] e uma
+# coluna por componente (nome do componente, sem diferenciar maiúsculas/acentos).
+# -----------------------
+import codecs
+import csv
+import io
+import math
+import unicodedata
+import zipfile
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Producao, ComponenteProducao, FichaTecnica, Movimentacao
+from estoque_ledger import baixar_saldos, repetir_se_ocupado, saldos_atuais
+from perfil_formulacao import atualizar_perfis
+from producao_diaria import registrar_producoes_diarias
+
+MAX_LINHAS = 5000
+CONFORMIDADES = {"conforme": "Conforme", "nao conforme": "Não Conforme"}
+CAMPOS = {
+    "bloco": "bloco", "producao_id": "bloco", "numero do bloco": "bloco",
+    "data": "data", "data_producao": "data", "data de producao": "data",
+    "tipo": "tipo", "tipo_espuma": "tipo", "tipo de espuma": "tipo",
+    "cor": "cor",
+    "altura": "altura",
+    "conformidade": "conformidade",
+    "observacoes": "observacoes", "observacao": "observacoes",
+}
+OBRIGATORIOS = ("bloco", "tipo", "cor", "conformidade")
+
+
+class ErroImportacao(Exception):
+    """Erro no arquivo como um todo (formato, cabeçalho), não numa linha."""
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e sem espaços nas pontas (para casar cabeçalhos e nomes)."""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return " ".join(texto.lower().split())
+
+
+# -----------------------
+# Leitura em fluxo
+# -----------------------
+def _codificacao_csv(arquivo):
+    """
+    "utf-8-sig" se o arquivo inteiro decodifica como UTF-8, senão "latin-1"
+    (CSV salvo pelo Excel em português). Lê em blocos e volta ao início.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        for bloco in iter(lambda: arquivo.read(64 * 1024), b""):
+            decodificador.decode(bloco)
+        decodificador.decode(b"", final=True)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "latin-1"
+    finally:
+        arquivo.seek(0)
+
+
+def _linhas_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding=_codificacao_csv(arquivo), newline="")
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+    except csv.Error:
+        dialeto = csv.excel
+    try:
+        yield from csv.reader(texto, dialeto)
+    except csv.Error as e:
+        raise ErroImportacao(f"Não foi possível ler o CSV: {e}")
+
+
+def _linhas_xlsx(arquivo):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ErroImportacao("Leitura de XLSX indisponível (instale openpyxl) — envie o arquivo em CSV.")
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True).active
+        for valores in planilha.iter_rows(values_only=True):
+            yield list(valores)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ValueError, OSError) as e:
+        raise ErroImportacao(f"Arquivo XLSX inválido ou corrompido: {e}")
+
+
+def ler_planilha(arquivo, nome_arquivo):
+    """Gera as linhas (listas de valores) do arquivo; a primeira é o cabeçalho."""
+    extensao = nome_arquivo.rsplit(".", 1)[-1].lower() if "." in nome_arquivo else ""
+    if extensao == "csv":
+        return _linhas_csv(arquivo)
+    if extensao in ("xlsx", "xlsm"):
+        return _linhas_xlsx(arquivo)
+    raise ErroImportacao("Formato não suportado: envie um arquivo .csv ou .xlsx")
+
+
+# -----------------------
+# Conversões de célula
+# -----------------------
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # XLSX: bloco 1234 vem como 1234.0
+    return str(valor).strip()
+
+
+def _numero(valor):
+    """float finito ou None (célula vazia); ValueError para texto inválido, nan ou inf."""
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+    else:
+        texto = _texto(valor)
+        if not texto:
+            return None
+        if "," in texto:  # formato brasileiro: 1.234,5
+            texto = texto.replace(".", "").replace(",", ".")
+        numero = float(texto)
+    if not math.isfinite(numero):
+        raise ValueError(f"número não finito: {valor}")
+    return numero
+
+
+def _data(valor):
+    if valor is None or _texto(valor) == "":
+        return date.today()
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    for formato in ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y"):
+        try:
+            return datetime.strptime(_texto(valor), formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"data inválida '{_texto(valor)}' (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+
+# -----------------------
+# Contexto do lote (lido uma vez)
+# -----------------------
+def _carregar_fichas():
+    """{tipo normalizado: (TipoEspuma, {componente_id: Componente})}"""
+    fichas = {}
+    for ficha in FichaTecnica.query.all():  # tipo_espuma joined, componentes selectin
+        componentes = {fc.componente.id: fc.componente for fc in ficha.componentes}
+        fichas[normalizar(ficha.tipo_espuma.nome)] = (ficha.tipo_espuma, componentes)
+    return fichas
+
+
+def _mapear_cabecalho(cabecalho, fichas):
+    """(índice → campo) e (índice → componente_id) a partir da primeira linha."""
+    nomes_componentes = {}
+    for _, componentes in fichas.values():
+        for componente in componentes.values():
+            nomes_componentes[normalizar(componente.nome)] = componente.id
+
+    campos, componentes, desconhecidas = {}, {}, []
+    for indice, titulo in enumerate(cabecalho):
+        chave = normalizar(titulo)
+        if not chave:
+            continue
+        if chave in CAMPOS:
+            campos[indice] = CAMPOS[chave]
+        elif chave in nomes_componentes:
+            componentes[indice] = nomes_componentes[chave]
+        else:
+            desconhecidas.append(_texto(titulo))
+
+    faltando = [c for c in OBRIGATORIOS if c not in campos.values()]
+    if faltando:
+        raise ErroImportacao(f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}")
+    if desconhecidas:
+        raise ErroImportacao(f"Coluna(s) desconhecida(s): {', '.join(desconhecidas)} "
+                             "(use os nomes dos componentes cadastrados nas fichas técnicas)")
+    if not componentes:
+        raise ErroImportacao("Nenhuma coluna de componente encontrada")
+    return campos, componentes
+
+
+# -----------------------
+# Validação e gravação
+# -----------------------
+def _validar_linha(valores, campos, colunas_componentes, fichas):
+    """(producao_dict, tipo, itens, erros) de uma linha da planilha."""
+    celula = {campo: valores[i] if i < len(valores) else None for i, campo in campos.items()}
+    erros = []
+
+    bloco = _texto(celula.get("bloco"))
+    if not bloco:
+        erros.append("bloco não informado")
+
+    ficha = fichas.get(normalizar(celula.get("tipo")))
+    if ficha is None:
+        erros.append(f"tipo de espuma '{_texto(celula.get('tipo'))}' sem ficha técnica")
+
+    cor = _texto(celula.get("cor"))
+    if not cor:
+        erros.append("cor não informada")
+
+    conformidade = CONFORMIDADES.get(normalizar(celula.get("conformidade")))
+    if conformidade is None:
+        erros.append(f"conformidade inválida '{_texto(celula.get('conformidade'))}' (Conforme / Não Conforme)")
+
+    try:
+        data_producao = _data(celula.get("data"))
+    except ValueError as e:
+        data_producao = None
+        erros.append(str(e))
+
+    try:
+        altura = _numero(celula.get("altura")) or 0.0
+    except ValueError:
+        altura = None
+        erros.append(f"altura inválida '{_texto(celula.get('altura'))}'")
+
+    itens = []
+    for indice, componente_id in colunas_componentes.items():
+        valor = valores[indice] if indice < len(valores) else None
+        try:
+            quantidade = _numero(valor)
+        except ValueError:
+            erros.append(f"quantidade inválida '{_texto(valor)}'")
+            continue
+        if not quantidade:
+            continue
+        if quantidade < 0:
+            erros.append(f"quantidade negativa ({quantidade})")
+        elif ficha is not None:
+            componente = ficha[1].get(componente_id)
+            if componente is None:
+                erros.append(f"componente da coluna {indice + 1} não pertence à ficha de {ficha[0].nome}")
+            else:
+                itens.append((componente.id, componente.nome, quantidade))
+
+    producao = {
+        "producao_id": bloco,
+        "data_producao": data_producao,
+        "tipo_espuma": ficha[0].nome if ficha else None,
+        "cor": cor,
+        "altura": altura,
+        "conformidade": conformidade,
+        "observacoes": _texto(celula.get("observacoes")),
+    }
+    return producao, ficha[0] if ficha else None, itens, erros
+
+
+def importar_producoes(arquivo, nome_arquivo, usuario_id, parcial=False, somente_validar=False):
+    """
+    Valida e importa a planilha. Sem `parcial`, qualquer erro cancela o lote
+    inteiro; com `parcial`, só as linhas válidas entram. Faz commit quando grava
+    (repetido se o banco estiver ocupado).
+    Retorna {'linhas', 'importadas', 'erros': [{'linha', 'bloco', 'erros'}]}.
+    Levanta ErroImportacao para problemas no arquivo como um todo.
+    """
+    linhas = ler_planilha(arquivo, nome_arquivo)
+    fichas = _carregar_fichas()
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        raise ErroImportacao("Arquivo vazio")
+    campos, colunas_componentes = _mapear_cabecalho(cabecalho, fichas)
+
+    validas, erros, total = [], [], 0
+    blocos_arquivo = set()
+    for numero, valores in enumerate(linhas, start=2):
+        if not any(_texto(v) for v in valores):
+            continue  # linha em branco
+        total += 1
+        if total > MAX_LINHAS:
+            raise ErroImportacao(f"Arquivo com mais de {MAX_LINHAS} linhas: divida a importação")
+
+        producao, tipo, itens, erros_linha = _validar_linha(valores, campos, colunas_componentes, fichas)
+        if producao["producao_id"]:
+            if producao["producao_id"] in blocos_arquivo:
+                erros_linha.append("bloco repetido no arquivo")
+            blocos_arquivo.add(producao["producao_id"])
+
+        if erros_linha:
+            erros.append({"linha": numero, "bloco": producao["producao_id"], "erros": erros_linha})
+        else:
+            validas.append((numero, producao, tipo, itens))
+
+    # Blocos já cadastrados: uma consulta por lote de 500
+    existentes = set()
+    blocos = [p["producao_id"] for _, p, _, _ in validas]
+    for inicio in range(0, len(blocos), 500):
+        existentes.update(b for (b,) in db.session.query(Producao.producao_id)
+                          .filter(Producao.producao_id.in_(blocos[inicio:inicio + 500])))
+
+    # Saldos lidos uma vez e consumidos em memória, na ordem da planilha
+    saldos = saldos_atuais()
+    aceitas = []
+    for numero, producao, tipo, itens in validas:
+        erros_linha = []
+        if producao["producao_id"] in existentes:
+            erros_linha.append(f"bloco '{producao['producao_id']}' já cadastrado")
+        for componente_id, nome, quantidade in itens:
+            if saldos.get(componente_id, 0) < quantidade:
+                erros_linha.append(f"saldo insuficiente de '{nome}' ({saldos.get(componente_id, 0):.2f} < {quantidade:.2f})")
+        if erros_linha:
+            erros.append({"linha": numero, "bloco": producao["producao_id"], "erros": erros_linha})
+            continue
+        for componente_id, _, quantidade in itens:
+            saldos[componente_id] = saldos.get(componente_id, 0) - quantidade
+        aceitas.append((producao, tipo, itens))
+
+    erros.sort(key=lambda e: e["linha"])
+    resultado = {"linhas": total, "importadas": 0, "erros": erros}
+    if somente_validar or not aceitas or (erros and not parcial):
+        return resultado
+
+    def gravar():
+        _gravar(aceitas, usuario_id)
+        db.session.commit()
+
+    try:
+        repetir_se_ocupado(gravar)
+    except IntegrityError:
+        # Bloco gravado por outro lançamento entre a checagem acima e o INSERT
+        db.session.rollback()
+        raise ErroImportacao("Bloco já cadastrado por outro lançamento durante a importação: "
+                             "valide o arquivo novamente")
+    resultado["importadas"] = len(aceitas)
+    return resultado
+
+
+def _gravar(aceitas, usuario_id):
+    """INSERTs em lote das produções, componentes, movimentações, perfil e rollup. Não faz commit."""
+    ids = dict(db.session.execute(
+        insert(Producao).returning(Producao.producao_id, Producao.id, sort_by_parameter_order=True),
+        [dict(producao, usuario_id=usuario_id, status="A") for producao, _, _ in aceitas]
+    ).all())
+
+    componentes, movimentacoes, perfis, rollup = [], [], [], []
+    consumos = {}
+    hoje = date.today()
+    for producao, tipo, itens in aceitas:
+        producao_id = ids[producao["producao_id"]]
+        for componente_id, _, quantidade in itens:
+            componentes.append({"producao_id": producao_id, "componente_id": componente_id,
+                                "quantidade_usada": quantidade})
+            movimentacoes.append({"componente_id": componente_id, "tipo": "saida", "quantidade": quantidade,
+                                  "data": hoje, "producao_id": producao_id})
+            consumos[componente_id] = consumos.get(componente_id, 0) + quantidade
+        registro = SimpleNamespace(**producao)
+        perfis.append((tipo.id, tipo.nome, registro, itens))
+        rollup.append((registro, itens))
+
+    if componentes:
+        db.session.execute(insert(ComponenteProducao), componentes)
+    # Os saldos foram validados em memória: a baixa condicional garante que
+    # nenhum lançamento concorrente os consumiu desde a leitura
+    faltas = baixar_saldos(consumos)
+    if faltas:
+        raise ErroImportacao("Saldo de estoque alterado por outro lançamento durante a importação: "
+                             "valide o arquivo novamente")
+    if movimentacoes:
+        db.session.execute(insert(Movimentacao), movimentacoes)
+    atualizar_perfis(perfis)
+    registrar_producoes_diarias(rollup)
+
+
+def modelo_csv(fichas=None):
+    """Cabeçalho de exemplo com todos os componentes das fichas técnicas."""
+    fichas = fichas or _carregar_fichas()
+    nomes = sorted({c.nome for _, componentes in fichas.values() for c in componentes.values()})
+    saida = io.StringIO()
+    csv.writer(saida, delimiter=";").writerow(
+        ["bloco", "data", "tipo", "cor", "altura", "conformidade", "observacoes"] + nomes)
+    return saida.getvalue()
+
+
+__all__ = ["ErroImportacao", "MAX_LINHAS", "ler_planilha", "importar_producoes", "modelo_csv"]
@@ -0,0 +1,209 @@
+# laudo_tecnico.py
+# -----------------------
+# Laudos técnicos (bloco laminado) gravados no servidor:
+#   - as medidas da lâmina são gravadas como informadas; volume e densidade
+#     são calculados por um único UPDATE ... RETURNING sobre os laudos
+#     (um ou milhares: mesmo caminho, mesma fórmula)
+#   - o laudo é ligado à Producao pelo número do bloco e herda o tipo de
+#     espuma; sem produção, o tipo vem da densidade nominal ("D33 selado")
+#   - deriva de densidade por tipo de espuma e dia lida do índice
+#     (tipo_espuma, data, densidade)
+# -----------------------
+import math
+import re
+from datetime import date, datetime
+
+from sqlalchemy import case, func, insert, update
+
+from models import db, Laudo, Producao
+
+MAX_LAUDOS_POR_LOTE = 5000
+CAMPOS_MEDIDA = ("peso_kg", "largura_m", "comprimento_m", "altura_m")
+CAMPOS_NUMERICOS = CAMPOS_MEDIDA + ("bloco_largura_cm", "bloco_comprimento_cm", "bloco_altura_cm")
+CAMPOS_TEXTO = {"numero_bloco": 50, "pedido": 50, "cliente": 120, "densidade_nominal": 50, "lote": 50,
+                "posicao_lamina": 20, "observacoes": None, "responsavel": 120}
+PADRAO_TIPO = re.compile(r"\b(AG\d+|D\d+)\b", re.IGNORECASE)
+
+# volume (m³) e densidade (kg/m³) calculados no banco
+VOLUME = Laudo.largura_m * Laudo.comprimento_m * Laudo.altura_m
+DENSIDADE = case((VOLUME > 0, Laudo.peso_kg / VOLUME), else_=None)
+
+
+class ErroLaudo(Exception):
+    """Lote de laudos inválido como um todo (mensagem pronta para o usuário)."""
+
+
+def numero(valor):
+    """
+    Converte '1.234,56', '1234.56', '13,8' ou números para float (mesmas
+    regras do formulário). Vazio, inválido ou não finito (nan/inf) = None.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        try:
+            valor = float(valor)
+        except OverflowError:  # inteiro JSON grande demais para float
+            return None
+        return valor if math.isfinite(valor) else None
+    texto = re.sub(r"\s+", "", str(valor))
+    if not texto:
+        return None
+    if "." in texto and "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    elif "," in texto:
+        texto = texto.replace(",", ".")
+    try:
+        valor = float(texto)
+    except ValueError:
+        return None
+    return valor if math.isfinite(valor) else None
+
+
+def _data(valor):
+    if not valor:
+        return date.today()
+    if isinstance(valor, date):
+        return valor
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(str(valor).strip(), formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida '{valor}'")
+
+
+def _validar(dados):
+    """(linha para o INSERT, erros) de um laudo recebido como dict."""
+    linha, erros = {}, []
+    for campo, tamanho in CAMPOS_TEXTO.items():
+        texto = (str(dados.get(campo) or "")).strip()
+        linha[campo] = (texto[:tamanho] if tamanho else texto) or None
+    for campo in CAMPOS_NUMERICOS:
+        linha[campo] = numero(dados.get(campo))
+    for campo in CAMPOS_MEDIDA:
+        if not linha[campo] or linha[campo] <= 0:
+            erros.append(f"{campo} deve ser maior que zero")
+    try:
+        linha["data"] = _data(dados.get("data"))
+    except ValueError as e:
+        erros.append(str(e))
+    return linha, erros
+
+
+# -----------------------
+# Gravação e cálculo
+# -----------------------
+def calcular_densidades(ids=None, todos=False):
+    """
+    Calcula volume e densidade em lote com um UPDATE ... RETURNING:
+    `ids` = só esses laudos; sem ids, os pendentes (densidade NULL) ou,
+    com todos=True, todos. Retorna {id: (volume_m3, densidade)}. Não faz commit.
+    """
+    stmt = update(Laudo).values(volume_m3=VOLUME, densidade=DENSIDADE)
+    if ids is not None:
+        if not ids:
+            return {}
+        stmt = stmt.where(Laudo.id.in_(ids))
+    elif not todos:
+        stmt = stmt.where(Laudo.densidade.is_(None))
+    resultado = db.session.execute(
+        stmt.returning(Laudo.id, Laudo.volume_m3, Laudo.densidade)
+        .execution_options(synchronize_session=False)
+    )
+    return {id_: (volume, densidade) for id_, volume, densidade in resultado}
+
+
+def registrar_laudos(itens, usuario_id=None):
+    """
+    Grava uma lista de laudos (dicts com os campos do formulário) e calcula
+    volume/densidade de todos de uma vez. Laudos inválidos não são gravados.
+    Retorna (gravados, erros): gravados = [{id, numero_bloco, tipo_espuma,
+    volume_m3, densidade}] na ordem recebida; erros = [{indice, erros}].
+    Não faz commit.
+    """
+    if len(itens) > MAX_LAUDOS_POR_LOTE:
+        raise ErroLaudo(f"Lote com mais de {MAX_LAUDOS_POR_LOTE} laudos: divida o envio")
+
+    validos, erros = [], []
+    for indice, dados in enumerate(itens):
+        linha, erros_item = _validar(dados if isinstance(dados, dict) else {})
+        if erros_item:
+            erros.append({"indice": indice, "erros": erros_item})
+        else:
+            validos.append(linha)
+    if not validos:
+        return [], erros
+
+    # Produções dos blocos informados em uma consulta por lote de 500
+    blocos = sorted({linha["numero_bloco"] for linha in validos if linha["numero_bloco"]})
+    producoes = {}
+    for inicio in range(0, len(blocos), 500):
+        producoes.update({
+            bloco: (id_, tipo) for bloco, id_, tipo in
+            db.session.query(Producao.producao_id, Producao.id, Producao.tipo_espuma)
+            .filter(Producao.producao_id.in_(blocos[inicio:inicio + 500]))
+        })
+
+    for linha in validos:
+        producao_id, tipo = producoes.get(linha["numero_bloco"], (None, None))
+        if tipo is None and linha["densidade_nominal"]:
+            encontrado = PADRAO_TIPO.search(linha["densidade_nominal"])
+            tipo = encontrado.group(1).upper() if encontrado else None
+        linha.update(producao_id=producao_id, tipo_espuma=tipo, usuario_id=usuario_id)
+
+    ids = list(db.session.execute(
+        insert(Laudo).returning(Laudo.id, sort_by_parameter_order=True), validos
+    ).scalars())
+    calculados = calcular_densidades(ids)
+
+    gravados = []
+    for id_, linha in zip(ids, validos):
+        volume, densidade = calculados[id_]
+        gravados.append({
+            "id": id_,
+            "numero_bloco": linha["numero_bloco"],
+            "producao_id": linha["producao_id"],
+            "tipo_espuma": linha["tipo_espuma"],
+            "volume_m3": round(volume, 6),
+            "densidade": round(densidade, 2) if densidade is not None else None,
+        })
+    return gravados, erros
+
+
+# -----------------------
+# Consultas
+# -----------------------
+def deriva_densidade(tipo_espuma=None, data_inicio=None, data_fim=None):
+    """
+    Densidade por tipo de espuma e dia (n, média, mín, máx), em ordem
+    cronológica. Agrupa pelo índice (tipo_espuma, data, densidade).
+    """
+    consulta = (
+        db.session.query(Laudo.tipo_espuma, Laudo.data, func.count(Laudo.densidade),
+                         func.avg(Laudo.densidade), func.min(Laudo.densidade), func.max(Laudo.densidade))
+        .filter(Laudo.densidade.isnot(None))
+    )
+    if tipo_espuma:
+        consulta = consulta.filter(Laudo.tipo_espuma == tipo_espuma)
+    if data_inicio:
+        consulta = consulta.filter(Laudo.data >= data_inicio)
+    if data_fim:
+        consulta = consulta.filter(Laudo.data <= data_fim)
+
+    return [
+        {"tipo_espuma": tipo, "data": dia.isoformat(), "laudos": n,
+         "media": round(media, 2), "minima": round(minima, 2), "maxima": round(maxima, 2)}
+        for tipo, dia, n, media, minima, maxima in
+        consulta.group_by(Laudo.tipo_espuma, Laudo.data).order_by(Laudo.tipo_espuma, Laudo.data)
+    ]
+
+
+def laudos_do_bloco(numero_bloco):
+    """Laudos de um bloco (mais recentes primeiro)."""
+    return (Laudo.query.filter_by(numero_bloco=numero_bloco)
+            .order_by(Laudo.data.desc(), Laudo.id.desc()).all())
+
+
+__all__ = ["ErroLaudo", "MAX_LAUDOS_POR_LOTE", "numero", "calcular_densidades", "registrar_laudos",
+           "deriva_densidade", "laudos_do_bloco"]
@@ -0,0 +1,364 @@
+# metricas.py
+# -----------------------
+# Métricas por rota expostas em /metrics (Prometheus) e /metrics?formato=json:
+#   - middleware WSGI mede cada requisição do início ao fim da resposta
+#     (inclui exportações em fluxo) e conta os bytes enviados
+#   - eventos do SQLAlchemy (before/after_cursor_execute) somam comandos e
+#     tempo de SQL na requisição corrente (ContextVar; tarefas em segundo
+#     plano não entram)
+#   - histogramas de latência, de comandos SQL por requisição e de tamanho
+#     da resposta, por (endpoint, método)
+#   - cada processo grava seu acumulado num arquivo SQLite compartilhado a
+#     cada INTERVALO_GRAVACAO s; o /metrics soma todos os workers do gunicorn
+#   - desligado por padrão (ligue com METRICAS=1): nada é instalado, custo zero
+#   - acesso: "Authorization: Bearer <METRICAS_TOKEN>" ou usuário logado
+# -----------------------
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from flask import request
+from sqlalchemy import event
+
+PREFIXO = "controle_producao"
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (1, 2, 5, 10, 20, 50, 100, 250)
+BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+INTERVALO_GRAVACAO = 5.0  # segundos entre gravações do acumulado do processo
+PROCESSO_EXPIRADO = 24 * 3600  # processos sem gravar há mais que isso saem do arquivo
+CHAVE_ENDPOINT = "metricas.endpoint"
+SEM_ROTA = "<sem_rota>"
+
+_requisicao_atual = ContextVar("metricas_requisicao", default=None)
+
+
+class _Requisicao:
+    """Contadores de SQL da requisição em andamento."""
+    __slots__ = ("sql_comandos", "sql_segundos")
+
+    def __init__(self):
+        self.sql_comandos = 0
+        self.sql_segundos = 0.0
+
+
+def _histograma_vazio(buckets):
+    return {"buckets": [0] * (len(buckets) + 1), "soma": 0.0}  # último = +Inf
+
+
+def _observar(histograma, limites, valor):
+    for i, limite in enumerate(limites):
+        if valor <= limite:
+            break
+    else:
+        i = len(limites)
+    histograma["buckets"][i] += 1
+    histograma["soma"] += valor
+
+
+def _nova_serie():
+    return {
+        "status": {},
+        "latencia": _histograma_vazio(BUCKETS_LATENCIA),
+        "sql": _histograma_vazio(BUCKETS_SQL),
+        "sql_segundos": 0.0,
+        "bytes": _histograma_vazio(BUCKETS_BYTES),
+    }
+
+
+def _somar_serie(destino, origem):
+    for status, total in origem["status"].items():
+        destino["status"][status] = destino["status"].get(status, 0) + total
+    for campo in ("latencia", "sql", "bytes"):
+        destino[campo]["buckets"] = [a + b for a, b in zip(destino[campo]["buckets"], origem[campo]["buckets"])]
+        destino[campo]["soma"] += origem[campo]["soma"]
+    destino["sql_segundos"] += origem["sql_segundos"]
+
+
+class ColetorMetricas:
+    """
+    Acumulado das métricas do processo. `caminho` = arquivo SQLite compartilhado
+    entre os workers (None: só o processo atual).
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho
+        self.processo = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.series = {}  # (endpoint, método) → série
+        self._trava = threading.Lock()
+        self._ultima_gravacao = 0.0
+        self._local = threading.local()
+
+    # -----------------------
+    # Registro
+    # -----------------------
+    def registrar(self, endpoint, metodo, status, duracao, sql_comandos, sql_segundos, tamanho):
+        with self._trava:
+            serie = self.series.get((endpoint, metodo))
+            if serie is None:
+                serie = self.series[(endpoint, metodo)] = _nova_serie()
+            serie["status"][status] = serie["status"].get(status, 0) + 1
+            _observar(serie["latencia"], BUCKETS_LATENCIA, duracao)
+            _observar(serie["sql"], BUCKETS_SQL, sql_comandos)
+            _observar(serie["bytes"], BUCKETS_BYTES, tamanho)
+            serie["sql_segundos"] += sql_segundos
+        if self.caminho and time.monotonic() - self._ultima_gravacao >= INTERVALO_GRAVACAO:
+            self.gravar()
+
+    # -----------------------
+    # Arquivo compartilhado entre workers
+    # -----------------------
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS processo (id TEXT PRIMARY KEY, atualizado REAL NOT NULL, "
+                         "series TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _series_json(self):
+        with self._trava:
+            return json.dumps([[endpoint, metodo, serie] for (endpoint, metodo), serie in self.series.items()])
+
+    def gravar(self):
+        """Grava o acumulado deste processo (uma linha por processo)."""
+        self._ultima_gravacao = time.monotonic()
+        try:
+            self._conexao().execute(
+                "INSERT OR REPLACE INTO processo (id, atualizado, series) VALUES (?, ?, ?)",
+                (self.processo, time.time(), self._series_json())
+            )
+        except sqlite3.OperationalError:
+            pass  # arquivo ocupado: grava na próxima
+
+    def consolidado(self):
+        """Séries somadas de todos os processos (ou só deste, sem arquivo)."""
+        if not self.caminho:
+            with self._trava:
+                return json.loads(json.dumps([[e, m, s] for (e, m), s in self.series.items()]))
+        self.gravar()
+        conn = self._conexao()
+        conn.execute("DELETE FROM processo WHERE atualizado < ?", (time.time() - PROCESSO_EXPIRADO,))
+        somadas = {}
+        for (series,) in conn.execute("SELECT series FROM processo"):
+            for endpoint, metodo, serie in json.loads(series):
+                if (endpoint, metodo) in somadas:
+                    _somar_serie(somadas[(endpoint, metodo)], serie)
+                else:
+                    somadas[(endpoint, metodo)] = serie
+        return [[e, m, s] for (e, m), s in somadas.items()]
+
+    def zerar(self):
+        """Descarta o acumulado (deste processo e do arquivo)."""
+        with self._trava:
+            self.series = {}
+        if self.caminho:
+            self._conexao().execute("DELETE FROM processo")
+
+
+# -----------------------
+# Instalação (middleware WSGI + eventos do SQLAlchemy)
+# -----------------------
+class _RespostaMedida:
+    """
+    Itera a resposta contando bytes, com a requisição como "atual" enquanto
+    cada pedaço é gerado (o SQL de stream_with_context entra na conta);
+    registra a requisição ao fim da iteração ou quando o servidor fecha a
+    resposta (o que vier primeiro).
+    """
+
+    def __init__(self, resposta, requisicao, ao_fechar):
+        self._resposta = resposta
+        self._requisicao = requisicao
+        self._ao_fechar = ao_fechar
+        self._registrada = False
+        self.tamanho = 0
+
+    def _registrar(self):
+        if not self._registrada:
+            self._registrada = True
+            self._ao_fechar(self.tamanho)
+
+    def __iter__(self):
+        iterador = iter(self._resposta)
+        while True:
+            token = _requisicao_atual.set(self._requisicao)
+            try:
+                pedaco = next(iterador)
+            except StopIteration:
+                break
+            finally:
+                _requisicao_atual.reset(token)
+            self.tamanho += len(pedaco)
+            yield pedaco
+        self._registrar()
+
+    def close(self):
+        try:
+            if hasattr(self._resposta, "close"):
+                self._resposta.close()
+        finally:
+            self._registrar()
+
+
+class MiddlewareMetricas:
+    def __init__(self, wsgi_app, coletor):
+        self.wsgi_app = wsgi_app
+        self.coletor = coletor
+
+    def __call__(self, environ, start_response):
+        requisicao = _Requisicao()
+        inicio = time.perf_counter()
+        status = ["000"]
+
+        def start_response_medido(status_linha, cabecalhos, exc_info=None):
+            status[0] = status_linha[:3]
+            return start_response(status_linha, cabecalhos, exc_info)
+
+        def ao_fechar(tamanho):
+            self.coletor.registrar(
+                environ.get(CHAVE_ENDPOINT) or SEM_ROTA, environ.get("REQUEST_METHOD", ""), status[0],
+                time.perf_counter() - inicio, requisicao.sql_comandos, requisicao.sql_segundos, tamanho
+            )
+
+        token = _requisicao_atual.set(requisicao)
+        try:
+            resposta = self.wsgi_app(environ, start_response_medido)
+        except BaseException:
+            ao_fechar(0)
+            raise
+        finally:
+            _requisicao_atual.reset(token)
+        return _RespostaMedida(resposta, requisicao, ao_fechar)
+
+
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if _requisicao_atual.get() is not None:
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    requisicao = _requisicao_atual.get()
+    inicios = conn.info.get("metricas_inicio")
+    if requisicao is not None and inicios:
+        requisicao.sql_comandos += 1
+        requisicao.sql_segundos += time.perf_counter() - inicios.pop()
+
+
+def instalar_metricas(app, engine, caminho=None):
+    """
+    Liga as métricas no app: middleware WSGI, hook que anota o endpoint e
+    eventos de SQL no engine. O coletor fica em app.extensions["metricas"].
+    """
+    coletor = ColetorMetricas(caminho)
+    app.extensions["metricas"] = coletor
+    app.wsgi_app = MiddlewareMetricas(app.wsgi_app, coletor)
+
+    @app.before_request
+    def _anotar_endpoint():
+        request.environ[CHAVE_ENDPOINT] = request.endpoint or SEM_ROTA
+
+    event.listen(engine, "before_cursor_execute", _antes_sql)
+    event.listen(engine, "after_cursor_execute", _depois_sql)
+    return coletor
+
+
+# -----------------------
+# Formatos de saída
+# -----------------------
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(**rotulos):
+    return ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos.items())
+
+
+def _linhas_histograma(nome, limites, histograma, rotulos):
+    linhas, acumulado = [], 0
+    for limite, quantidade in zip(list(limites) + ["+Inf"], histograma["buckets"]):
+        acumulado += quantidade
+        linhas.append(f"{nome}_bucket{{{rotulos},le=\"{limite}\"}} {acumulado}")
+    linhas.append(f"{nome}_sum{{{rotulos}}} {histograma['soma']:.6g}")
+    linhas.append(f"{nome}_count{{{rotulos}}} {acumulado}")
+    return linhas
+
+
+def formato_prometheus(series):
+    """Texto no formato de exposição do Prometheus (0.0.4)."""
+    definicoes = [
+        ("http_requisicoes_total", "counter", "Requisições por endpoint, método e status HTTP."),
+        ("http_requisicao_duracao_segundos", "histogram", "Duração da requisição até o fim da resposta."),
+        ("sql_comandos_por_requisicao", "histogram", "Comandos SQL executados por requisição."),
+        ("sql_duracao_segundos_total", "counter", "Tempo total gasto em SQL pelas requisições."),
+        ("http_resposta_bytes", "histogram", "Tamanho da resposta enviada."),
+    ]
+    blocos = {nome: [] for nome, _, _ in definicoes}
+    for endpoint, metodo, serie in sorted(series, key=lambda s: (s[0], s[1])):
+        rotulos = _rotulos(endpoint=endpoint, metodo=metodo)
+        for status, total in sorted(serie["status"].items()):
+            blocos["http_requisicoes_total"].append(
+                f"{PREFIXO}_http_requisicoes_total{{{rotulos},status=\"{status}\"}} {total}")
+        blocos["http_requisicao_duracao_segundos"] += _linhas_histograma(
+            f"{PREFIXO}_http_requisicao_duracao_segundos", BUCKETS_LATENCIA, serie["latencia"], rotulos)
+        blocos["sql_comandos_por_requisicao"] += _linhas_histograma(
+            f"{PREFIXO}_sql_comandos_por_requisicao", BUCKETS_SQL, serie["sql"], rotulos)
+        blocos["sql_duracao_segundos_total"].append(
+            f"{PREFIXO}_sql_duracao_segundos_total{{{rotulos}}} {serie['sql_segundos']:.6f}")
+        blocos["http_resposta_bytes"] += _linhas_histograma(
+            f"{PREFIXO}_http_resposta_bytes", BUCKETS_BYTES, serie["bytes"], rotulos)
+
+    saida = []
+    for nome, tipo, ajuda in definicoes:
+        saida += [f"# HELP {PREFIXO}_{nome} {ajuda}", f"# TYPE {PREFIXO}_{nome} {tipo}"] + blocos[nome]
+    return "\n".join(saida) + "\n"
+
+
+def percentil(limites, buckets, fracao):
+    """Percentil estimado do histograma (interpolação linear dentro do bucket)."""
+    total = sum(buckets)
+    if not total:
+        return None
+    alvo, acumulado, anterior = fracao * total, 0, 0.0
+    for limite, quantidade in zip(limites, buckets):
+        if quantidade and acumulado + quantidade >= alvo:
+            return anterior + (limite - anterior) * (alvo - acumulado) / quantidade
+        acumulado += quantidade
+        anterior = limite
+    return limites[-1]  # caiu no +Inf: o máximo conhecido é o último limite
+
+
+def resumo_json(series):
+    """Resumo por rota (mais tempo total primeiro) para leitura humana."""
+    rotas = []
+    for endpoint, metodo, serie in series:
+        n = sum(serie["latencia"]["buckets"])
+        if not n:
+            continue
+        rotas.append({
+            "endpoint": endpoint,
+            "metodo": metodo,
+            "requisicoes": n,
+            "erros_5xx": sum(t for s, t in serie["status"].items() if s.startswith("5")),
+            "status": serie["status"],
+            "latencia_ms": {
+                "media": round(serie["latencia"]["soma"] / n * 1000, 2),
+                "p50": round(percentil(BUCKETS_LATENCIA, serie["latencia"]["buckets"], 0.50) * 1000, 2),
+                "p95": round(percentil(BUCKETS_LATENCIA, serie["latencia"]["buckets"], 0.95) * 1000, 2),
+                "p99": round(percentil(BUCKETS_LATENCIA, serie["latencia"]["buckets"], 0.99) * 1000, 2),
+            },
+            "sql_por_requisicao": round(serie["sql"]["soma"] / n, 2),
+            "sql_ms_por_requisicao": round(serie["sql_segundos"] / n * 1000, 2),
+            "bytes_por_requisicao": round(serie["bytes"]["soma"] / n),
+            "tempo_total_s": round(serie["latencia"]["soma"], 3),
+        })
+    return sorted(rotas, key=lambda r: r["tempo_total_s"], reverse=True)
+
+
+__all__ = ["BUCKETS_LATENCIA", "BUCKETS_SQL", "BUCKETS_BYTES", "ColetorMetricas", "MiddlewareMetricas",
+           "instalar_metricas", "formato_prometheus", "percentil", "resumo_json"]
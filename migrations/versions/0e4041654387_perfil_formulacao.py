@@ -0,0 +1,132 @@
+"""Tabela perfil_formulacao (estatísticas por tipo de espuma para a IA)
+
+Revision ID: 0e4041654387
+Revises: ffa257ad9dea
+Create Date: 2026-10-18 10:02:17.530941
+
+"""
+from datetime import datetime
+from statistics import median
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0e4041654387'
+down_revision = 'ffa257ad9dea'
+branch_labels = None
+depends_on = None
+
+# Mesmos critérios de perfil_formulacao.py (cópia: a migração não importa o app)
+JANELA_ROBUSTA = 200
+
+
+def _eh_agua(nome):
+    nome = (nome or '').lower()
+    return 'água' in nome or 'water' in nome or 'agua' in nome
+
+
+def _eh_poliol(nome):
+    nome = (nome or '').lower()
+    return 'poliol' in nome or 'polyol' in nome
+
+
+def _n_media_m2(valores):
+    """(n, média, soma dos quadrados dos desvios) — o estado final do Welford."""
+    n = len(valores)
+    if not n:
+        return 0, 0.0, 0.0
+    media = sum(valores) / n
+    return n, media, sum((x - media) ** 2 for x in valores)
+
+
+def _popular_perfis(conn):
+    """Perfis das produções ativas existentes (equivale a `flask recalcular-perfis`)."""
+    tipos = dict(conn.execute(sa.text("SELECT nome, id FROM tipo_espuma")).fetchall())
+    producoes = {}
+    for pid, tipo, conformidade, altura in conn.execute(sa.text(
+            "SELECT id, tipo_espuma, conformidade, altura FROM producao "
+            "WHERE status != 'C' ORDER BY data_producao DESC, id DESC")):
+        if tipo in tipos:
+            producoes[pid] = (tipo, conformidade, altura, [])
+    for pid, componente_id, nome, quantidade in conn.execute(sa.text(
+            "SELECT cp.producao_id, cp.componente_id, c.nome, cp.quantidade_usada "
+            "FROM componenteproducao cp JOIN componente c ON c.id = cp.componente_id ORDER BY cp.id")):
+        if pid in producoes:
+            producoes[pid][3].append((componente_id, nome, quantidade))
+
+    por_tipo = {}
+    for tipo, conformidade, altura, itens in producoes.values():  # mais recentes primeiro
+        por_tipo.setdefault(tipo, []).append((conformidade, altura, itens))
+
+    linhas = []
+    for tipo, lista in por_tipo.items():
+        relacoes, componentes = [], {}
+        for posicao, (_, _, itens) in enumerate(lista):
+            agua = next((q for _, nome, q in itens if _eh_agua(nome) and q), None)
+            poliol = next((q for _, nome, q in itens if _eh_poliol(nome) and q), None)
+            if agua and poliol and poliol > 0:
+                relacoes.append(agua / poliol)
+            for componente_id, nome, quantidade in itens:
+                if quantidade is not None:
+                    est = componentes.setdefault(str(componente_id), {"nome": nome, "valores": [], "recentes": []})
+                    est["valores"].append(quantidade)
+                    if posicao < JANELA_ROBUSTA:
+                        est["recentes"].append(quantidade)
+
+        for est in componentes.values():
+            est["n"], est["media"], est["m2"] = _n_media_m2(est.pop("valores"))
+            recentes = est.pop("recentes")
+            if recentes:
+                est["mediana"] = float(median(recentes))
+                est["mad"] = float(median(abs(x - est["mediana"]) for x in recentes))
+
+        altura_n, altura_media, altura_m2 = _n_media_m2([a for _, a, _ in lista if a])
+        relacao_n, relacao_media, relacao_m2 = _n_media_m2(relacoes)
+        linhas.append({
+            "tipo_espuma_id": tipos[tipo], "total": len(lista),
+            "nao_conformes": sum(1 for c, _, _ in lista if c == 'Não Conforme'),
+            "altura_n": altura_n, "altura_media": altura_media, "altura_m2": altura_m2,
+            "relacao_n": relacao_n, "relacao_media": relacao_media, "relacao_m2": relacao_m2,
+            "componentes": componentes, "atualizado_em": datetime.now(),
+        })
+    return linhas
+
+
+def upgrade():
+    op.create_table(
+        'perfil_formulacao',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo_espuma_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('nao_conformes', sa.Integer(), nullable=False),
+        sa.Column('altura_n', sa.Integer(), nullable=False),
+        sa.Column('altura_media', sa.Float(), nullable=False),
+        sa.Column('altura_m2', sa.Float(), nullable=False),
+        sa.Column('relacao_n', sa.Integer(), nullable=False),
+        sa.Column('relacao_media', sa.Float(), nullable=False),
+        sa.Column('relacao_m2', sa.Float(), nullable=False),
+        sa.Column('componentes', sa.JSON(), nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tipo_espuma_id'], ['tipo_espuma.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tipo_espuma_id')
+    )
+
+    # Popula com o histórico existente
+    perfil = sa.table(
+        'perfil_formulacao',
+        *(sa.column(nome, tipo) for nome, tipo in (
+            ('tipo_espuma_id', sa.Integer), ('total', sa.Integer), ('nao_conformes', sa.Integer),
+            ('altura_n', sa.Integer), ('altura_media', sa.Float), ('altura_m2', sa.Float),
+            ('relacao_n', sa.Integer), ('relacao_media', sa.Float), ('relacao_m2', sa.Float),
+            ('componentes', sa.JSON), ('atualizado_em', sa.DateTime)))
+    )
+    linhas = _popular_perfis(op.get_bind())
+    if linhas:
+        op.bulk_insert(perfil, linhas)
+
+
+def downgrade():
+    op.drop_table('perfil_formulacao')
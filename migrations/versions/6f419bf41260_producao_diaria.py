@@ -0,0 +1,59 @@
+"""Rollup producao_diaria para o dashboard
+
+Revision ID: 6f419bf41260
+Revises: 0e4041654387
+Create Date: 2026-10-18 11:20:43.905127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f419bf41260'
+down_revision = '0e4041654387'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'producao_diaria',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.Date(), nullable=False),
+        sa.Column('tipo_espuma', sa.String(length=50), nullable=False),
+        sa.Column('componente_id', sa.Integer(), nullable=False),
+        sa.Column('quantidade_producoes', sa.Integer(), nullable=False),
+        sa.Column('conformes', sa.Integer(), nullable=False),
+        sa.Column('nao_conformes', sa.Integer(), nullable=False),
+        sa.Column('quantidade_usada', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('data', 'tipo_espuma', 'componente_id', name='uq_producao_diaria')
+    )
+
+    # Popula com o histórico existente (componente_id = 0 -> totais dos blocos)
+    op.execute("""
+        INSERT INTO producao_diaria (data, tipo_espuma, componente_id, quantidade_producoes, conformes, nao_conformes, quantidade_usada)
+        SELECT data_producao, tipo_espuma, 0, COUNT(*),
+               SUM(CASE WHEN conformidade = 'Conforme' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN conformidade = 'Não Conforme' THEN 1 ELSE 0 END),
+               0
+        FROM producao
+        WHERE status != 'C'
+        GROUP BY data_producao, tipo_espuma
+    """)
+    op.execute("""
+        INSERT INTO producao_diaria (data, tipo_espuma, componente_id, quantidade_producoes, conformes, nao_conformes, quantidade_usada)
+        SELECT p.data_producao, p.tipo_espuma, cp.componente_id, COUNT(*),
+               SUM(CASE WHEN p.conformidade = 'Conforme' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN p.conformidade = 'Não Conforme' THEN 1 ELSE 0 END),
+               SUM(cp.quantidade_usada)
+        FROM componenteproducao cp
+        JOIN producao p ON p.id = cp.producao_id
+        WHERE p.status != 'C'
+        GROUP BY p.data_producao, p.tipo_espuma, cp.componente_id
+    """)
+
+
+def downgrade():
+    op.drop_table('producao_diaria')
@@ -0,0 +1,29 @@
+"""Versão dos dados de negócio (invalidação de relatórios)
+
+Revision ID: a3d9f5b7c210
+Revises: f2c6d8e0b913
+Create Date: 2026-10-18 23:12:40.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d9f5b7c210'
+down_revision = 'f2c6d8e0b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'versao_dados',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('valor', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('versao_dados')
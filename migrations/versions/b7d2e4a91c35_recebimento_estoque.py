@@ -0,0 +1,46 @@
+"""Documento de recebimento de estoque (várias linhas)
+
+Revision ID: b7d2e4a91c35
+Revises: 6f419bf41260
+Create Date: 2026-10-18 14:05:12.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4a91c35'
+down_revision = '6f419bf41260'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'recebimento_estoque',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('numero_documento', sa.String(length=50), nullable=True),
+        sa.Column('fornecedor', sa.String(length=120), nullable=True),
+        sa.Column('data', sa.Date(), nullable=False),
+        sa.Column('observacao', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=1), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('criado_em', sa.DateTime(), nullable=True),
+        sa.Column('estornado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('movimentacao', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recebimento_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_movimentacao_recebimento_id'), ['recebimento_id'], unique=False)
+        batch_op.create_foreign_key('fk_movimentacao_recebimento_id', 'recebimento_estoque', ['recebimento_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('movimentacao', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_movimentacao_recebimento_id'))
+        batch_op.drop_column('recebimento_id')
+
+    op.drop_table('recebimento_estoque')
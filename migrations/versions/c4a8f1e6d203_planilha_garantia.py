@@ -0,0 +1,63 @@
+"""Planilhas de garantia e frequência de defeitos (análise preditiva)
+
+Revision ID: c4a8f1e6d203
+Revises: b7d2e4a91c35
+Create Date: 2026-10-18 16:20:41.907315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8f1e6d203'
+down_revision = 'b7d2e4a91c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'planilha_garantia',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nome_arquivo', sa.String(length=255), nullable=False),
+        sa.Column('hash_conteudo', sa.String(length=64), nullable=False),
+        sa.Column('linhas', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hash_conteudo')
+    )
+    op.create_table(
+        'registro_garantia',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('planilha_id', sa.Integer(), nullable=False),
+        sa.Column('produto', sa.String(length=120), nullable=False),
+        sa.Column('grupo', sa.String(length=120), nullable=False),
+        sa.Column('defeito', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['planilha_id'], ['planilha_garantia.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('registro_garantia', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_registro_garantia_planilha_id'), ['planilha_id'], unique=False)
+
+    op.create_table(
+        'frequencia_defeito',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('produto', sa.String(length=120), nullable=False),
+        sa.Column('grupo', sa.String(length=120), nullable=False),
+        sa.Column('defeito', sa.String(length=255), nullable=False),
+        sa.Column('quantidade', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('produto', 'grupo', 'defeito', name='uq_frequencia_defeito')
+    )
+
+
+def downgrade():
+    op.drop_table('frequencia_defeito')
+    with op.batch_alter_table('registro_garantia', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_registro_garantia_planilha_id'))
+
+    op.drop_table('registro_garantia')
+    op.drop_table('planilha_garantia')
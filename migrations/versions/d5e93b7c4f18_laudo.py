@@ -0,0 +1,61 @@
+"""Laudo técnico com volume/densidade calculados no servidor
+
+Revision ID: d5e93b7c4f18
+Revises: c4a8f1e6d203
+Create Date: 2026-10-18 18:02:57.114020
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e93b7c4f18'
+down_revision = 'c4a8f1e6d203'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'laudo',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('producao_id', sa.Integer(), nullable=True),
+        sa.Column('numero_bloco', sa.String(length=50), nullable=True),
+        sa.Column('tipo_espuma', sa.String(length=50), nullable=True),
+        sa.Column('pedido', sa.String(length=50), nullable=True),
+        sa.Column('cliente', sa.String(length=120), nullable=True),
+        sa.Column('densidade_nominal', sa.String(length=50), nullable=True),
+        sa.Column('lote', sa.String(length=50), nullable=True),
+        sa.Column('bloco_largura_cm', sa.Float(), nullable=True),
+        sa.Column('bloco_comprimento_cm', sa.Float(), nullable=True),
+        sa.Column('bloco_altura_cm', sa.Float(), nullable=True),
+        sa.Column('posicao_lamina', sa.String(length=20), nullable=True),
+        sa.Column('peso_kg', sa.Float(), nullable=False),
+        sa.Column('largura_m', sa.Float(), nullable=False),
+        sa.Column('comprimento_m', sa.Float(), nullable=False),
+        sa.Column('altura_m', sa.Float(), nullable=False),
+        sa.Column('volume_m3', sa.Float(), nullable=True),
+        sa.Column('densidade', sa.Float(), nullable=True),
+        sa.Column('data', sa.Date(), nullable=False),
+        sa.Column('observacoes', sa.Text(), nullable=True),
+        sa.Column('responsavel', sa.String(length=120), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['producao_id'], ['producao.id'], ),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('laudo', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_laudo_producao_id'), ['producao_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_laudo_numero_bloco'), ['numero_bloco'], unique=False)
+        batch_op.create_index('ix_laudo_tipo_espuma_data', ['tipo_espuma', 'data', 'densidade'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('laudo', schema=None) as batch_op:
+        batch_op.drop_index('ix_laudo_tipo_espuma_data')
+        batch_op.drop_index(batch_op.f('ix_laudo_numero_bloco'))
+        batch_op.drop_index(batch_op.f('ix_laudo_producao_id'))
+
+    op.drop_table('laudo')
@@ -0,0 +1,46 @@
+"""Execuções de relatórios em segundo plano
+
+Revision ID: e7b1c9d2a456
+Revises: d5e93b7c4f18
+Create Date: 2026-10-18 19:10:42.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b1c9d2a456'
+down_revision = 'd5e93b7c4f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'relatorio_execucao',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('parametros', sa.Text(), nullable=False),
+        sa.Column('chave', sa.String(length=64), nullable=False),
+        sa.Column('versao_dados', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=12), nullable=False),
+        sa.Column('resultado', sa.Text(), nullable=True),
+        sa.Column('linhas', sa.Integer(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=False),
+        sa.Column('iniciado_em', sa.DateTime(), nullable=True),
+        sa.Column('concluido_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('relatorio_execucao', schema=None) as batch_op:
+        batch_op.create_index('ix_relatorio_execucao_chave', ['chave', 'versao_dados'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('relatorio_execucao', schema=None) as batch_op:
+        batch_op.drop_index('ix_relatorio_execucao_chave')
+
+    op.drop_table('relatorio_execucao')
@@ -0,0 +1,52 @@
+"""Fila durável de tarefas em segundo plano
+
+Revision ID: f2c6d8e0b913
+Revises: e7b1c9d2a456
+Create Date: 2026-10-18 20:04:17.336921
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6d8e0b913'
+down_revision = 'e7b1c9d2a456'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tarefa',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nome', sa.String(length=80), nullable=False),
+        sa.Column('parametros', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=12), nullable=False),
+        sa.Column('progresso', sa.Float(), nullable=False),
+        sa.Column('mensagem', sa.String(length=255), nullable=True),
+        sa.Column('resultado', sa.Text(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('tentativas', sa.Integer(), nullable=False),
+        sa.Column('max_tentativas', sa.Integer(), nullable=False),
+        sa.Column('chave_unica', sa.String(length=120), nullable=True),
+        sa.Column('worker', sa.String(length=120), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('agendada_para', sa.DateTime(), nullable=False),
+        sa.Column('criado_em', sa.DateTime(), nullable=False),
+        sa.Column('iniciado_em', sa.DateTime(), nullable=True),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.Column('concluido_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chave_unica')
+    )
+    with op.batch_alter_table('tarefa', schema=None) as batch_op:
+        batch_op.create_index('ix_tarefa_status_agendada', ['status', 'agendada_para'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tarefa', schema=None) as batch_op:
+        batch_op.drop_index('ix_tarefa_status_agendada')
+
+    op.drop_table('tarefa')
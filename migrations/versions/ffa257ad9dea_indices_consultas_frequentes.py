@@ -0,0 +1,41 @@
+"""Índices para as consultas frequentes (dashboard, IA, estoque)
+
+Revision ID: ffa257ad9dea
+Revises: 843c25ba9e47
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'ffa257ad9dea'
+down_revision = '843c25ba9e47'
+branch_labels = None
+depends_on = None
+
+
+# (nome do índice, tabela, colunas) — mesmos nomes declarados em models.py
+INDICES = [
+    ('ix_producao_data_status', 'producao', ['data_producao', 'status']),
+    ('ix_producao_tipo_data', 'producao', ['tipo_espuma', 'data_producao']),
+    ('ix_componenteproducao_producao_id', 'componenteproducao', ['producao_id']),
+    ('ix_componenteproducao_componente_id', 'componenteproducao', ['componente_id']),
+    ('ix_movimentacao_componente_id', 'movimentacao', ['componente_id']),
+    ('ix_movimentacao_producao_id', 'movimentacao', ['producao_id']),
+    ('ix_estoque_componente_id', 'estoque', ['componente_id']),
+]
+
+
+def upgrade():
+    # if_not_exists: bancos novos já saem do db.create_all() com os índices
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas, unique=False, if_not_exists=True)
+
+    # Atualiza as estatísticas do planner do SQLite para os novos índices
+    op.execute("ANALYZE")
+
+
+def downgrade():
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela, if_exists=True)
@@ -1,6 +1,6 @@
 # models.py
 from flask_sqlalchemy import SQLAlchemy
-from datetime import date
+from datetime import date, datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from flask_bcrypt import Bcrypt
@@ -21,6 +21,10 @@ class Componente(db.Model):
 
 class Producao(db.Model):
     __tablename__ = "producao"
+    __table_args__ = (
+        db.Index("ix_producao_data_status", "data_producao", "status"),  # dashboard (período + status)
+        db.Index("ix_producao_tipo_data", "tipo_espuma", "data_producao"),  # histórico por tipo (IA)
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     producao_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -33,9 +37,8 @@ class Producao(db.Model):
     usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=False)
     status = db.Column(db.String(20), nullable=True, default="A")  # Novo campo para status da produção
 
-    usuario = db.relationship("Usuario", back_populates="producoes")
-
-    componentes = db.relationship('ComponenteProducao',back_populates='producao',cascade='all, delete-orphan')
+    # joined: a listagem sempre exibe o nome do usuário (evita 1 SELECT por linha)
+    usuario = db.relationship("Usuario", back_populates="producoes", lazy="joined")
 
     componentes = db.relationship('ComponenteProducao',back_populates='producao',cascade='all, delete-orphan')
     def __repr__(self):
@@ -45,11 +48,11 @@ class Producao(db.Model):
 class ComponenteProducao(db.Model):
     __tablename__ = "componenteproducao"  # ou manter maiúsculo, mas deve bater com FK
     id = db.Column(db.Integer, primary_key=True)
-    producao_id = db.Column(db.Integer, db.ForeignKey("producao.id"), nullable=False)
-    componente_id = db.Column(db.Integer, db.ForeignKey("componente.id"), nullable=False)
+    producao_id = db.Column(db.Integer, db.ForeignKey("producao.id"), nullable=False, index=True)
+    componente_id = db.Column(db.Integer, db.ForeignKey("componente.id"), nullable=False, index=True)
     quantidade_usada = db.Column(db.Float, nullable=False)
 
-    componente = db.relationship("Componente")
+    componente = db.relationship("Componente", lazy="joined")
     producao = db.relationship("Producao", back_populates="componentes")
     def __repr__(self):
         return f"<ComponenteProducao Produção:{self.producao_id} Componente:{self.componente_id} Qtd:{self.quantidade_usada}>"
@@ -57,11 +60,12 @@ class ComponenteProducao(db.Model):
 class Movimentacao(db.Model):
     __tablename__ = "movimentacao"
     id = db.Column(db.Integer, primary_key=True)
-    componente_id = db.Column(db.Integer, db.ForeignKey("componente.id"), nullable=False)
+    componente_id = db.Column(db.Integer, db.ForeignKey("componente.id"), nullable=False, index=True)
     tipo = db.Column(db.String(10), nullable=False)  # 'entrada' ou 'saida'
     quantidade = db.Column(db.Float, nullable=False)
     data = db.Column(db.Date, default=date.today, nullable=False)
-    producao_id = db.Column(db.Integer, db.ForeignKey("producao.id"), nullable=True)
+    producao_id = db.Column(db.Integer, db.ForeignKey("producao.id"), nullable=True, index=True)
+    recebimento_id = db.Column(db.Integer, db.ForeignKey("recebimento_estoque.id"), nullable=True, index=True)
     componente = db.relationship("Componente", backref="movimentacoes")
     producao = db.relationship("Producao", backref="movimentacoes")
     observacao = db.Column(db.Text, nullable=True, default=None)
@@ -72,7 +76,7 @@ class Movimentacao(db.Model):
 class Estoque(db.Model):
     __tablename__ = "estoque"
     id = db.Column(db.Integer, primary_key=True)
-    componente_id = db.Column(db.Integer, db.ForeignKey("componente.id"), nullable=False)
+    componente_id = db.Column(db.Integer, db.ForeignKey("componente.id"), nullable=False, index=True)
     quantidade = db.Column(db.Float, default=0.0, nullable=False)
 
     componente = db.relationship("Componente", backref="estoque")
@@ -87,9 +91,10 @@ class FichaTecnica(db.Model):
     tipo_espuma_id = db.Column(db.Integer, db.ForeignKey('tipo_espuma.id'), nullable=False)
     descricao = db.Column(db.Text, nullable=True)
 
-    tipo_espuma = db.relationship("TipoEspuma", back_populates="fichas_tecnicas")
+    tipo_espuma = db.relationship("TipoEspuma", back_populates="fichas_tecnicas", lazy="joined")
 
-    componentes = db.relationship("FichaTecnicaComponente",back_populates="ficha_tecnica",cascade="all, delete-orphan")
+    # selectin: uma única consulta IN (...) para os componentes de todas as fichas carregadas
+    componentes = db.relationship("FichaTecnicaComponente",back_populates="ficha_tecnica",cascade="all, delete-orphan", lazy="selectin")
 
     def __repr__(self):
         return f"<FichaTecnica {self.tipo_espuma}>"
@@ -115,7 +120,7 @@ class FichaTecnicaComponente(db.Model):
     componente_id = db.Column(db.Integer, db.ForeignKey('componente.id'), nullable=False)
 
     ficha_tecnica = db.relationship("FichaTecnica", back_populates="componentes")
-    componente = db.relationship("Componente", backref="fichas_tecnicas")
+    componente = db.relationship("Componente", backref="fichas_tecnicas", lazy="joined")
 
     def __repr__(self):
         return f"<FichaTecnicaComponente FichaTecnicaID={self.ficha_tecnica_id}, ComponenteID={self.componente_id}>"
@@ -143,6 +148,246 @@ class Usuario(db.Model, UserMixin):
         return f"<Usuario {self.email}>"
 
 
+class PerfilFormulacao(db.Model):
+    """Estatísticas acumuladas (Welford) das produções ativas de um tipo de espuma."""
+    __tablename__ = "perfil_formulacao"
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo_espuma_id = db.Column(db.Integer, db.ForeignKey("tipo_espuma.id"), nullable=False, unique=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    nao_conformes = db.Column(db.Integer, nullable=False, default=0)
+    altura_n = db.Column(db.Integer, nullable=False, default=0)
+    altura_media = db.Column(db.Float, nullable=False, default=0.0)
+    altura_m2 = db.Column(db.Float, nullable=False, default=0.0)
+    relacao_n = db.Column(db.Integer, nullable=False, default=0)  # relação água/poliol
+    relacao_media = db.Column(db.Float, nullable=False, default=0.0)
+    relacao_m2 = db.Column(db.Float, nullable=False, default=0.0)
+    # {"<componente_id>": {"nome": str, "n": int, "media": float, "m2": float}}
+    componentes = db.Column(db.JSON, nullable=False, default=dict)
+    atualizado_em = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    tipo_espuma = db.relationship("TipoEspuma")
+
+    def __repr__(self):
+        return f"<PerfilFormulacao TipoEspuma={self.tipo_espuma_id} N={self.total}>"
+
+class ProducaoDiaria(db.Model):
+    """
+    Rollup diário mantido a cada lançamento/cancelamento (lido pelo /dashboard).
+    componente_id = 0 é a linha de totais dos blocos do dia/tipo; as demais
+    linhas trazem o consumo de cada componente.
+    """
+    __tablename__ = "producao_diaria"
+    __table_args__ = (
+        db.UniqueConstraint("data", "tipo_espuma", "componente_id", name="uq_producao_diaria"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    tipo_espuma = db.Column(db.String(50), nullable=False)
+    componente_id = db.Column(db.Integer, nullable=False, default=0)
+    quantidade_producoes = db.Column(db.Integer, nullable=False, default=0)
+    conformes = db.Column(db.Integer, nullable=False, default=0)
+    nao_conformes = db.Column(db.Integer, nullable=False, default=0)
+    quantidade_usada = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<ProducaoDiaria {self.data} {self.tipo_espuma} Componente={self.componente_id} Qtd={self.quantidade_producoes}>"
+
+class RecebimentoEstoque(db.Model):
+    """
+    Documento de recebimento (entrada de mercadoria) com várias linhas.
+    As linhas são as movimentações de entrada com recebimento_id; o estorno
+    lança as saídas correspondentes e marca o documento com status 'E'.
+    """
+    __tablename__ = "recebimento_estoque"
+
+    id = db.Column(db.Integer, primary_key=True)
+    numero_documento = db.Column(db.String(50), nullable=True)  # nota fiscal / romaneio
+    fornecedor = db.Column(db.String(120), nullable=True)
+    data = db.Column(db.Date, default=date.today, nullable=False)
+    observacao = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(1), nullable=False, default="A")  # A = ativo, E = estornado
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=False)
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+    estornado_em = db.Column(db.DateTime, nullable=True)
+
+    usuario = db.relationship("Usuario", lazy="joined")
+    movimentacoes = db.relationship("Movimentacao", backref="recebimento", order_by="Movimentacao.id")
+
+    def __repr__(self):
+        return f"<RecebimentoEstoque {self.id} Doc={self.numero_documento} Status={self.status}>"
+
+
+class PlanilhaGarantia(db.Model):
+    """
+    Planilha de garantia enviada em /analise_preditiva. hash_conteudo (SHA-256
+    do arquivo) evita importar o mesmo arquivo duas vezes.
+    """
+    __tablename__ = "planilha_garantia"
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome_arquivo = db.Column(db.String(255), nullable=False)
+    hash_conteudo = db.Column(db.String(64), unique=True, nullable=False)
+    linhas = db.Column(db.Integer, nullable=False, default=0)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+
+    usuario = db.relationship("Usuario")
+
+    def __repr__(self):
+        return f"<PlanilhaGarantia {self.id} {self.nome_arquivo} Linhas={self.linhas}>"
+
+class RegistroGarantia(db.Model):
+    """Linha (produto, grupo, defeito) de uma planilha de garantia."""
+    __tablename__ = "registro_garantia"
+
+    id = db.Column(db.Integer, primary_key=True)
+    planilha_id = db.Column(db.Integer, db.ForeignKey("planilha_garantia.id"), nullable=False, index=True)
+    produto = db.Column(db.String(120), nullable=False)
+    grupo = db.Column(db.String(120), nullable=False)
+    defeito = db.Column(db.String(255), nullable=False)
+
+    def __repr__(self):
+        return f"<RegistroGarantia {self.produto}/{self.grupo}: {self.defeito}>"
+
+class FrequenciaDefeito(db.Model):
+    """
+    Contagem pré-agregada de defeitos por (produto, grupo), mantida a cada
+    planilha importada/removida: a previsão é uma busca pela chave.
+    """
+    __tablename__ = "frequencia_defeito"
+    __table_args__ = (
+        db.UniqueConstraint("produto", "grupo", "defeito", name="uq_frequencia_defeito"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    produto = db.Column(db.String(120), nullable=False)
+    grupo = db.Column(db.String(120), nullable=False)
+    defeito = db.Column(db.String(255), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<FrequenciaDefeito {self.produto}/{self.grupo}: {self.defeito}={self.quantidade}>"
+
+
+class Laudo(db.Model):
+    """
+    Laudo técnico de bloco laminado. volume_m3 e densidade são calculados no
+    servidor (peso / largura × comprimento × altura da lâmina); tipo_espuma e
+    data (+ densidade) indexados juntos: a deriva de densidade lê só o índice.
+    """
+    __tablename__ = "laudo"
+    __table_args__ = (
+        db.Index("ix_laudo_tipo_espuma_data", "tipo_espuma", "data", "densidade"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    producao_id = db.Column(db.Integer, db.ForeignKey("producao.id"), nullable=True, index=True)
+    numero_bloco = db.Column(db.String(50), nullable=True, index=True)
+    tipo_espuma = db.Column(db.String(50), nullable=True)
+    pedido = db.Column(db.String(50), nullable=True)
+    cliente = db.Column(db.String(120), nullable=True)
+    densidade_nominal = db.Column(db.String(50), nullable=True)  # como informado no laudo, ex.: "D33 selado"
+    lote = db.Column(db.String(50), nullable=True)
+    bloco_largura_cm = db.Column(db.Float, nullable=True)
+    bloco_comprimento_cm = db.Column(db.Float, nullable=True)
+    bloco_altura_cm = db.Column(db.Float, nullable=True)
+    posicao_lamina = db.Column(db.String(20), nullable=True)  # Topo / Meio / Fundo
+    peso_kg = db.Column(db.Float, nullable=False)
+    largura_m = db.Column(db.Float, nullable=False)
+    comprimento_m = db.Column(db.Float, nullable=False)
+    altura_m = db.Column(db.Float, nullable=False)
+    volume_m3 = db.Column(db.Float, nullable=True)
+    densidade = db.Column(db.Float, nullable=True)  # kg/m³; NULL = ainda não calculada
+    data = db.Column(db.Date, default=date.today, nullable=False)
+    observacoes = db.Column(db.Text, nullable=True)
+    responsavel = db.Column(db.String(120), nullable=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+
+    producao = db.relationship("Producao", backref="laudos")
+
+    def __repr__(self):
+        return f"<Laudo {self.id} Bloco={self.numero_bloco} Densidade={self.densidade}>"
+
+
+class RelatorioExecucao(db.Model):
+    """
+    Execução de um relatório em segundo plano (/relatorios). chave = hash do
+    tipo + parâmetros; com versao_dados (tabela versao_dados) decide
+    se um resultado já calculado ainda vale. resultado = JSON das linhas.
+    """
+    __tablename__ = "relatorio_execucao"
+    __table_args__ = (
+        db.Index("ix_relatorio_execucao_chave", "chave", "versao_dados"),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex (id do job devolvido ao usuário)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text, nullable=False)  # JSON
+    chave = db.Column(db.String(64), nullable=False)
+    versao_dados = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(12), nullable=False, default="pendente")  # pendente/executando/concluido/erro
+    resultado = db.Column(db.Text, nullable=True)
+    linhas = db.Column(db.Integer, nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<RelatorioExecucao {self.id} {self.tipo} Status={self.status}>"
+
+
+class Tarefa(db.Model):
+    """
+    Fila durável de tarefas em segundo plano (fila_tarefas.py). Um worker
+    reserva a próxima pendente com agendada_para <= agora; atualizado_em é o
+    sinal de vida enquanto executa. chave_unica evita agendar duas vezes a
+    mesma execução recorrente (ex.: "reconciliar-estoque@2026-10-18").
+    """
+    __tablename__ = "tarefa"
+    __table_args__ = (
+        db.Index("ix_tarefa_status_agendada", "status", "agendada_para"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(80), nullable=False)
+    parametros = db.Column(db.Text, nullable=True)  # JSON
+    status = db.Column(db.String(12), nullable=False, default="pendente")  # pendente/executando/concluida/erro
+    progresso = db.Column(db.Float, nullable=False, default=0.0)  # 0 a 100
+    mensagem = db.Column(db.String(255), nullable=True)
+    resultado = db.Column(db.Text, nullable=True)  # JSON
+    erro = db.Column(db.Text, nullable=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    max_tentativas = db.Column(db.Integer, nullable=False, default=3)
+    chave_unica = db.Column(db.String(120), nullable=True, unique=True)
+    worker = db.Column(db.String(120), nullable=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=True)
+    agendada_para = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    atualizado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<Tarefa {self.id} {self.nome} Status={self.status} {self.progresso:.0f}%>"
+
+
+class VersaoDados(db.Model):
+    """
+    Contador da versão dos dados (versao_dados.py): uma única linha (id=1),
+    incrementada na mesma transação de todo commit que altera dados de
+    negócio. Decide se um relatório já calculado ainda vale.
+    """
+    __tablename__ = "versao_dados"
+
+    id = db.Column(db.Integer, primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+
 
-__all__ = ["db", "Componente", "Producao", "ComponenteProducao", "Movimentacao", "Estoque", "FichaTecnica", "FichaTecnicaComponente", "TipoEspuma", "Usuario"]
+__all__ = ["db", "Componente", "Producao", "ComponenteProducao", "Movimentacao", "Estoque", "FichaTecnica", "FichaTecnicaComponente", "TipoEspuma", "Usuario", "PerfilFormulacao", "ProducaoDiaria", "RecebimentoEstoque", "PlanilhaGarantia", "RegistroGarantia", "FrequenciaDefeito", "Laudo", "RelatorioExecucao", "Tarefa", "VersaoDados"]
 
@@ -0,0 +1,201 @@
+# perfil_formulacao.py
+# -----------------------
+# Perfil estatístico por tipo de espuma para o assistente IA de formulação.
+# Atualizado incrementalmente (algoritmo de Welford) a cada produção lançada
+# ou cancelada, para que /api/ia-analise-producao responda com a leitura de
+# uma única linha indexada em vez de varrer o histórico.
+# -----------------------
+import numpy as np
+from models import db, PerfilFormulacao, Producao, ComponenteProducao, Componente, TipoEspuma
+
+JANELA_ROBUSTA = 200        # produções recentes usadas para mediana/MAD
+
+
+# -----------------------
+# Classificação dos componentes pelo nome
+# -----------------------
+def eh_agua(nome):
+    nome = (nome or '').lower()
+    return 'água' in nome or 'water' in nome or 'agua' in nome
+
+
+def eh_poliol(nome):
+    nome = (nome or '').lower()
+    return 'poliol' in nome or 'polyol' in nome
+
+
+# -----------------------
+# Welford: média/variância incrementais (com remoção para cancelamentos)
+# -----------------------
+def welford_adicionar(n, media, m2, x):
+    n += 1
+    delta = x - media
+    media += delta / n
+    m2 += delta * (x - media)
+    return n, media, m2
+
+
+def welford_remover(n, media, m2, x):
+    if n <= 1:
+        return 0, 0.0, 0.0
+    n_novo = n - 1
+    media_nova = (n * media - x) / n_novo
+    m2 = max(m2 - (x - media) * (x - media_nova), 0.0)
+    return n_novo, media_nova, m2
+
+
+def variancia(n, m2):
+    """Variância amostral (0 com menos de 2 amostras)."""
+    return m2 / (n - 1) if n > 1 else 0.0
+
+
+def _relacao_agua_poliol(itens):
+    agua = next((q for _, nome, q in itens if eh_agua(nome) and q), None)
+    poliol = next((q for _, nome, q in itens if eh_poliol(nome) and q), None)
+    if agua and poliol and poliol > 0:
+        return agua / poliol
+    return None
+
+
+# -----------------------
+# Manutenção do perfil
+# -----------------------
+def obter_perfil(tipo_espuma_id, criar=False):
+    perfil = PerfilFormulacao.query.filter_by(tipo_espuma_id=tipo_espuma_id).first()
+    if perfil is None and criar:
+        perfil = PerfilFormulacao(tipo_espuma_id=tipo_espuma_id, total=0, nao_conformes=0,
+                                  altura_n=0, altura_media=0.0, altura_m2=0.0,
+                                  relacao_n=0, relacao_media=0.0, relacao_m2=0.0,
+                                  componentes={})
+        db.session.add(perfil)
+    return perfil
+
+
+def atualizar_perfil(tipo_espuma_id, producao, itens, remover=False):
+    """
+    Soma (ou retira, se remover=True) uma produção do perfil do tipo de espuma.
+    `itens` = lista de (componente_id, nome_componente, quantidade_usada).
+    Não faz commit: roda na mesma transação do lançamento/cancelamento.
+    """
+    perfil = obter_perfil(tipo_espuma_id, criar=True)
+    _aplicar_producao(perfil, producao, itens, remover)
+    return perfil
+
+
+def atualizar_perfis(lancamentos):
+    """
+    Versão em lote de atualizar_perfil + atualizar_estatisticas_robustas:
+    `lancamentos` = lista de (tipo_espuma_id, tipo_espuma_nome, producao, itens).
+    Lê cada perfil uma vez e recalcula mediana/MAD uma vez por tipo. Não faz commit.
+    """
+    por_tipo = {}
+    for tipo_espuma_id, tipo_espuma_nome, producao, itens in lancamentos:
+        por_tipo.setdefault((tipo_espuma_id, tipo_espuma_nome), []).append((producao, itens))
+
+    for (tipo_espuma_id, tipo_espuma_nome), producoes in por_tipo.items():
+        perfil = obter_perfil(tipo_espuma_id, criar=True)
+        for producao, itens in producoes:
+            _aplicar_producao(perfil, producao, itens)
+        atualizar_estatisticas_robustas(perfil, tipo_espuma_nome)
+
+
+def _aplicar_producao(perfil, producao, itens, remover=False):
+    passo = welford_remover if remover else welford_adicionar
+    sinal = -1 if remover else 1
+
+    perfil.total = max(perfil.total + sinal, 0)
+    if producao.conformidade == 'Não Conforme':
+        perfil.nao_conformes = max(perfil.nao_conformes + sinal, 0)
+
+    if producao.altura:
+        perfil.altura_n, perfil.altura_media, perfil.altura_m2 = passo(
+            perfil.altura_n, perfil.altura_media, perfil.altura_m2, producao.altura)
+
+    relacao = _relacao_agua_poliol(itens)
+    if relacao is not None:
+        perfil.relacao_n, perfil.relacao_media, perfil.relacao_m2 = passo(
+            perfil.relacao_n, perfil.relacao_media, perfil.relacao_m2, relacao)
+
+    # JSON: monta um novo dict para o SQLAlchemy detectar a alteração
+    componentes = {k: dict(v) for k, v in (perfil.componentes or {}).items()}
+    for componente_id, nome, quantidade in itens:
+        if quantidade is None:
+            continue
+        est = componentes.setdefault(str(componente_id), {"nome": nome, "n": 0, "media": 0.0, "m2": 0.0})
+        est["nome"] = nome
+        est["n"], est["media"], est["m2"] = passo(est["n"], est["media"], est["m2"], quantidade)
+    perfil.componentes = componentes
+
+
+def atualizar_estatisticas_robustas(perfil, tipo_espuma_nome):
+    """
+    Mediana e MAD (desvio absoluto mediano) de cada componente nas últimas
+    JANELA_ROBUSTA produções ativas do tipo. Não dá para manter mediana de forma
+    incremental, então é recalculada (uma consulta indexada) a cada lançamento
+    ou cancelamento — nunca no caminho de leitura. Não faz commit.
+    """
+    recentes = (
+        db.session.query(Producao.id)
+        .filter(Producao.tipo_espuma == tipo_espuma_nome, Producao.status != 'C')
+        .order_by(Producao.data_producao.desc(), Producao.id.desc())
+        .limit(JANELA_ROBUSTA)
+        .subquery()
+    )
+    linhas = (
+        db.session.query(ComponenteProducao.componente_id, ComponenteProducao.quantidade_usada)
+        .filter(ComponenteProducao.producao_id.in_(db.session.query(recentes.c.id)))
+        .all()
+    )
+
+    valores = {}
+    for componente_id, quantidade in linhas:
+        if quantidade is not None:
+            valores.setdefault(str(componente_id), []).append(quantidade)
+
+    componentes = {k: dict(v) for k, v in (perfil.componentes or {}).items()}
+    for chave, est in componentes.items():
+        amostra = np.asarray(valores.get(chave, []), dtype=float)
+        if amostra.size:
+            mediana = float(np.median(amostra))
+            est["mediana"] = mediana
+            est["mad"] = float(np.median(np.abs(amostra - mediana)))
+        else:
+            est.pop("mediana", None)
+            est.pop("mad", None)
+    perfil.componentes = componentes
+    return perfil
+
+
+def recalcular_perfis():
+    """
+    Reconstrói todos os perfis a partir das produções ativas (manutenção).
+    Faz commit. Retorna o número de perfis gerados.
+    """
+    PerfilFormulacao.query.delete()
+    tipos = {t.nome: t.id for t in TipoEspuma.query.all()}
+    nomes = {c.id: c.nome for c in Componente.query.all()}
+
+    itens_por_producao = {}
+    for producao_id, componente_id, quantidade in db.session.query(
+            ComponenteProducao.producao_id, ComponenteProducao.componente_id, ComponenteProducao.quantidade_usada
+    ).join(Producao).filter(Producao.status != 'C'):
+        itens_por_producao.setdefault(producao_id, []).append((componente_id, nomes.get(componente_id), quantidade))
+
+    for producao in Producao.query.filter(Producao.status != 'C').order_by(Producao.id):
+        tipo_id = tipos.get(producao.tipo_espuma)
+        if tipo_id is not None:
+            atualizar_perfil(tipo_id, producao, itens_por_producao.get(producao.id, []))
+
+    db.session.flush()
+    for nome, tipo_id in tipos.items():
+        perfil = obter_perfil(tipo_id)
+        if perfil is not None:
+            atualizar_estatisticas_robustas(perfil, nome)
+
+    db.session.commit()
+    return PerfilFormulacao.query.count()
+
+
+__all__ = ["eh_agua", "eh_poliol", "welford_adicionar", "welford_remover", "variancia",
+           "obter_perfil", "atualizar_perfil", "atualizar_perfis", "atualizar_estatisticas_robustas",
+           "recalcular_perfis"]
@@ -0,0 +1,190 @@
+# pontuacao_formulacao.py
+# -----------------------
+# Motor vetorizado (NumPy) de detecção de anomalias em formulações.
+# Pontua várias formulações de uma vez contra o perfil do tipo de espuma:
+#   - desvio percentual vs média (regras históricas do assistente IA)
+#   - z-score (média/desvio padrão de Welford)
+#   - z-score robusto (mediana/MAD, Iglewicz-Hoaglin)
+# /api/ia-analise-producao usa o mesmo motor com um lote de tamanho 1.
+# -----------------------
+import numpy as np
+
+from perfil_formulacao import eh_agua, eh_poliol, variancia
+
+MINIMO_HISTORICO = 5        # abaixo disso a análise só informa histórico limitado
+MINIMO_POR_COMPONENTE = 3   # mínimo de amostras para comparar componente/relação
+MAX_FORMULACOES_POR_LOTE = 1000  # /api/ia-analise-producao/lote
+
+# Limites (alerta, crítico)
+LIMITE_ALTURA_PCT = (10, 15)
+LIMITE_AGUA_PCT = (12, 20)        # água é crítica - tolerância menor
+LIMITE_COMPONENTE_PCT = (15, 25)
+LIMITE_RELACAO_PCT = 10           # relação água/poliol só gera alerta
+LIMITE_Z = (3.0, 4.5)
+LIMITE_Z_ROBUSTO = (3.5, 5.0)
+LIMITE_NAO_CONFORME_PCT = 15
+
+SEVERIDADES = ('', 'alerta', 'critico')
+
+
+def _severidade(valor_abs, limites):
+    """0 = ok, 1 = alerta, 2 = crítico (elemento a elemento; NaN conta como ok)."""
+    alerta, critico = limites
+    valor_abs = np.nan_to_num(valor_abs, nan=0.0)
+    return np.where(valor_abs > critico, 2, np.where(valor_abs > alerta, 1, 0))
+
+
+def _numero(valor):
+    try:
+        return float(valor) if valor else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def recomendacao_para(alertas):
+    if any(a['severidade'] == 'critico' for a in alertas):
+        return '🔴 Recomendado: consultar técnico antes de iniciar a batida'
+    if len(alertas) >= 2:
+        return '🟡 Dica: revise os parâmetros ou faça ajuste gradual para manter estabilidade'
+    if alertas:
+        return 'ℹ️ Valores ligeiramente fora do padrão. Monitorar resultado final.'
+    return '✅ Formulação dentro dos parâmetros históricos'
+
+
+def _referencia(perfil, chaves):
+    """Vetores de referência (n, média, desvio, mediana, MAD) na ordem de `chaves`."""
+    estatisticas = perfil.componentes or {}
+    n = np.zeros(len(chaves))
+    media = np.full(len(chaves), np.nan)
+    desvio = np.full(len(chaves), np.nan)
+    mediana = np.full(len(chaves), np.nan)
+    mad = np.full(len(chaves), np.nan)
+    nomes = []
+    for j, chave in enumerate(chaves):
+        est = estatisticas.get(chave.replace('componente_', ''))
+        if est is None:
+            nomes.append(None)
+            continue
+        nomes.append(est.get('nome') or chave)
+        n[j] = est['n']
+        media[j] = est['media']
+        desvio[j] = np.sqrt(variancia(est['n'], est['m2']))
+        mediana[j] = est.get('mediana', np.nan)
+        mad[j] = est.get('mad', np.nan)
+    return n, media, desvio, mediana, mad, nomes
+
+
+def pontuar_formulacoes(perfil, formulacoes):
+    """
+    Pontua uma lista de formulações do MESMO tipo de espuma.
+    Cada formulação: {'altura': float|None, 'componentes': {'componente_X': valor}}.
+    Retorna uma lista (mesma ordem) de {alertas, recomendacao, base_historica}.
+    """
+    base = perfil.total if perfil else 0
+    if base < MINIMO_HISTORICO:
+        resposta = {
+            'alertas': [{
+                'severidade': 'info',
+                'mensagem': f'ℹ️ Apenas {base} produções anteriores deste tipo. Histórico limitado para análise.'
+            }],
+            'recomendacao': 'Continue produzindo para construir base de dados histórica.'
+        }
+        return [dict(resposta) for _ in formulacoes]
+
+    # -----------------------------------------------------------------
+    # Matriz formulações × componentes (NaN = componente não informado)
+    # -----------------------------------------------------------------
+    chaves = sorted({k for f in formulacoes for k in (f.get('componentes') or {})})
+    X = np.full((len(formulacoes), len(chaves)), np.nan)
+    indice = {k: j for j, k in enumerate(chaves)}
+    for i, f in enumerate(formulacoes):
+        for chave, valor in (f.get('componentes') or {}).items():
+            X[i, indice[chave]] = _numero(valor)
+    alturas = np.array([_numero(f.get('altura')) for f in formulacoes])
+
+    n, media, desvio, mediana, mad, nomes = _referencia(perfil, chaves)
+    conhecido = np.array([nome is not None for nome in nomes], dtype=bool)
+    agua = np.array([eh_agua(nome) for nome in nomes], dtype=bool)
+
+    # Só compara componentes informados (> 0) com histórico suficiente
+    valido = (X > 0) & (n >= MINIMO_POR_COMPONENTE) & conhecido
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = (X / media - 1) * 100
+        z = np.where(desvio > 0, (X - media) / desvio, np.nan)
+        z_robusto = np.where(mad > 0, 0.6745 * (X - mediana) / mad, np.nan)
+
+        # Severidade percentual (limites diferentes para água)
+        sev_pct = np.where(agua, _severidade(np.abs(pct), LIMITE_AGUA_PCT),
+                           _severidade(np.abs(pct), LIMITE_COMPONENTE_PCT))
+        sev_estat = np.maximum(_severidade(np.abs(z), LIMITE_Z),
+                               _severidade(np.abs(z_robusto), LIMITE_Z_ROBUSTO))
+        sev_comp = np.where(valido, np.maximum(sev_pct, sev_estat), 0)
+
+        # Altura vs média
+        pct_altura = (alturas / perfil.altura_media - 1) * 100 if perfil.altura_n else np.full(len(formulacoes), np.nan)
+        sev_altura = _severidade(np.abs(pct_altura), LIMITE_ALTURA_PCT)
+
+        # Relação água/poliol (primeiro componente de cada tipo, como no cadastro)
+        col_agua = next((j for j, nome in enumerate(nomes) if eh_agua(nome)), None)
+        col_poliol = next((j for j, nome in enumerate(nomes) if nome and not eh_agua(nome) and eh_poliol(nome)), None)
+        if col_agua is not None and col_poliol is not None and perfil.relacao_n >= MINIMO_POR_COMPONENTE:
+            a, p = X[:, col_agua], X[:, col_poliol]
+            relacao = np.where(p > 0, a / p, 0.0)
+            pct_relacao = np.where((a > 0) & (p > 0), (relacao / perfil.relacao_media - 1) * 100, np.nan)
+        else:
+            relacao = pct_relacao = np.full(len(formulacoes), np.nan)
+        alerta_relacao = np.abs(np.nan_to_num(pct_relacao, nan=0.0)) > LIMITE_RELACAO_PCT
+
+    taxa_nao_conforme = perfil.nao_conformes / perfil.total * 100 if perfil.total else 0
+
+    # -----------------------------------------------------------------
+    # Mensagens (só para as células sinalizadas)
+    # -----------------------------------------------------------------
+    resultados = []
+    for i in range(len(formulacoes)):
+        alertas = []
+
+        if sev_altura[i]:
+            alertas.append({
+                'severidade': SEVERIDADES[sev_altura[i]],
+                'mensagem': f'Altura {formulacoes[i].get("altura")}cm ({pct_altura[i]:+.1f}% vs média {perfil.altura_media:.1f}cm) → risco de variação de densidade'
+            })
+
+        for j in np.flatnonzero(sev_comp[i]):
+            nome, valor = nomes[j], X[i, j]
+            if sev_pct[i, j]:
+                if agua[j]:
+                    mensagem = f'{nome}: {valor:.2f}kg ({pct[i, j]:+.1f}% vs {media[j]:.2f}kg) → pode afetar densidade final'
+                else:
+                    mensagem = f'{nome}: {valor:.2f}kg ({pct[i, j]:+.1f}% vs histórico)'
+            else:
+                mensagem = f'{nome}: {valor:.2f}kg fora da dispersão histórica (z={np.nan_to_num(z[i, j]):+.1f}, z robusto={np.nan_to_num(z_robusto[i, j]):+.1f})'
+            alertas.append({'severidade': SEVERIDADES[sev_comp[i, j]], 'mensagem': mensagem})
+
+        if alerta_relacao[i]:
+            alertas.append({
+                'severidade': 'alerta',
+                'mensagem': f'Relação Água/Políol {relacao[i]:.3f} ({pct_relacao[i]:+.1f}% vs {perfil.relacao_media:.3f}) → pode afetar tamanho da célula'
+            })
+
+        if taxa_nao_conforme > LIMITE_NAO_CONFORME_PCT:
+            alertas.append({
+                'severidade': 'alerta',
+                'mensagem': f'⚠️ {taxa_nao_conforme:.0f}% das últimas produções deste tipo foram Não Conformes'
+            })
+
+        resultados.append({
+            'alertas': alertas,
+            'recomendacao': recomendacao_para(alertas),
+            'base_historica': base
+        })
+    return resultados
+
+
+def analisar_formulacao(perfil, altura, componentes):
+    """Uma formulação: atalho para pontuar_formulacoes com lote de tamanho 1."""
+    return pontuar_formulacoes(perfil, [{'altura': altura, 'componentes': componentes}])[0]
+
+
+__all__ = ["MAX_FORMULACOES_POR_LOTE", "pontuar_formulacoes", "analisar_formulacao", "recomendacao_para"]
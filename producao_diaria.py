@@ -0,0 +1,156 @@
+# producao_diaria.py
+# -----------------------
+# Rollup materializado (data × tipo de espuma × componente) que alimenta o
+# /dashboard. Mantido por UPSERT incremental na mesma transação do lançamento
+# e do cancelamento; o custo do dashboard passa a depender do número de dias
+# do período, não do número de blocos.
+# -----------------------
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, ProducaoDiaria, Componente
+
+LINHA_TOTAIS = 0  # componente_id da linha de totais dos blocos
+LINHAS_POR_UPSERT = 1000  # 7 parâmetros por linha: fica abaixo do limite de variáveis do SQLite
+
+
+def _linhas_da_producao(producao, itens, sinal):
+    conforme = 1 if producao.conformidade == 'Conforme' else 0
+    nao_conforme = 1 if producao.conformidade == 'Não Conforme' else 0
+    base = {
+        'data': producao.data_producao,
+        'tipo_espuma': producao.tipo_espuma,
+        'quantidade_producoes': sinal,
+        'conformes': sinal * conforme,
+        'nao_conformes': sinal * nao_conforme,
+    }
+    linhas = [dict(base, componente_id=LINHA_TOTAIS, quantidade_usada=0.0)]
+    for componente_id, _, quantidade in itens:
+        linhas.append(dict(base, componente_id=componente_id, quantidade_usada=sinal * (quantidade or 0)))
+    return linhas
+
+
+def registrar_producao_diaria(producao, itens, remover=False):
+    """
+    Soma (ou retira, se remover=True) uma produção do rollup com um único
+    INSERT ... ON CONFLICT DO UPDATE. `itens` = lista de
+    (componente_id, nome_componente, quantidade_usada). Não faz commit.
+    """
+    _upsert(_linhas_da_producao(producao, itens, -1 if remover else 1))
+
+
+def registrar_producoes_diarias(lancamentos):
+    """
+    Versão em lote (importação de planilha): `lancamentos` = lista de
+    (producao, itens). Soma as linhas por (data, tipo, componente) em memória e
+    grava com poucos UPSERTs. Não faz commit.
+    """
+    somadas = {}
+    for producao, itens in lancamentos:
+        for linha in _linhas_da_producao(producao, itens, 1):
+            chave = (linha['data'], linha['tipo_espuma'], linha['componente_id'])
+            atual = somadas.get(chave)
+            if atual is None:
+                somadas[chave] = linha
+            else:
+                for campo in ('quantidade_producoes', 'conformes', 'nao_conformes', 'quantidade_usada'):
+                    atual[campo] += linha[campo]
+    linhas = list(somadas.values())
+    for inicio in range(0, len(linhas), LINHAS_POR_UPSERT):
+        _upsert(linhas[inicio:inicio + LINHAS_POR_UPSERT])
+
+
+def _upsert(linhas):
+    stmt = sqlite_insert(ProducaoDiaria).values(linhas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['data', 'tipo_espuma', 'componente_id'],
+        set_={
+            'quantidade_producoes': ProducaoDiaria.quantidade_producoes + stmt.excluded.quantidade_producoes,
+            'conformes': ProducaoDiaria.conformes + stmt.excluded.conformes,
+            'nao_conformes': ProducaoDiaria.nao_conformes + stmt.excluded.nao_conformes,
+            'quantidade_usada': ProducaoDiaria.quantidade_usada + stmt.excluded.quantidade_usada,
+        }
+    )
+    db.session.execute(stmt)
+
+
+# Reconstrução completa (mesma lógica usada na migração que cria a tabela)
+SQL_RECONSTRUIR = [
+    "DELETE FROM producao_diaria",
+    """
+    INSERT INTO producao_diaria (data, tipo_espuma, componente_id, quantidade_producoes, conformes, nao_conformes, quantidade_usada)
+    SELECT data_producao, tipo_espuma, 0, COUNT(*),
+           SUM(CASE WHEN conformidade = 'Conforme' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN conformidade = 'Não Conforme' THEN 1 ELSE 0 END),
+           0
+    FROM producao
+    WHERE status != 'C'
+    GROUP BY data_producao, tipo_espuma
+    """,
+    """
+    INSERT INTO producao_diaria (data, tipo_espuma, componente_id, quantidade_producoes, conformes, nao_conformes, quantidade_usada)
+    SELECT p.data_producao, p.tipo_espuma, cp.componente_id, COUNT(*),
+           SUM(CASE WHEN p.conformidade = 'Conforme' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN p.conformidade = 'Não Conforme' THEN 1 ELSE 0 END),
+           SUM(cp.quantidade_usada)
+    FROM componenteproducao cp
+    JOIN producao p ON p.id = cp.producao_id
+    WHERE p.status != 'C'
+    GROUP BY p.data_producao, p.tipo_espuma, cp.componente_id
+    """,
+]
+
+
+def recalcular_producao_diaria():
+    """Reconstrói o rollup inteiro a partir de producao/componenteproducao. Faz commit."""
+    for sql in SQL_RECONSTRUIR:
+        db.session.execute(text(sql))
+    db.session.commit()
+    return db.session.query(func.count(ProducaoDiaria.id)).scalar()
+
+
+def resumo_dashboard(data_inicio=None, data_fim=None):
+    """
+    Indicadores e séries do /dashboard lidos só do rollup (2 consultas).
+    Retorna o dict de variáveis do template dashboard.html.
+    """
+    def periodo(query):
+        if data_inicio:
+            query = query.filter(ProducaoDiaria.data >= data_inicio)
+        if data_fim:
+            query = query.filter(ProducaoDiaria.data <= data_fim)
+        return query
+
+    # Totais dos blocos por dia e tipo
+    blocos = periodo(
+        db.session.query(ProducaoDiaria.data, ProducaoDiaria.tipo_espuma, ProducaoDiaria.quantidade_producoes)
+        .filter(ProducaoDiaria.componente_id == LINHA_TOTAIS, ProducaoDiaria.quantidade_producoes > 0)
+    ).order_by(ProducaoDiaria.data).all()
+
+    por_dia, por_tipo = {}, {}
+    for data, tipo, quantidade in blocos:
+        por_dia[data] = por_dia.get(data, 0) + quantidade
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + quantidade
+
+    # Consumo por componente (nome via join, sem uma consulta por componente)
+    componentes = periodo(
+        db.session.query(Componente.nome, func.sum(ProducaoDiaria.quantidade_usada))
+        .join(Componente, Componente.id == ProducaoDiaria.componente_id)
+        .filter(ProducaoDiaria.componente_id != LINHA_TOTAIS, ProducaoDiaria.quantidade_producoes > 0)
+    ).group_by(ProducaoDiaria.componente_id, Componente.nome).all()
+
+    tipos = sorted(por_tipo)
+    return {
+        'datas': [d.strftime("%d/%m/%Y") for d in por_dia],
+        'totais_dia': list(por_dia.values()),
+        'tipos': tipos,
+        'totais_tipo': [por_tipo[t] for t in tipos],
+        'nomes_componentes': [c[0] for c in componentes],
+        'totais_componentes': [c[1] for c in componentes],
+        'total_producoes': sum(por_dia.values()),
+        'tipos_distintos': len(por_tipo),
+        'total_componentes': sum(c[1] or 0 for c in componentes),
+    }
+
+
+__all__ = ["registrar_producao_diaria", "registrar_producoes_diarias", "recalcular_producao_diaria", "resumo_dashboard"]
@@ -0,0 +1,85 @@
+# producao_lista.py
+# -----------------------
+# Listagem de produções com filtros no servidor e paginação por cursor
+# (keyset em Producao.id): cada página custa o mesmo, não importa o
+# tamanho do histórico.
+# -----------------------
+from datetime import datetime
+from flask import url_for
+from sqlalchemy.orm import joinedload
+from models import Producao
+
+TAMANHO_PAGINA = 50
+TAMANHO_PAGINA_MAXIMO = 200
+
+
+def _data_ou_none(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date() if valor else None
+    except ValueError:
+        return None
+
+
+def filtros_da_requisicao(args):
+    """Extrai os filtros da listagem de request.args (valores vazios são ignorados)."""
+    return {
+        "data_inicio": _data_ou_none(args.get("data_inicio")),
+        "data_fim": _data_ou_none(args.get("data_fim")),
+        "tipo_espuma": (args.get("tipo_espuma") or "").strip() or None,
+        "conformidade": (args.get("conformidade") or "").strip() or None,
+        "bloco": (args.get("bloco") or "").strip() or None,
+    }
+
+
+def consulta_producoes(filtros):
+    """Query de produções não canceladas com os filtros aplicados (sem ordem/limite)."""
+    query = Producao.query.options(joinedload(Producao.usuario)).filter(Producao.status != "C")
+    if filtros.get("data_inicio"):
+        query = query.filter(Producao.data_producao >= filtros["data_inicio"])
+    if filtros.get("data_fim"):
+        query = query.filter(Producao.data_producao <= filtros["data_fim"])
+    if filtros.get("tipo_espuma"):
+        query = query.filter(Producao.tipo_espuma == filtros["tipo_espuma"])
+    if filtros.get("conformidade"):
+        query = query.filter(Producao.conformidade == filtros["conformidade"])
+    if filtros.get("bloco"):
+        query = query.filter(Producao.producao_id.contains(filtros["bloco"]))
+    return query
+
+
+def buscar_pagina_producoes(filtros, cursor=None, limite=TAMANHO_PAGINA):
+    """
+    Retorna (producoes, proximo_cursor). O cursor é o último Producao.id visto;
+    a próxima página busca ids menores (ordem decrescente). proximo_cursor é
+    None quando não há mais páginas.
+    """
+    limite = max(1, min(int(limite), TAMANHO_PAGINA_MAXIMO))
+    query = consulta_producoes(filtros)
+    if cursor:
+        query = query.filter(Producao.id < cursor)
+
+    # Busca um registro a mais só para saber se existe próxima página
+    producoes = query.order_by(Producao.id.desc()).limit(limite + 1).all()
+    if len(producoes) > limite:
+        producoes = producoes[:limite]
+        return producoes, producoes[-1].id
+    return producoes, None
+
+
+def producao_para_dict(producao):
+    """Linha da tabela 'Produções Cadastradas' em JSON."""
+    return {
+        "id": producao.id,
+        "producao_id": producao.producao_id,
+        "data_producao": producao.data_producao.strftime("%d/%m/%Y"),
+        "tipo_espuma": producao.tipo_espuma,
+        "cor": producao.cor,
+        "altura": producao.altura,
+        "conformidade": producao.conformidade,
+        "observacoes": producao.observacoes,
+        "usuario": producao.usuario.nome if producao.usuario else None,
+        "url_componentes": url_for("ver_componentes_producao", producao_id=producao.id),
+    }
+
+
+__all__ = ["TAMANHO_PAGINA", "filtros_da_requisicao", "consulta_producoes", "buscar_pagina_producoes", "producao_para_dict"]
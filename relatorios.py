@@ -0,0 +1,370 @@
+# relatorios.py
+# -----------------------
+# Relatórios da página /relatorios executados em segundo plano:
+#   - cada relatório é uma função (parâmetros → colunas + linhas) registrada
+#     em RELATORIOS; produção, consumo e não conformidade leem o rollup
+#     producao_diaria, o giro de estoque agrega as movimentações em 1 consulta
+#   - pedir um relatório devolve na hora o id da execução; o cálculo roda na
+#     fila de tarefas (ou num ThreadPoolExecutor, sem ela) e o resultado fica
+#     gravado em relatorio_execucao
+#   - mesmos parâmetros + mesma versão dos dados (versao_dados.py) dentro
+#     do TTL: devolve a execução já pronta (ou a que ainda está rodando)
+# -----------------------
+import csv
+import hashlib
+import io
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, case, delete, func
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX opcional: sem openpyxl só CSV/JSON
+    Workbook = None
+
+from models import db, Componente, Estoque, Movimentacao, ProducaoDiaria, RelatorioExecucao
+
+WORKERS_PADRAO = 2
+TTL_PADRAO = 600  # segundos que um resultado pronto é reaproveitado
+TEMPO_MAXIMO_EXECUCAO = 900  # pendente/executando há mais que isso = perdido (worker reiniciado)
+PERIODO_GIRO_PADRAO = 30  # dias, quando o giro de estoque é pedido sem data inicial
+LINHA_TOTAIS = 0  # componente_id da linha de totais no rollup
+
+PENDENTE, EXECUTANDO, CONCLUIDO, ERRO = "pendente", "executando", "concluido", "erro"
+
+
+class ErroRelatorio(Exception):
+    """Relatório ou parâmetros inválidos (mensagem pronta para o usuário)."""
+
+
+# -----------------------
+# Parâmetros
+# -----------------------
+def _data(valor, nome):
+    if not valor:
+        return None
+    if isinstance(valor, date):
+        return valor
+    try:
+        return datetime.strptime(str(valor).strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise ErroRelatorio(f"{nome} deve estar no formato AAAA-MM-DD")
+
+
+def normalizar_parametros(tipo, dados):
+    """Parâmetros aceitos pelo relatório, validados e em forma canônica (JSON)."""
+    if tipo not in RELATORIOS:
+        raise ErroRelatorio(f"Relatório desconhecido: {tipo}")
+    data_inicio = _data(dados.get("data_inicio"), "data_inicio")
+    data_fim = _data(dados.get("data_fim"), "data_fim")
+    if data_inicio and data_fim and data_inicio > data_fim:
+        raise ErroRelatorio("data_inicio posterior a data_fim")
+
+    parametros = {
+        "data_inicio": data_inicio.isoformat() if data_inicio else None,
+        "data_fim": data_fim.isoformat() if data_fim else None,
+    }
+    if "tipo_espuma" in RELATORIOS[tipo]["parametros"]:
+        parametros["tipo_espuma"] = (str(dados.get("tipo_espuma") or "")).strip() or None
+    if "agrupamento" in RELATORIOS[tipo]["parametros"]:
+        agrupamento = dados.get("agrupamento") or "dia"
+        if agrupamento not in AGRUPAMENTOS:
+            raise ErroRelatorio(f"agrupamento deve ser um de: {', '.join(AGRUPAMENTOS)}")
+        parametros["agrupamento"] = agrupamento
+    return parametros
+
+
+def chave_relatorio(tipo, parametros):
+    texto = json.dumps([tipo, parametros], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+# -----------------------
+# Definições
+# -----------------------
+AGRUPAMENTOS = {"dia": "%Y-%m-%d", "mes": "%Y-%m"}
+
+
+def _periodo(query, coluna, parametros):
+    if parametros.get("data_inicio"):
+        query = query.filter(coluna >= _data(parametros["data_inicio"], "data_inicio"))
+    if parametros.get("data_fim"):
+        query = query.filter(coluna <= _data(parametros["data_fim"], "data_fim"))
+    return query
+
+
+def _rollup(parametros, *colunas):
+    query = _periodo(db.session.query(*colunas), ProducaoDiaria.data, parametros)
+    if parametros.get("tipo_espuma"):
+        query = query.filter(ProducaoDiaria.tipo_espuma == parametros["tipo_espuma"])
+    return query.filter(ProducaoDiaria.quantidade_producoes > 0)
+
+
+def _taxa(parte, total):
+    return round(parte / total * 100, 2) if total else None
+
+
+def producao_periodo(parametros):
+    periodo = func.strftime(AGRUPAMENTOS[parametros["agrupamento"]], ProducaoDiaria.data)
+    linhas = (
+        _rollup(parametros, periodo, ProducaoDiaria.tipo_espuma, func.sum(ProducaoDiaria.quantidade_producoes),
+                func.sum(ProducaoDiaria.conformes), func.sum(ProducaoDiaria.nao_conformes))
+        .filter(ProducaoDiaria.componente_id == LINHA_TOTAIS)
+        .group_by(periodo, ProducaoDiaria.tipo_espuma)
+        .order_by(periodo, ProducaoDiaria.tipo_espuma)
+        .all()
+    )
+    return {
+        "colunas": ["Período", "Tipo", "Blocos", "Conformes", "Não conformes"],
+        "linhas": [list(linha) for linha in linhas],
+        "totais": {"blocos": sum(linha[2] for linha in linhas),
+                   "nao_conformes": sum(linha[4] for linha in linhas)},
+    }
+
+
+def consumo_por_tipo(parametros):
+    linhas = (
+        _rollup(parametros, ProducaoDiaria.tipo_espuma, Componente.nome,
+                func.sum(ProducaoDiaria.quantidade_producoes), func.sum(ProducaoDiaria.quantidade_usada))
+        .join(Componente, Componente.id == ProducaoDiaria.componente_id)
+        .filter(ProducaoDiaria.componente_id != LINHA_TOTAIS)
+        .group_by(ProducaoDiaria.tipo_espuma, ProducaoDiaria.componente_id, Componente.nome)
+        .order_by(ProducaoDiaria.tipo_espuma, Componente.nome)
+        .all()
+    )
+    return {
+        "colunas": ["Tipo", "Componente", "Blocos", "Consumo (kg)", "Consumo médio por bloco (kg)"],
+        "linhas": [[tipo, nome, blocos, round(consumo, 3), round(consumo / blocos, 3) if blocos else None]
+                   for tipo, nome, blocos, consumo in linhas],
+        "totais": {"consumo_kg": round(sum(linha[3] for linha in linhas), 3)},
+    }
+
+
+def giro_estoque(parametros):
+    """
+    Giro = saídas do período / estoque médio ((saldo inicial + final) / 2).
+    Os saldos nas datas do período são reconstruídos a partir do saldo atual
+    descontando as movimentações posteriores, em uma única varredura.
+    """
+    data_fim = _data(parametros.get("data_fim"), "data_fim") or date.today()
+    data_inicio = (_data(parametros.get("data_inicio"), "data_inicio")
+                   or data_fim - timedelta(days=PERIODO_GIRO_PADRAO - 1))
+    dias = (data_fim - data_inicio).days + 1
+
+    no_periodo = Movimentacao.data <= data_fim
+    delta = case((Movimentacao.tipo == "entrada", Movimentacao.quantidade), else_=-Movimentacao.quantidade)
+    movimentos = dict(
+        (componente_id, (entradas or 0, saidas or 0, posterior or 0))
+        for componente_id, entradas, saidas, posterior in
+        db.session.query(
+            Movimentacao.componente_id,
+            func.sum(case((and_(no_periodo, Movimentacao.tipo == "entrada"), Movimentacao.quantidade))),
+            func.sum(case((and_(no_periodo, Movimentacao.tipo == "saida"), Movimentacao.quantidade))),
+            func.sum(case((Movimentacao.data > data_fim, delta))),
+        )
+        .filter(Movimentacao.data >= data_inicio)
+        .group_by(Movimentacao.componente_id)
+    )
+
+    linhas = []
+    for componente_id, nome, saldo_atual in (
+        db.session.query(Componente.id, Componente.nome, func.coalesce(func.sum(Estoque.quantidade), 0))
+        .outerjoin(Estoque, Estoque.componente_id == Componente.id)
+        .group_by(Componente.id, Componente.nome)
+        .order_by(Componente.nome)
+    ):
+        entradas, saidas, posterior = movimentos.get(componente_id, (0, 0, 0))
+        saldo_final = saldo_atual - posterior
+        saldo_inicial = saldo_final - (entradas - saidas)
+        medio = (saldo_inicial + saldo_final) / 2
+        consumo_diario = saidas / dias
+        linhas.append([
+            nome, round(saldo_inicial, 3), round(entradas, 3), round(saidas, 3), round(saldo_final, 3),
+            round(saidas / medio, 2) if medio > 0 else None,
+            round(saldo_final / consumo_diario, 1) if consumo_diario > 0 else None,
+        ])
+    return {
+        "colunas": ["Componente", "Saldo inicial (kg)", "Entradas (kg)", "Saídas (kg)", "Saldo final (kg)",
+                    "Giro", "Cobertura (dias)"],
+        "linhas": linhas,
+        "totais": {"periodo": f"{data_inicio.isoformat()} a {data_fim.isoformat()}", "dias": dias},
+    }
+
+
+def taxa_nao_conformidade(parametros):
+    linhas = (
+        _rollup(parametros, ProducaoDiaria.tipo_espuma, func.sum(ProducaoDiaria.quantidade_producoes),
+                func.sum(ProducaoDiaria.conformes), func.sum(ProducaoDiaria.nao_conformes))
+        .filter(ProducaoDiaria.componente_id == LINHA_TOTAIS)
+        .group_by(ProducaoDiaria.tipo_espuma)
+        .order_by(ProducaoDiaria.tipo_espuma)
+        .all()
+    )
+    blocos = sum(linha[1] for linha in linhas)
+    nao_conformes = sum(linha[3] for linha in linhas)
+    return {
+        "colunas": ["Tipo", "Blocos", "Conformes", "Não conformes", "Taxa de não conformidade (%)"],
+        "linhas": [[tipo, total, conformes, nc, _taxa(nc, total)] for tipo, total, conformes, nc in linhas],
+        "totais": {"blocos": blocos, "nao_conformes": nao_conformes, "taxa": _taxa(nao_conformes, blocos)},
+    }
+
+
+# nome: título, função e parâmetros aceitos (além do período)
+RELATORIOS = {
+    "producao_periodo": {"titulo": "Produção por período", "funcao": producao_periodo,
+                         "parametros": ["tipo_espuma", "agrupamento"]},
+    "consumo_tipo": {"titulo": "Consumo por tipo de espuma", "funcao": consumo_por_tipo,
+                     "parametros": ["tipo_espuma"]},
+    "giro_estoque": {"titulo": "Giro de estoque", "funcao": giro_estoque, "parametros": []},
+    "nao_conformidade": {"titulo": "Taxa de não conformidade", "funcao": taxa_nao_conformidade,
+                         "parametros": ["tipo_espuma"]},
+}
+
+
+# -----------------------
+# Execução em segundo plano
+# -----------------------
+class MotorRelatorios:
+    """
+    Fila de relatórios: solicitar() grava a execução e a entrega à fila de
+    tarefas ou ao pool de threads; o resultado é lido do banco por qualquer worker.
+    `versao_dados` = função que devolve a versão atual dos dados.
+    """
+
+    def __init__(self, app, workers=WORKERS_PADRAO, ttl=TTL_PADRAO, versao_dados=lambda: 0, enfileirar=None):
+        self.app = app
+        self.ttl = ttl
+        self.versao_dados = versao_dados
+        # enfileirar(execucao_id) entrega a execução à fila de tarefas (durável);
+        # sem ela, um pool de threads próprio do processo
+        self._enfileirar = enfileirar
+        self._pool = None if enfileirar else ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relatorio")
+
+    def solicitar(self, tipo, dados, usuario_id=None):
+        """
+        (execucao, nova). Reaproveita a execução com a mesma chave e versão dos
+        dados: concluída dentro do TTL, ou ainda em andamento. Faz commit.
+        """
+        parametros = normalizar_parametros(tipo, dados)
+        chave = chave_relatorio(tipo, parametros)
+        versao = self.versao_dados()
+        agora = datetime.now()
+
+        existente = (
+            RelatorioExecucao.query
+            .filter(RelatorioExecucao.chave == chave, RelatorioExecucao.versao_dados == versao)
+            .filter(
+                ((RelatorioExecucao.status == CONCLUIDO)
+                 & (RelatorioExecucao.concluido_em >= agora - timedelta(seconds=self.ttl)))
+                | (RelatorioExecucao.status.in_([PENDENTE, EXECUTANDO])
+                   & (RelatorioExecucao.criado_em >= agora - timedelta(seconds=TEMPO_MAXIMO_EXECUCAO)))
+            )
+            .order_by(RelatorioExecucao.criado_em.desc())
+            .first()
+        )
+        if existente:
+            return existente, False
+
+        execucao = RelatorioExecucao(id=uuid.uuid4().hex, tipo=tipo, parametros=json.dumps(parametros),
+                                     chave=chave, versao_dados=versao, status=PENDENTE,
+                                     usuario_id=usuario_id, criado_em=agora)
+        db.session.add(execucao)
+        db.session.commit()
+        if self._enfileirar:
+            self._enfileirar(execucao.id)
+        else:
+            self._pool.submit(self.executar, execucao.id)
+        return execucao, True
+
+    def executar(self, execucao_id):
+        """Calcula o relatório e grava o resultado (ou o erro) na execução."""
+        with self.app.app_context():
+            try:
+                execucao = db.session.get(RelatorioExecucao, execucao_id)
+                execucao.status, execucao.iniciado_em = EXECUTANDO, datetime.now()
+                db.session.commit()
+                try:
+                    resultado = RELATORIOS[execucao.tipo]["funcao"](json.loads(execucao.parametros))
+                except Exception as e:  # noqa: BLE001  (erro do relatório fica registrado na execução)
+                    db.session.rollback()
+                    execucao.status, execucao.erro = ERRO, str(e) or e.__class__.__name__
+                else:
+                    execucao.status = CONCLUIDO
+                    execucao.resultado = json.dumps(resultado, default=str)
+                    execucao.linhas = len(resultado["linhas"])
+                execucao.concluido_em = datetime.now()
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    def encerrar(self, esperar=True):
+        if self._pool:
+            self._pool.shutdown(wait=esperar)
+
+
+def limpar_execucoes(dias=7):
+    """Apaga execuções criadas há mais de `dias` dias. Faz commit."""
+    limite = datetime.now() - timedelta(days=dias)
+    apagadas = db.session.execute(delete(RelatorioExecucao).where(RelatorioExecucao.criado_em < limite)).rowcount
+    db.session.commit()
+    return apagadas
+
+
+# -----------------------
+# Saída
+# -----------------------
+def execucao_para_dict(execucao, incluir_resultado=False):
+    dados = {
+        "id": execucao.id,
+        "tipo": execucao.tipo,
+        "titulo": RELATORIOS.get(execucao.tipo, {}).get("titulo", execucao.tipo),
+        "parametros": json.loads(execucao.parametros),
+        "status": execucao.status,
+        "linhas": execucao.linhas,
+        "erro": execucao.erro,
+        "criado_em": execucao.criado_em.isoformat(timespec="seconds"),
+        "concluido_em": execucao.concluido_em.isoformat(timespec="seconds") if execucao.concluido_em else None,
+    }
+    if incluir_resultado and execucao.status == CONCLUIDO:
+        dados["resultado"] = json.loads(execucao.resultado)
+    return dados
+
+
+FORMATOS = {"csv": "text/csv; charset=utf-8",
+            "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "json": "application/json"}
+
+
+def arquivo_relatorio(execucao, formato):
+    """(bytes, mimetype, nome_arquivo) de uma execução concluída."""
+    if formato == "xlsx" and Workbook is None:
+        raise ErroRelatorio("Download XLSX indisponível (instale openpyxl) — use CSV.")
+    resultado = json.loads(execucao.resultado)
+    nome = f"{execucao.tipo}_{execucao.concluido_em:%Y%m%d_%H%M}.{formato}"
+
+    if formato == "json":
+        return execucao.resultado.encode(), FORMATOS[formato], nome
+    if formato == "xlsx":
+        livro = Workbook(write_only=True)
+        planilha = livro.create_sheet(title=RELATORIOS[execucao.tipo]["titulo"][:31])
+        planilha.append(resultado["colunas"])
+        for linha in resultado["linhas"]:
+            planilha.append(linha)
+        buffer = io.BytesIO()
+        livro.save(buffer)
+        return buffer.getvalue(), FORMATOS[formato], nome
+
+    buffer = io.StringIO()
+    buffer.write("\ufeff")
+    escritor = csv.writer(buffer, delimiter=";")
+    escritor.writerow(resultado["colunas"])
+    escritor.writerows(["" if v is None else v for v in linha] for linha in resultado["linhas"])
+    return buffer.getvalue().encode("utf-8"), FORMATOS[formato], nome
+
+
+__all__ = ["RELATORIOS", "FORMATOS", "WORKERS_PADRAO", "TTL_PADRAO", "PENDENTE", "EXECUTANDO", "CONCLUIDO", "ERRO", "ErroRelatorio",
+           "MotorRelatorios", "normalizar_parametros", "chave_relatorio", "limpar_execucoes",
+           "execucao_para_dict", "arquivo_relatorio"]
@@ -0,0 +1,263 @@
+# replay_trafego.py
+# ----------------------------------------------------------------
+# Replay de tráfego capturado (captura_trafego.py, CAPTURA_TRAFEGO=1) contra
+# uma instância LOCAL do app, para dimensionar workers com o padrão real de
+# uso (rajadas de cadastro na troca de turno, ia-analise a cada digitação):
+#   - respeita os intervalos da captura, acelerados por --velocidade
+#     (1 = tempo real, 5 = 5x, 20 = 20x)
+#   - --concorrencia conexões simultâneas; sem conexão livre a requisição
+#     espera, e a espera entra no relatório ("atraso" = fila do cliente)
+#   - cada conexão faz login com --email/--senha (a captura não guarda
+#     credenciais); /login e /logout capturados não são repetidos
+#   - números de bloco (producao_id) ganham um sufixo da execução, para o
+#     cadastro gravar de verdade em vez de cair na checagem de duplicidade
+#   - uploads não são repetidos (a captura guarda só o tamanho)
+# Relatório: p50/p95/p99 e taxa de erro por endpoint e no total, vazão e
+# atraso máximo; --saida grava o relatório em JSON. Exit 1 se a taxa de
+# erro passar de --max-erros.
+#
+# Uso:  python replay_trafego.py instance/captura_trafego.jsonl --url http://127.0.0.1:5000 \
+#           --velocidade 5 --concorrencia 8 --email operador@bonsono.com.br --senha ...
+# ----------------------------------------------------------------
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+import numpy as np
+
+from captura_trafego import CABECALHO_REPLAY, MASCARA, ler_captura
+
+ENDPOINTS_NAO_REPETIDOS = ("login", "logout")
+TIMEOUT_PADRAO = 30.0
+
+
+class _SemRedirecionar(HTTPRedirectHandler):
+    """Mede só a requisição capturada: o navegador já capturou o GET seguinte."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Cliente:
+    """Uma conexão do replay (cookies próprios, login feito na criação)."""
+
+    def __init__(self, url, email=None, senha=None, timeout=TIMEOUT_PADRAO):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), _SemRedirecionar())
+        if email:
+            status, _ = self.enviar("POST", "/login", form={"email": email, "senha": senha or ""})
+            if status != 302:
+                raise RuntimeError(f"login falhou (HTTP {status})")
+
+    def enviar(self, metodo, caminho, args=None, form=None, json_=None):
+        """(status, bytes lidos); status 0 = falha de conexão/timeout."""
+        url = self.url + caminho + (f"?{urlencode(args, doseq=True)}" if args else "")
+        corpo, cabecalhos = None, {CABECALHO_REPLAY: "1"}  # não entra de novo na captura
+        if json_ is not None:
+            corpo = json.dumps(json_).encode()
+            cabecalhos["Content-Type"] = "application/json"
+        elif form is not None:
+            corpo = urlencode(form, doseq=True).encode()
+            cabecalhos["Content-Type"] = "application/x-www-form-urlencoded"
+        requisicao = Request(url, data=corpo, headers=cabecalhos, method=metodo)
+        try:
+            with self.opener.open(requisicao, timeout=self.timeout) as resposta:
+                return resposta.status, len(resposta.read())
+        except HTTPError as e:  # 3xx (sem redirecionar), 4xx e 5xx
+            return e.code, len(e.read() or b"")
+        except (URLError, OSError):
+            return 0, 0
+
+
+# -----------------------
+# Preparação dos registros
+# -----------------------
+def _tem_mascara(valor):
+    if isinstance(valor, dict):
+        return any(_tem_mascara(v) for v in valor.values())
+    if isinstance(valor, list):
+        return any(_tem_mascara(v) for v in valor)
+    return valor == MASCARA
+
+
+def _renomear_blocos(valor, sufixo):
+    """Acrescenta o sufixo aos campos producao_id (formulário ou JSON, qualquer nível)."""
+    if isinstance(valor, dict):
+        return {k: (f"{v}{sufixo}" if k == "producao_id" and isinstance(v, str) else _renomear_blocos(v, sufixo))
+                for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_renomear_blocos(v, sufixo) for v in valor]
+    return valor
+
+
+def preparar(registros, sufixo, limite=None):
+    """(repetíveis, ignorados por motivo). Mantém os instantes originais."""
+    repetiveis, ignorados = [], {}
+
+    def ignorar(motivo):
+        ignorados[motivo] = ignorados.get(motivo, 0) + 1
+
+    for registro in registros:
+        if registro.get("endpoint") in ENDPOINTS_NAO_REPETIDOS:
+            ignorar("login/logout")
+        elif registro.get("arquivos"):
+            ignorar("upload")
+        elif _tem_mascara(registro.get("form")) or _tem_mascara(registro.get("json")):
+            ignorar("campo sensível mascarado")
+        else:
+            repetiveis.append(dict(registro, form=_renomear_blocos(registro.get("form"), sufixo),
+                                   json=_renomear_blocos(registro.get("json"), sufixo)))
+        if limite and len(repetiveis) >= limite:
+            break
+    return repetiveis, ignorados
+
+
+# -----------------------
+# Replay
+# -----------------------
+def repetir(registros, url, velocidade=1.0, concorrencia=4, email=None, senha=None, timeout=TIMEOUT_PADRAO):
+    """
+    Dispara os registros respeitando os intervalos / velocidade. Retorna a
+    lista de resultados (endpoint, status, latência s, atraso s) e a duração.
+    """
+    locais = threading.local()
+
+    def cliente():
+        if not hasattr(locais, "cliente"):
+            locais.cliente = Cliente(url, email, senha, timeout)
+        return locais.cliente
+
+    def executar(registro, previsto):
+        inicio = time.perf_counter()
+        status, _ = cliente().enviar(registro["metodo"], registro["caminho"], registro.get("args"),
+                                     registro.get("form"), registro.get("json"))
+        fim = time.perf_counter()
+        return registro.get("endpoint") or registro["caminho"], status, fim - inicio, inicio - previsto
+
+    if not registros:
+        return [], 0.0
+    t0 = registros[0]["t"]
+    futuros = []
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        inicio = time.perf_counter()
+        for registro in registros:
+            previsto = inicio + (registro["t"] - t0) / velocidade
+            espera = previsto - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            futuros.append(executor.submit(executar, registro, previsto))
+        resultados = [f.result() for f in futuros]
+    return resultados, time.perf_counter() - inicio
+
+
+def _percentis(latencias):
+    if not latencias:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(np.asarray(latencias) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2)}
+
+
+def relatorio(resultados, duracao):
+    """Percentis e taxa de erro (5xx ou falha de conexão) por endpoint e no total."""
+    def resumo(itens):
+        erros = sum(1 for _, status, _, _ in itens if status == 0 or status >= 500)
+        return dict(
+            requisicoes=len(itens),
+            erros=erros,
+            taxa_erro=round(erros / len(itens), 4) if itens else 0.0,
+            respostas_4xx=sum(1 for _, status, _, _ in itens if 400 <= status < 500),
+            **_percentis([latencia for _, _, latencia, _ in itens]),
+        )
+
+    por_endpoint = {}
+    for item in resultados:
+        por_endpoint.setdefault(item[0], []).append(item)
+    atrasos = [atraso for _, _, _, atraso in resultados]
+    return {
+        "duracao_s": round(duracao, 2),
+        "vazao_rps": round(len(resultados) / duracao, 2) if duracao else None,
+        "atraso_max_ms": round(max(atrasos) * 1000, 2) if atrasos else None,
+        "atraso_p95_ms": round(float(np.percentile(atrasos, 95)) * 1000, 2) if atrasos else None,
+        "total": resumo(resultados),
+        "endpoints": {endpoint: resumo(itens) for endpoint, itens in
+                      sorted(por_endpoint.items(), key=lambda e: len(e[1]), reverse=True)},
+    }
+
+
+def imprimir(rel, ignorados):
+    total = rel["total"]
+    print(f"\n{total['requisicoes']} requisições em {rel['duracao_s']}s ({rel['vazao_rps']} req/s); "
+          f"atraso na fila do cliente: p95 {rel['atraso_p95_ms']} ms, máx {rel['atraso_max_ms']} ms")
+    if ignorados:
+        print("Não repetidas: " + ", ".join(f"{motivo} ({n})" for motivo, n in ignorados.items()))
+    print(f"\n  {'endpoint':<34}{'n':>7}{'erros':>8}{'4xx':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, r in list(rel["endpoints"].items()) + [("TOTAL", total)]:
+        print(f"  {endpoint[:33]:<34}{r['requisicoes']:>7}{r['taxa_erro']:>8.1%}{r['respostas_4xx']:>6}"
+              f"{r['p50_ms'] or 0:>10.1f}{r['p95_ms'] or 0:>10.1f}{r['p99_ms'] or 0:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repete um tráfego capturado contra uma instância local.")
+    parser.add_argument("captura", help="arquivo da captura (CAPTURA_TRAFEGO_PATH; os de cada processo e os girados entram juntos)")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--velocidade", type=float, default=1.0, help="1 = tempo real, 5 = 5x, 20 = 20x")
+    parser.add_argument("--concorrencia", type=int, default=4, help="conexões simultâneas")
+    parser.add_argument("--email", help="login usado pelas conexões (requisições autenticadas)")
+    parser.add_argument("--senha")
+    parser.add_argument("--limite", type=int, help="repete só as N primeiras requisições")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_PADRAO)
+    parser.add_argument("--max-erros", type=float, default=0.01, help="taxa de erro máxima (padrão 1%%)")
+    parser.add_argument("--saida", help="grava o relatório em JSON")
+    parser.add_argument("--permitir-remoto", action="store_true",
+                        help="aceita --url fora de localhost (o replay grava dados!)")
+    args = parser.parse_args()
+
+    if urlsplit(args.url).hostname not in ("127.0.0.1", "localhost", "::1") and not args.permitir_remoto:
+        raise SystemExit("❌ o replay grava no banco: use uma instância local ou --permitir-remoto")
+    if args.velocidade <= 0 or args.concorrencia < 1:
+        raise SystemExit("❌ --velocidade deve ser > 0 e --concorrencia >= 1")
+
+    sufixo = f"-R{uuid.uuid4().hex[:6]}"
+    registros, ignorados = preparar(ler_captura(args.captura), sufixo, args.limite)
+    if not registros:
+        raise SystemExit("❌ nenhuma requisição repetível na captura")
+    if any(r.get("autenticado") for r in registros) and not args.email:
+        print("⚠️  a captura tem requisições autenticadas e não foi passado --email: vão responder 302 (login)")
+
+    # Falha cedo: servidor fora do ar ou senha errada
+    try:
+        verificacao = Cliente(args.url, args.email, args.senha, args.timeout)
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {args.url}: {e}")
+    if verificacao.enviar("GET", "/login")[0] == 0:
+        raise SystemExit(f"❌ {args.url}: servidor não respondeu")
+
+    janela = registros[-1]["t"] - registros[0]["t"]
+    print(f"Repetindo {len(registros)} requisições ({janela:.0f}s capturados) a {args.velocidade:g}x "
+          f"com {args.concorrencia} conexões em {args.url} (blocos com sufixo {sufixo})")
+    resultados, duracao = repetir(registros, args.url, args.velocidade, args.concorrencia,
+                                  args.email, args.senha, args.timeout)
+    rel = relatorio(resultados, duracao)
+    rel.update(velocidade=args.velocidade, concorrencia=args.concorrencia, ignoradas=ignorados)
+    imprimir(rel, ignorados)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(rel, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Relatório gravado em {args.saida}")
+    if rel["total"]["taxa_erro"] > args.max_erros:
+        print(f"\n❌ Taxa de erro {rel['total']['taxa_erro']:.1%} acima de {args.max_erros:.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
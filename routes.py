@@ -1,11 +1,40 @@
-from flask import render_template, request, redirect, flash, url_for
+import math
+import os
+import time
+
+import click
+from collections import defaultdict
+from flask import render_template, request, redirect, flash, url_for, stream_with_context
 from models import *
 from datetime import date, datetime
-from sqlalchemy import func, case,distinct
+from sqlalchemy import func, case,distinct, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from flask import jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import Componente, Estoque, Movimentacao, Producao, ComponenteProducao
+from estoque_ledger import (registrar_movimentacao, registrar_movimentacoes, saldos_atuais, reconciliar_saldos,
+                            lancar_recebimento, estornar_recebimento, baixar_estoque, repetir_se_ocupado)
+from perfil_formulacao import atualizar_perfil, atualizar_estatisticas_robustas, recalcular_perfis
+from pontuacao_formulacao import MAX_FORMULACOES_POR_LOTE, analisar_formulacao, pontuar_formulacoes
+from producao_diaria import registrar_producao_diaria, recalcular_producao_diaria, resumo_dashboard
+from producao_lista import TAMANHO_PAGINA, filtros_da_requisicao, buscar_pagina_producoes, producao_para_dict
+from cache_respostas import CacheRespostas, MAX_ENTRADAS_PADRAO
+from snapshot_parquet import exportar_snapshot
+from importacao_producao import ErroImportacao, MAX_LINHAS, importar_producoes, modelo_csv
+from laudo_tecnico import ErroLaudo, calcular_densidades, registrar_laudos, deriva_densidade, laudos_do_bloco
+from analise_dmaic import ErroPlanilhaDmaic, analisar_planilha
+from analise_defeitos import (DEFEITOS_EXCLUIDOS_PADRAO, ErroPlanilhaGarantia, importar_planilha_garantia,
+                              remover_planilha, recalcular_frequencias, resumo_garantia, opcoes_previsao,
+                              prever_defeitos)
+from relatorios import (RELATORIOS, FORMATOS as FORMATOS_RELATORIO, WORKERS_PADRAO as WORKERS_PADRAO_RELATORIOS,
+                        TTL_PADRAO, CONCLUIDO,
+                        ErroRelatorio, MotorRelatorios, limpar_execucoes, execucao_para_dict, arquivo_relatorio)
+from metricas import formato_prometheus, resumo_json
+from versao_dados import instalar_versao_dados, versao_atual
+from fila_tarefas import FilaTarefas, WORKERS_PADRAO as WORKERS_PADRAO_TAREFAS, tarefa_para_dict
+from exportacao import CONJUNTOS as CONJUNTOS_EXPORTACAO, FORMATOS as FORMATOS_EXPORTACAO, filtros_exportacao, exportar
 
 
 def routes(app):
@@ -38,32 +67,159 @@ def routes(app):
         inicializar_componentes()
 
     # -----------------------
-    # Função auxiliar: recalcular saldos
+    # Versão dos dados (tabela versao_dados), incrementada no mesmo commit de
+    # toda alteração. Cache do dashboard por período (arquivo compartilhado
+    # entre workers): as entradas valem só na versão atual; invalidar() depois
+    # do commit apenas limpa as antigas.
     # -----------------------
-    def atualizar_saldos():
-        saldos_query = (
-            db.session.query(
-                Movimentacao.componente_id,
-                func.sum(
-                    case(
-                        (Movimentacao.tipo == 'entrada', Movimentacao.quantidade),
-                        (Movimentacao.tipo == 'saida', -Movimentacao.quantidade),
-                        else_=0
-                    )
-                ).label('saldo')
-            )
-            .group_by(Movimentacao.componente_id)
-            .all()
-        )
+    instalar_versao_dados()
+    cache_dashboard = CacheRespostas(
+        app.config.get('DASHBOARD_CACHE_PATH'),
+        app.config.get('DASHBOARD_CACHE_MAX', MAX_ENTRADAS_PADRAO),
+        versao_dados=versao_atual
+    )
+    # Análises DMAIC por hash da planilha: o conteúdo não muda, a versão fica sempre 0
+    cache_dmaic = CacheRespostas(app.config.get('DMAIC_CACHE_PATH'), app.config.get('DMAIC_CACHE_MAX', 16))
 
-        for componente_id, saldo in saldos_query:
-            estoque = Estoque.query.filter_by(componente_id=componente_id).first()
-            if estoque:
-                estoque.quantidade = saldo
-            else:
-                db.session.add(Estoque(componente_id=componente_id, quantidade=saldo))
+    # -----------------------
+    # Fila de tarefas em segundo plano (tabela `tarefa`). Os workers sobem com a
+    # 1ª requisição; TAREFAS_WORKERS=0 deixa a execução para `flask executar-tarefas`.
+    # -----------------------
+    fila_tarefas = FilaTarefas(
+        app,
+        workers=app.config.get('TAREFAS_WORKERS', 0),
+        agenda=app.config.get('TAREFAS_AGENDA', {})
+    )
+
+    # Relatórios em segundo plano; um resultado vale enquanto a versão dos dados
+    # (tabela versao_dados, incrementada no mesmo commit das alterações) não
+    # mudar e dentro do TTL. Com workers da fila no processo, as execuções vão
+    # para a fila (duráveis); senão, pool próprio.
+    motor_relatorios = MotorRelatorios(
+        app,
+        workers=app.config.get('RELATORIOS_WORKERS', WORKERS_PADRAO_RELATORIOS),
+        ttl=app.config.get('RELATORIOS_TTL', TTL_PADRAO),
+        versao_dados=versao_atual,
+        enfileirar=(lambda execucao_id: fila_tarefas.enfileirar("gerar-relatorio", {"execucao_id": execucao_id}))
+        if app.config.get('TAREFAS_WORKERS') else None
+    )
+
+    def destino_snapshot():
+        return app.config.get('SNAPSHOT_DIR') or os.path.join(os.path.dirname(db.engine.url.database), "snapshots")
+
+    @fila_tarefas.tarefa("reconciliar-estoque")
+    def reconciliar_estoque_tarefa(progresso):
+        progresso(0, "Reconstruindo saldos a partir das movimentações")
+        divergencias = reconciliar_saldos()
+        cache_dashboard.invalidar()
+        return {"divergencias": len(divergencias)}
+
+    @fila_tarefas.tarefa("recalcular-producao-diaria")
+    def recalcular_producao_diaria_tarefa(progresso):
+        progresso(0, "Reconstruindo o rollup diário")
+        total = recalcular_producao_diaria()
+        cache_dashboard.invalidar()
+        return {"linhas": total}
+
+    @fila_tarefas.tarefa("recalcular-perfis")
+    def recalcular_perfis_tarefa(progresso):
+        progresso(0, "Varrendo o histórico de produções")
+        return {"perfis": recalcular_perfis()}
+
+    @fila_tarefas.tarefa("exportar-snapshot")
+    def exportar_snapshot_tarefa(progresso, completo=False):
+        progresso(0, "Exportando snapshot Parquet")
+        resumo = exportar_snapshot(db.engine.url.database, destino_snapshot(), completo=completo)
+        return {"tipo": resumo["tipo"], "linhas_novas": resumo["linhas_novas"],
+                "meses_reescritos": len(resumo["meses_reescritos"])}
+
+    @fila_tarefas.tarefa("limpar-historico")
+    def limpar_historico_tarefa(progresso, dias_relatorios=7, dias_tarefas=30):
+        return {"relatorios": limpar_execucoes(dias_relatorios), "tarefas": fila_tarefas.limpar(dias_tarefas)}
+
+    # O relatório registra o próprio erro na execução: sem novas tentativas
+    @fila_tarefas.tarefa("gerar-relatorio", max_tentativas=1)
+    def gerar_relatorio_tarefa(progresso, execucao_id):
+        motor_relatorios.executar(execucao_id)
+
+    if app.config.get('TAREFAS_WORKERS'):
+        @app.before_request
+        def iniciar_fila_tarefas():
+            # Na 1ª requisição de cada processo: scripts e comandos flask que
+            # importam o app não sobem workers, e com gunicorn --preload cada
+            # worker (após o fork) sobe os seus
+            if not fila_tarefas.ativa:
+                fila_tarefas.iniciar()
 
+    # -----------------------
+    # Reconciliação de saldos (reconstrução completa a partir das movimentações)
+    # -----------------------
+    @app.cli.command("reconciliar-estoque")
+    def reconciliar_estoque_cli():
+        divergencias = reconciliar_saldos()
+        cache_dashboard.invalidar()
+        print(f"✅ Saldos reconciliados ({len(divergencias)} divergência(s) corrigida(s)).")
+
+    @app.cli.command("recalcular-producao-diaria")
+    def recalcular_producao_diaria_cli():
+        total = recalcular_producao_diaria()
+        cache_dashboard.invalidar()
+        print(f"✅ Rollup diário reconstruído ({total} linha(s)).")
+
+    @app.cli.command("recalcular-frequencias-defeitos")
+    def recalcular_frequencias_defeitos_cli():
+        total = recalcular_frequencias()
+        print(f"✅ Frequências de defeitos reconstruídas ({total} linha(s)).")
+
+    @app.cli.command("calcular-densidades")
+    @click.option("--todos", is_flag=True, help="Recalcula todos os laudos, não só os pendentes.")
+    def calcular_densidades_cli(todos):
+        calculados = calcular_densidades(todos=todos)
         db.session.commit()
+        print(f"✅ Densidade calculada em {len(calculados)} laudo(s).")
+
+    @app.cli.command("exportar-snapshot")
+    @click.option("--completo", is_flag=True, help="Refaz todas as partições.")
+    def exportar_snapshot_cli(completo):
+        destino = destino_snapshot()
+        resumo = exportar_snapshot(db.engine.url.database, destino, completo=completo)
+        print(f"✅ Snapshot {resumo['tipo']}: {resumo['linhas_novas']} linha(s) nova(s), "
+              f"{len(resumo['meses_reescritos'])} mês(es) reescrito(s) em {destino}")
+
+    @app.cli.command("limpar-relatorios")
+    @click.option("--dias", default=7, show_default=True, help="Apaga execuções mais antigas que isso.")
+    def limpar_relatorios_cli(dias):
+        total = limpar_execucoes(dias)
+        print(f"✅ {total} execução(ões) de relatório apagada(s).")
+
+    @app.cli.command("recalcular-perfis")
+    def recalcular_perfis_cli():
+        total = recalcular_perfis()
+        print(f"✅ {total} perfil(is) de formulação recalculado(s).")
+
+    @app.cli.command("enfileirar-tarefa")
+    @click.argument("nome", type=click.Choice(fila_tarefas.nomes))
+    def enfileirar_tarefa_cli(nome):
+        tarefa_id = fila_tarefas.enfileirar(nome)
+        print(f"✅ Tarefa {nome} enfileirada (#{tarefa_id}).")
+
+    @app.cli.command("executar-tarefas")
+    @click.option("--workers", default=WORKERS_PADRAO_TAREFAS, show_default=True, help="Threads deste processo.")
+    @click.option("--esvaziar", is_flag=True, help="Executa o que estiver na fila e sai.")
+    def executar_tarefas_cli(workers, esvaziar):
+        # Worker em processo separado (ex.: com TAREFAS_WORKERS=0 no servidor web)
+        if esvaziar:
+            total = fila_tarefas.executar_pendentes()
+            print(f"✅ {total} tarefa(s) executada(s).")
+            return
+        fila_tarefas.workers = workers
+        fila_tarefas.iniciar()
+        print(f"🔧 {workers} worker(s) executando tarefas (Ctrl+C para parar)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            fila_tarefas.parar()
 
     # -----------------------
     # Rota inicial
@@ -119,41 +275,136 @@ def routes(app):
                 tipo = request.form.get("tipo")
                 observacao = request.form.get("observacao", "").strip()
 
-                if quantidade <= 0 or tipo not in ["entrada", "saida"]:
+                if not math.isfinite(quantidade) or quantidade <= 0 or tipo not in ["entrada", "saida"]:
                     flash("Informe uma quantidade válida e um tipo de ajuste!", "danger")
                     return redirect(url_for("ajustar_estoque", componente_id=componente.id))
+            except ValueError:
+                flash("Quantidade inválida!", "danger")
+                return redirect(url_for("ajustar_estoque", componente_id=componente.id))
 
-                if not estoque:
-                    estoque = Estoque(componente_id=componente.id, quantidade=0)
-                    db.session.add(estoque)
-                    db.session.flush()
-
-                if tipo == "entrada":
-                    estoque.quantidade += quantidade
+            def lancar():
+                """Uma tentativa do ajuste; retorna False se faltar saldo para a saída."""
+                if tipo == "saida":
+                    # Baixa condicional (UPDATE ... WHERE quantidade >= ?): sem venda a descoberto
+                    if baixar_estoque({componente_id: quantidade}, data=date.today(), observacao=observacao or None):
+                        db.session.rollback()
+                        return False
                 else:
-                    if estoque.quantidade < quantidade:
-                        flash("Saldo insuficiente para saída!", "danger")
-                        return redirect(url_for("ajustar_estoque", componente_id=componente.id))
-                    estoque.quantidade -= quantidade
-
-                mov = Movimentacao(
-                    componente_id=componente.id,
-                    quantidade=quantidade,
-                    tipo=tipo,
-                    data=date.today(),
-                    observacao=observacao if observacao else None
-                )
-                db.session.add(mov)
+                    registrar_movimentacao(componente_id, tipo, quantidade, data=date.today(),
+                                           observacao=observacao or None)
                 db.session.commit()
+                return True
 
-                flash(f"{quantidade} unidades {'adicionadas' if tipo=='entrada' else 'retiradas'} do estoque de '{componente.nome}'", "success")
-                return redirect(url_for("cadastro_componente"))
-            except ValueError:
-                flash("Quantidade inválida!", "danger")
+            if not repetir_se_ocupado(lancar):
+                flash("Saldo insuficiente para saída!", "danger")
                 return redirect(url_for("ajustar_estoque", componente_id=componente.id))
+            cache_dashboard.invalidar()
+
+            flash(f"{quantidade} unidades {'adicionadas' if tipo=='entrada' else 'retiradas'} do estoque de '{componente.nome}'", "success")
+            return redirect(url_for("cadastro_componente"))
 
         return render_template("AjusteEstoque.html", componente=componente, estoque=estoque)
 
+    # -----------------------
+    # Recebimento de Estoque (documento com várias linhas)
+    # -----------------------
+    @app.route("/estoque/recebimento", methods=["GET", "POST"], endpoint="recebimento_estoque")
+    @login_required
+    def recebimento_estoque():
+        componentes = Componente.query.filter_by(ativo=True).order_by(Componente.nome).all()
+
+        if request.method == "POST":
+            ids_validos = {c.id for c in componentes}
+            linhas, erros = [], []
+            for numero, (componente_id, quantidade) in enumerate(
+                    zip(request.form.getlist("componente_id"), request.form.getlist("quantidade")), start=1):
+                if not componente_id and not quantidade:
+                    continue  # linha em branco
+                try:
+                    componente_id, quantidade = int(componente_id), float(quantidade.replace(",", "."))
+                except ValueError:
+                    erros.append(f"Linha {numero}: componente ou quantidade inválidos")
+                    continue
+                if not math.isfinite(quantidade):
+                    erros.append(f"Linha {numero}: quantidade inválida")
+                    continue
+                if componente_id not in ids_validos or quantidade <= 0:
+                    erros.append(f"Linha {numero}: componente inativo ou quantidade não positiva")
+                    continue
+                linhas.append((componente_id, quantidade))
+
+            data_recebimento = request.form.get("data")
+            try:
+                data_recebimento = (datetime.strptime(data_recebimento, "%Y-%m-%d").date()
+                                    if data_recebimento else date.today())
+            except ValueError:
+                erros.append("Data do recebimento inválida (use AAAA-MM-DD)")
+
+            if erros or not linhas:
+                flash(" • ".join(erros) or "Informe ao menos uma linha do recebimento!", "danger")
+                return redirect(url_for("recebimento_estoque"))
+
+            recebimento = lancar_recebimento(
+                RecebimentoEstoque(
+                    numero_documento=request.form.get("numero_documento", "").strip() or None,
+                    fornecedor=request.form.get("fornecedor", "").strip() or None,
+                    data=data_recebimento,
+                    observacao=request.form.get("observacao", "").strip() or None,
+                    usuario_id=current_user.id
+                ),
+                linhas
+            )
+            db.session.commit()
+            cache_dashboard.invalidar()
+
+            flash(f"Recebimento lançado: {len(linhas)} linha(s) de entrada.", "success")
+            return redirect(url_for("ver_recebimento_estoque", recebimento_id=recebimento.id))
+
+        recebimentos = RecebimentoEstoque.query.order_by(RecebimentoEstoque.id.desc()).limit(20).all()
+        return render_template("RecebimentoEstoque.html", componentes=componentes, recebimentos=recebimentos,
+                               hoje=date.today())
+
+    @app.route("/estoque/recebimento/<int:recebimento_id>")
+    @login_required
+    def ver_recebimento_estoque(recebimento_id):
+        recebimento = RecebimentoEstoque.query.get_or_404(recebimento_id)
+        movimentacoes = (
+            Movimentacao.query.options(joinedload(Movimentacao.componente))
+            .filter_by(recebimento_id=recebimento.id)
+            .order_by(Movimentacao.id)
+            .all()
+        )
+        return render_template("RecebimentoDetalhe.html", recebimento=recebimento, movimentacoes=movimentacoes)
+
+    @app.route("/estoque/recebimento/<int:recebimento_id>/estornar", methods=["POST"])
+    @login_required
+    def estornar_recebimento_estoque(recebimento_id):
+        recebimento = RecebimentoEstoque.query.get_or_404(recebimento_id)
+
+        def estornar():
+            """Uma tentativa do estorno (reivindica o documento + baixa condicional)."""
+            faltas = estornar_recebimento(recebimento)
+            if faltas is None or faltas:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            return faltas
+
+        faltas = repetir_se_ocupado(estornar)
+        if faltas is None:
+            flash("Este recebimento já foi estornado.", "info")
+            return redirect(url_for("ver_recebimento_estoque", recebimento_id=recebimento.id))
+        if faltas:
+            nomes = {c.id: c.nome for c in Componente.query.filter(Componente.id.in_([f[0] for f in faltas]))}
+            flash("Saldo insuficiente para estornar: " + ", ".join(
+                f"{nomes.get(cid, cid)} (saldo {saldo:.2f} < {necessario:.2f})" for cid, saldo, necessario in faltas
+            ), "danger")
+            return redirect(url_for("ver_recebimento_estoque", recebimento_id=recebimento.id))
+
+        cache_dashboard.invalidar()
+        flash("Recebimento estornado: todas as linhas foram devolvidas.", "success")
+        return redirect(url_for("ver_recebimento_estoque", recebimento_id=recebimento.id))
+
     # -----------------------
     # Visualizar Movimentações
     # -----------------------
@@ -179,11 +430,64 @@ def routes(app):
     # -----------------------
     @app.route("/estoque")
     def ver_estoque():
-        atualizar_saldos()
-        componentes = Componente.query.all()
-        estoques = Estoque.query.all()
-        saldos = {e.componente_id: e.quantidade for e in estoques}
-        return render_template("Estoque.html", componentes=componentes, saldos=saldos)
+        # A tela de estoque vive em /controle-producao, que já carrega os saldos
+        # (o template Estoque.html nunca existiu: a rota respondia 500)
+        return redirect(url_for("controle_producao", tela="estoque"))
+
+    # -----------------------
+    # Reconciliação manual de saldos (reconstrução completa)
+    # -----------------------
+    @app.route("/estoque/reconciliar", methods=["POST"])
+    @login_required
+    def reconciliar_estoque():
+        # Varre todas as movimentações: roda na fila, fora da requisição
+        tarefa_id = fila_tarefas.enfileirar("reconciliar-estoque", usuario_id=current_user.id)
+        flash(f"Reconciliação de saldos agendada (tarefa #{tarefa_id}). "
+              f"Acompanhe em {url_for('status_tarefa', tarefa_id=tarefa_id)}.", "info")
+        return redirect(url_for("cadastro_componente"))
+
+    # -----------------------
+    # Tarefas em segundo plano: status/progresso e disparo manual
+    # -----------------------
+    def _tarefa_resposta(tarefa):
+        dados = tarefa_para_dict(tarefa)
+        dados["url_status"] = url_for('status_tarefa', tarefa_id=tarefa.id)
+        return dados
+
+    @app.route("/api/tarefas")
+    @login_required
+    def listar_tarefas():
+        consulta = Tarefa.query
+        if request.args.get("status"):
+            consulta = consulta.filter(Tarefa.status == request.args["status"])
+        if request.args.get("nome"):
+            consulta = consulta.filter(Tarefa.nome == request.args["nome"])
+        limite = min(request.args.get("limite", 50, type=int), 500)
+        tarefas = consulta.order_by(Tarefa.id.desc()).limit(limite).all()
+        return jsonify({
+            "workers_ativos": fila_tarefas.ativa,
+            "agenda": fila_tarefas.agenda,
+            "tarefas": [_tarefa_resposta(t) for t in tarefas],
+        })
+
+    @app.route("/api/tarefas/<int:tarefa_id>")
+    @login_required
+    def status_tarefa(tarefa_id):
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        if tarefa is None:
+            return jsonify({"erro": "Tarefa não encontrada"}), 404
+        return jsonify(_tarefa_resposta(tarefa))
+
+    @app.route("/api/tarefas/<nome>", methods=["POST"])
+    @login_required
+    def enfileirar_tarefa(nome):
+        if nome not in fila_tarefas.nomes or nome == "gerar-relatorio":
+            return jsonify({"erro": f"Tarefa desconhecida: {nome}"}), 404
+        parametros = request.get_json(silent=True) or {}
+        if not isinstance(parametros, dict):
+            return jsonify({"erro": "Parâmetros devem ser um objeto JSON"}), 400
+        tarefa_id = fila_tarefas.enfileirar(nome, parametros, usuario_id=current_user.id)
+        return jsonify(_tarefa_resposta(db.session.get(Tarefa, tarefa_id))), 202
 
 # -----------------------
 # Controle de Produção
@@ -198,16 +502,20 @@ def routes(app):
         ##producoes = Producao.query.all()
         ##producoes = Producao.query.order_by(Producao.id.desc()).all()
 
-        producoes = Producao.query.filter(Producao.status != "C").order_by(Producao.id.desc()).all()##aqui lista as produções talkey?
+        # Primeira página (tamanho fixo) já filtrada no servidor; as demais vêm de /api/producoes
+        filtros = filtros_da_requisicao(request.args)
+        producoes, proximo_cursor = buscar_pagina_producoes(filtros)
         componentes = Componente.query.filter_by(ativo=True).all()
-        fichas = FichaTecnica.query.all()
+        fichas = FichaTecnica.query.options(
+            joinedload(FichaTecnica.tipo_espuma),
+            selectinload(FichaTecnica.componentes).joinedload(FichaTecnicaComponente.componente)
+        ).all()
         hoje = date.today().strftime('%Y-%m-%d')
         todos_componentes = Componente.query.all()
         tipos_espuma = TipoEspuma.query.all()
 
         # 👇 CRIE A VARIÁVEL SALDOS AQUI:
-        estoques = Estoque.query.all()
-        saldos = {e.componente_id: e.quantidade for e in estoques}
+        saldos = saldos_atuais()
 
         return render_template('controle_producao.html',
                                producoes=producoes,
@@ -216,9 +524,26 @@ def routes(app):
                                todos_componentes=todos_componentes,
                                saldos=saldos,
                                fichas=fichas,
-                               tipos_espuma=tipos_espuma
-                        
+                               tipos_espuma=tipos_espuma,
+                               filtros=filtros,
+                               proximo_cursor=proximo_cursor
         )
+
+    # -----------------------
+    # API: próximas páginas da lista de produções (paginação por cursor)
+    # -----------------------
+    @app.route('/api/producoes')
+    @login_required
+    def api_producoes():
+        filtros = filtros_da_requisicao(request.args)
+        cursor = request.args.get('cursor', type=int)
+        limite = request.args.get('limite', TAMANHO_PAGINA, type=int)
+
+        producoes, proximo_cursor = buscar_pagina_producoes(filtros, cursor=cursor, limite=limite)
+        return jsonify({
+            'producoes': [producao_para_dict(p) for p in producoes],
+            'proximo_cursor': proximo_cursor
+        })
     
     #-----------------------
     # Cancelar Produção (status 'C' para cancelada)
@@ -226,72 +551,52 @@ def routes(app):
     @app.route('/producao/<int:producao_id>/cancelar', methods=['POST'])
     @login_required
     def cancelar_producao(producao_id):
-        producao = Producao.query.get_or_404(producao_id)
+        producao = Producao.query.options(
+            selectinload(Producao.componentes).joinedload(ComponenteProducao.componente)
+        ).get_or_404(producao_id)
 
         if producao.status == 'C':  # já cancelada
             flash(f"A produção {producao.producao_id} já está cancelada.", "info")
             return redirect(url_for('controle_producao'))
 
-        # Percorre todos os componentes usados na produção
-        for cp in producao.componentes:
-            # Atualiza o estoque do componente
-            estoque = Estoque.query.filter_by(componente_id=cp.componente_id).first()
-            if estoque:
-                estoque.quantidade += cp.quantidade_usada
-            else:
-                # Se não houver estoque, cria um registro
-                estoque = Estoque(componente_id=cp.componente_id, quantidade=cp.quantidade_usada)
-                db.session.add(estoque)
-
-            # Cria movimentação de entrada para registrar devolução
-            movimentacao = Movimentacao(
-                componente_id=cp.componente_id,
-                tipo='entrada',
-                quantidade=cp.quantidade_usada,
-                producao_id=producao.id,
-                observacao=f"Devolução por cancelamento da produção {producao.producao_id}"
-            )
-            db.session.add(movimentacao)
+        # Devolve todos os componentes usados na produção: movimentações de entrada
+        # em lote + um único UPDATE de saldos
+        registrar_movimentacoes([
+            {
+                'componente_id': cp.componente_id,
+                'tipo': 'entrada',
+                'quantidade': cp.quantidade_usada,
+                'producao_id': producao.id,
+                'observacao': f"Devolução por cancelamento da produção {producao.producao_id}"
+            }
+            for cp in producao.componentes
+        ])
 
         # Marca a produção como cancelada
         producao.status = 'C'
+        bloco = producao.producao_id
+
+        # Retira a produção do perfil estatístico do tipo de espuma e do rollup diário
+        itens = [(cp.componente_id, cp.componente.nome, cp.quantidade_usada) for cp in producao.componentes]
+        tipo_espuma = TipoEspuma.query.filter_by(nome=producao.tipo_espuma).first()
+        if tipo_espuma:
+            perfil = atualizar_perfil(tipo_espuma.id, producao, itens, remover=True)
+            atualizar_estatisticas_robustas(perfil, tipo_espuma.nome)
+        registrar_producao_diaria(producao, itens, remover=True)
+
         db.session.commit()
+        cache_dashboard.invalidar()
 
-        flash(f"Produção {producao.producao_id} cancelada com sucesso! Componentes devolvidos ao estoque.", "success")
+        flash(f"Produção {bloco} cancelada com sucesso! Componentes devolvidos ao estoque.", "success")
         return redirect(url_for('controle_producao'))
     
 # -----------------------
 # Cadastro de Produção
     @app.route("/cadastro_producao", methods=["GET"], endpoint="mostrar_cadastro_producao")
     def mostrar_cadastro_producao():
-        producoes = Producao.query.all()
-        todos_componentes = Componente.query.all()
-        componentes = Componente.query.filter_by(ativo=True).all()
-        hoje = date.today().strftime("%Y-%m-%d")
-        fichas = FichaTecnica.query.all()
-        
-        tipos_espuma = (
-        TipoEspuma.query
-        .join(FichaTecnica, FichaTecnica.tipo_espuma_id == TipoEspuma.id)
-        .distinct()
-        .all()
-                        )
-
-        
-        #  CRIE A VARIÁVEL SALDOS AQUI:
-        estoques = Estoque.query.all()
-        saldos = {e.componente_id: e.quantidade for e in estoques}
-
-        return redirect(url_for(
-            "controle_producao",
-            producoes=producoes,
-            componentes=componentes,
-            todos_componentes=todos_componentes,
-            hoje=hoje,
-            saldos=saldos,
-            fichas=fichas,
-            tipos_espuma=tipos_espuma
-        ))
+        # A tela de cadastro vive em /controle-producao, que já carrega seus próprios dados
+        # (antes a lista completa de produções ia serializada na query string do redirect)
+        return redirect(url_for("controle_producao"))
 
     # Rota POST: processa o formulário
     @app.route("/cadastro_producao", methods=["POST"], endpoint="cadastro_producao")
@@ -309,21 +614,31 @@ def routes(app):
                 flash("Nenhuma ficha técnica encontrada para este tipo de espuma!", "danger")
                 return redirect(url_for("mostrar_cadastro_producao"))
 
-
-
             data_producao = datetime.strptime(data_producao, "%Y-%m-%d").date()
 
-            # Evita duplicidade de número de bloco
-            if Producao.query.filter_by(producao_id=producao_id).first():
-                flash(f"Número de bloco '{producao_id}' já cadastrado!", "danger")
-                return redirect(url_for("mostrar_cadastro_producao"))
+            # Lê o formulário antes da transação: a escrita abaixo pode ser repetida
+            tipo_nome = ficha.tipo_espuma.nome
+            itens_perfil = []
+            for fc in ficha.componentes:
+                quantidade = float(request.form.get(f"componente_{fc.componente.id}", 0))
+                if quantidade > 0:
+                    itens_perfil.append((fc.componente.id, fc.componente.nome, quantidade))
+            nomes = {cid: nome for cid, nome, _ in itens_perfil}
+        except (KeyError, ValueError) as e:
+            db.session.rollback()
+            flash(f"Erro ao cadastrar produção: {str(e)}", "danger")
+            return redirect(url_for("mostrar_cadastro_producao"))
 
+        def lancar():
+            """Uma tentativa do lançamento inteiro; retorna a mensagem de erro ou None."""
+            # Evita duplicidade de número de bloco
+            if db.session.query(Producao.id).filter_by(producao_id=producao_id).first():
+                return f"Número de bloco '{producao_id}' já cadastrado!"
 
-            # Cria o registro da produção
             nova_producao = Producao(
                 producao_id=producao_id,
                 data_producao=data_producao,
-                tipo_espuma=ficha.tipo_espuma.nome,
+                tipo_espuma=tipo_nome,
                 cor=cor,
                 altura=altura,
                 conformidade=conformidade,
@@ -333,50 +648,114 @@ def routes(app):
             db.session.add(nova_producao)
             db.session.flush()  # Pega o ID antes do commit
 
-            # 🔹 Pega apenas os componentes da ficha técnica selecionada
-            # pega apenas componentes da ficha técnica
-            componentes_ficha = [fc.componente for fc in ficha.componentes]
+            # Baixa condicional (UPDATE ... WHERE quantidade >= consumo) + saídas em lote
+            consumos = defaultdict(float)
+            for componente_id, _, quantidade in itens_perfil:
+                consumos[componente_id] += quantidade
+            faltas = baixar_estoque(consumos, data=datetime.now(), producao_id=nova_producao.id)
+            if faltas:
+                db.session.rollback()
+                return f"Saldo insuficiente do componente '{nomes[faltas[0]]}'"
 
-            for componente in componentes_ficha:
-                campo_nome = f"componente_{componente.id}"
-                quantidade = float(request.form.get(campo_nome, 0))
+            if itens_perfil:
+                db.session.execute(insert(ComponenteProducao), [
+                    {"producao_id": nova_producao.id, "componente_id": componente_id, "quantidade_usada": quantidade}
+                    for componente_id, _, quantidade in itens_perfil
+                ])
 
-                if quantidade > 0:
-                    estoque = Estoque.query.filter_by(componente_id=componente.id).first()
-                    if not estoque or estoque.quantidade < quantidade:
-                        db.session.rollback()
-                        flash(f"Saldo insuficiente do componente '{componente.nome}'", "danger")
-                        return redirect(url_for("mostrar_cadastro_producao"))
-
-                    # Registra o uso do componente
-                    cp = ComponenteProducao(
-                        producao_id=nova_producao.id,
-                        componente_id=componente.id,
-                        quantidade_usada=quantidade
-                    )
-                    db.session.add(cp)
-
-                    # Atualiza o estoque e cria a movimentação
-                    estoque.quantidade -= quantidade
-                    db.session.add(Movimentacao(
-                        componente_id=componente.id,
-                        data=datetime.now(),
-                        tipo='saida',
-                        quantidade=quantidade,
-                        producao_id=nova_producao.id
-                    ))
+            # Perfil estatístico do tipo de espuma (assistente IA) na mesma transação
+            perfil = atualizar_perfil(tipo_espuma_id, nova_producao, itens_perfil)
+            atualizar_estatisticas_robustas(perfil, tipo_nome)
+
+            # Rollup diário do dashboard
+            registrar_producao_diaria(nova_producao, itens_perfil)
 
             db.session.commit()
-            flash("Produção cadastrada com sucesso!", "success")
-            return redirect(url_for("mostrar_cadastro_producao"))
+            return None
 
-        except (KeyError, ValueError) as e:
+        try:
+            erro = repetir_se_ocupado(lancar)
+        except IntegrityError:
+            # Mesmo bloco gravado por outro lançamento entre a checagem e o INSERT
             db.session.rollback()
-            flash(f"Erro ao cadastrar produção: {str(e)}", "danger")
+            erro = f"Número de bloco '{producao_id}' já cadastrado!"
+        if erro:
+            flash(erro, "danger")
             return redirect(url_for("mostrar_cadastro_producao"))
+
+        cache_dashboard.invalidar()
+        flash("Produção cadastrada com sucesso!", "success")
+        return redirect(url_for("mostrar_cadastro_producao"))
         
 
 
+    # -----------------------
+    # Importação de produções por planilha (CSV/XLSX), em lote
+    # -----------------------
+    @app.route("/producao/importar", methods=["GET", "POST"], endpoint="importar_producoes_planilha")
+    @login_required
+    def importar_producoes_planilha():
+        resultado = None
+        if request.method == "POST":
+            arquivo = request.files.get("arquivo")
+            if not arquivo or not arquivo.filename:
+                flash("Selecione um arquivo .csv ou .xlsx", "danger")
+                return redirect(url_for("importar_producoes_planilha"))
+            try:
+                resultado = importar_producoes(
+                    arquivo.stream,
+                    arquivo.filename,
+                    current_user.id,
+                    parcial=bool(request.form.get("parcial")),
+                    somente_validar=bool(request.form.get("somente_validar"))
+                )
+            except ErroImportacao as e:
+                db.session.rollback()
+                if request.args.get("formato") == "json":
+                    return jsonify({"erro": str(e)}), 400
+                flash(str(e), "danger")
+                return redirect(url_for("importar_producoes_planilha"))
+
+            if resultado["importadas"]:
+                cache_dashboard.invalidar()
+                flash(f"{resultado['importadas']} produção(ões) importada(s) com sucesso!", "success")
+            elif resultado["erros"]:
+                flash("Nenhuma produção importada: corrija os erros abaixo.", "warning")
+            else:
+                flash(f"Arquivo válido: {resultado['linhas']} linha(s) prontas para importar.", "info")
+
+            if request.args.get("formato") == "json":
+                return jsonify(resultado)
+
+        return render_template("importar_producao.html", resultado=resultado, max_linhas=MAX_LINHAS)
+
+    @app.route("/producao/importar/modelo.csv")
+    @login_required
+    def modelo_importacao_producoes():
+        return app.response_class(
+            "\ufeff" + modelo_csv(),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=modelo_importacao_producoes.csv"}
+        )
+
+    # -----------------------
+    # Exportação em fluxo (CSV/XLSX): produções, consumo e movimentações
+    # -----------------------
+    @app.route("/exportar/<conjunto>.<formato>")
+    @login_required
+    def exportar_dados(conjunto, formato):
+        if conjunto not in CONJUNTOS_EXPORTACAO or formato not in FORMATOS_EXPORTACAO:
+            return jsonify({"erro": "Exportação inválida"}), 404
+        try:
+            gerador, mimetype, nome = exportar(conjunto, formato, filtros_exportacao(request.args))
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+        return app.response_class(
+            stream_with_context(gerador),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={nome}"}
+        )
+
     @app.route("/componentes_por_tipo/<int:tipo_id>")
     def componentes_por_tipo(tipo_id):
         # encontra a ficha técnica relacionada ao tipo de espuma selecionado
@@ -399,7 +778,12 @@ def routes(app):
     @app.route('/ComponentesProducao/<int:producao_id>')
     def ver_componentes_producao(producao_id):
         producao = Producao.query.get_or_404(producao_id)
-        componentes = ComponenteProducao.query.filter_by(producao_id=producao_id).all()
+        componentes = (
+            ComponenteProducao.query
+            .options(joinedload(ComponenteProducao.componente))
+            .filter_by(producao_id=producao_id)
+            .all()
+        )
 
         ficha = (
             FichaTecnica.query
@@ -595,8 +979,18 @@ def routes(app):
             return render_template('CadastroTipoEspuma.html', espumas=espumas)
 
         espuma = TipoEspuma.query.get_or_404(id)
+        nome_antigo = espuma.nome
         espuma.nome = nova_nome
+        # Produções, rollup diário e laudos guardam o nome do tipo (desnormalizado):
+        # renomeia junto, na mesma transação, para que as buscas por nome
+        # (cancelamento, perfil da IA, filtros) continuem achando o tipo
+        for modelo in (Producao, ProducaoDiaria, Laudo):
+            db.session.execute(
+                update(modelo).where(modelo.tipo_espuma == nome_antigo).values(tipo_espuma=nova_nome)
+                .execution_options(synchronize_session=False)
+            )
         db.session.commit()
+        cache_dashboard.invalidar()
         flash(f"Tipo de espuma atualizado para '{nova_nome}' com sucesso!", "success")
 
         espumas = TipoEspuma.query.order_by(TipoEspuma.nome).all()
@@ -741,187 +1135,66 @@ def routes(app):
         if not dados or 'tipo_espuma_id' not in dados:
             return jsonify({'alertas': [], 'recomendacao': ''})
 
-        tipo_espuma_id = dados.get('tipo_espuma_id')
-        altura_atual = dados.get('altura')
-        componentes_input = dados.get('componentes', {})
-
-        # =================================================================
-        # 🔍 1. Busca histórico de produções do mesmo tipo de espuma
-        # =================================================================
-        # Encontra o nome do tipo de espuma baseado no ID
-        tipo_espuma = TipoEspuma.query.get(tipo_espuma_id)
-        if not tipo_espuma:
+        # Uma leitura indexada do perfil pré-calculado (mantido a cada lançamento/cancelamento)
+        perfil = PerfilFormulacao.query.filter_by(tipo_espuma_id=dados.get('tipo_espuma_id')).first()
+        if perfil is None and not db.session.get(TipoEspuma, dados.get('tipo_espuma_id')):
             return jsonify({'alertas': [], 'recomendacao': ''})
 
-        # Busca últimas 50 produções deste tipo
-        historico = Producao.query\
-            .filter_by(tipo_espuma=tipo_espuma.nome)\
-            .order_by(Producao.data_producao.desc())\
-            .limit(50)\
-            .all()
+        return jsonify(analisar_formulacao(perfil, dados.get('altura'), dados.get('componentes', {})))
 
-        if len(historico) < 5:
-            return jsonify({
-                'alertas': [{
-                    'severidade': 'info',
-                    'mensagem': f'ℹ️ Apenas {len(historico)} produções anteriores deste tipo. Histórico limitado para análise.'
-                }],
-                'recomendacao': 'Continue produzindo para construir base de dados histórica.'
-            })
-
-        # =================================================================
-        # 📊 2. Monta dados históricos
-        # =================================================================
-        registros_historicos = []
-        
-        for producao in historico:
-            # Pega componentes usados nesta produção
-            componentes_producao = ComponenteProducao.query.filter_by(producao_id=producao.id).all()
-            
-            registro = {
-                'altura': producao.altura,
-                'data': producao.data_producao
-            }
-            
-            # Adiciona cada componente como coluna
-            for cp in componentes_producao:
-                registro[f'componente_{cp.componente_id}'] = cp.quantidade_usada
-            
-            registros_historicos.append(registro)
-
-        # =================================================================
-        # ⚠️ 3. Análises e Detecção de Anomalias
-        # =================================================================
-        alertas = []
-
-        # -----------------------------------------------------------------
-        # Análise 3.1: Altura do bloco fora do padrão
-        # -----------------------------------------------------------------
-        if altura_atual and any('altura' in r for r in registros_historicos):
-            alturas_hist = [r['altura'] for r in registros_historicos if r.get('altura')]
-            if alturas_hist:
-                media_altura = sum(alturas_hist) / len(alturas_hist)
-                desvio_altura = ((altura_atual / media_altura) - 1) * 100
-                
-                if abs(desvio_altura) > 10:
-                    severidade = 'critico' if abs(desvio_altura) > 15 else 'alerta'
-                    alertas.append({
-                        'severidade': severidade,
-                        'mensagem': f'Altura {altura_atual}cm ({desvio_altura:+.1f}% vs média {media_altura:.1f}cm) → risco de variação de densidade'
-                    })
-
-        # -----------------------------------------------------------------
-        # Análise 3.2: Componentes fora da faixa histórica
-        # -----------------------------------------------------------------
-        for comp_key, valor_atual in componentes_input.items():
-            # Ex: comp_key = "componente_5", extraímos o ID 5
-            try:
-                comp_id = int(comp_key.replace('componente_', ''))
-                componente_nome = Componente.query.get(comp_id).nome if Componente.query.get(comp_id) else f'ID {comp_id}'
-            except:
-                continue
-
-            # Coleta valores históricos deste componente
-            valores_hist = [
-                r.get(comp_key) for r in registros_historicos if r.get(comp_key) is not None
-            ]
+    # =====================================================================
+    # 🧠 ASSISTENTE IA - PONTUAÇÃO EM LOTE (ex.: blocos planejados do turno)
+    # =====================================================================
+    @app.route('/api/ia-analise-producao/lote', methods=['POST'])
+    @login_required
+    def ia_analise_producao_lote():
+        """
+        Pontua várias formulações de uma vez com o motor vetorizado.
+        Recebe: {tipo_espuma_id: int (padrão), formulacoes: [{tipo_espuma_id?, altura, componentes}]}
+        Retorna: {resultados: [{alertas, recomendacao, base_historica}]} na ordem recebida
+        """
+        dados = request.get_json(silent=True)
+        if not isinstance(dados, dict) or not isinstance(dados.get('formulacoes') or [], list):
+            return jsonify({"erro": "Envie {'formulacoes': [...]}"}), 400
+        formulacoes = dados.get('formulacoes') or []
+        if len(formulacoes) > MAX_FORMULACOES_POR_LOTE:
+            return jsonify({"erro": f"Lote com mais de {MAX_FORMULACOES_POR_LOTE} formulações: divida o envio"}), 400
+
+        def tipo_id(valor):
+            return None if valor is None else int(valor)
+
+        # Agrupa por tipo de espuma: um perfil (e uma chamada ao motor) por tipo
+        grupos = {}
+        try:
+            tipo_padrao = tipo_id(dados.get('tipo_espuma_id'))
+            for posicao, formulacao in enumerate(formulacoes):
+                if not isinstance(formulacao, dict) or not isinstance(formulacao.get('componentes') or {}, dict):
+                    return jsonify({"erro": f"Formulação {posicao + 1}: envie um objeto "
+                                            "{tipo_espuma_id?, altura, componentes: {...}}"}), 400
+                tipo = tipo_id(formulacao['tipo_espuma_id']) if 'tipo_espuma_id' in formulacao else tipo_padrao
+                grupos.setdefault(tipo, []).append(posicao)
+        except (TypeError, ValueError):
+            return jsonify({"erro": "tipo_espuma_id deve ser um número inteiro"}), 400
+
+        perfis = {
+            p.tipo_espuma_id: p
+            for p in PerfilFormulacao.query.filter(PerfilFormulacao.tipo_espuma_id.in_([t for t in grupos if t is not None]))
+        }
+        tipos_existentes = {
+            t for (t,) in db.session.query(TipoEspuma.id).filter(TipoEspuma.id.in_([t for t in grupos if t is not None]))
+        }
 
-            if len(valores_hist) >= 3 and valor_atual > 0:
-                media_hist = sum(valores_hist) / len(valores_hist)
-                desvio_percent = ((valor_atual / media_hist) - 1) * 100
-                
-                # Define thresholds baseados no componente
-                if 'água' in componente_nome.lower() or 'water' in componente_nome.lower() or 'agua' in componente_nome.lower():
-                    # Água é crítica - tolerância menor
-                    if abs(desvio_percent) > 12:
-                        severidade = 'critico' if abs(desvio_percent) > 20 else 'alerta'
-                        alertas.append({
-                            'severidade': severidade,
-                            'mensagem': f'{componente_nome}: {valor_atual:.2f}kg ({desvio_percent:+.1f}% vs {media_hist:.2f}kg) → pode afetar densidade final'
-                        })
-                else:
-                    # Outros componentes
-                    if abs(desvio_percent) > 15:
-                        severidade = 'alerta' if abs(desvio_percent) < 25 else 'critico'
-                        alertas.append({
-                            'severidade': severidade,
-                            'mensagem': f'{componente_nome}: {valor_atual:.2f}kg ({desvio_percent:+.1f}% vs histórico)'
-                        })
-
-        # -----------------------------------------------------------------
-        # Análise 3.3: Relação Água/Políol (se ambos presentes)
-        # -----------------------------------------------------------------
-        agua_key = None
-        poliol_key = None
-        
-        # Identifica quais são água e poliol pelos nomes
-        for comp_key in componentes_input.keys():
-            try:
-                comp_id = int(comp_key.replace('componente_', ''))
-                comp_nome = Componente.query.get(comp_id).nome.lower()
-                
-                if 'água' in comp_nome or 'water' in comp_nome or 'agua' in comp_nome:
-                    agua_key = comp_key
-                elif 'poliol' in comp_nome or 'polyol' in comp_nome:
-                    poliol_key = comp_key
-            except:
+        resultados = [None] * len(formulacoes)
+        for tipo, posicoes in grupos.items():
+            if tipo not in tipos_existentes:
+                for posicao in posicoes:
+                    resultados[posicao] = {'alertas': [], 'recomendacao': ''}
                 continue
+            pontuados = pontuar_formulacoes(perfis.get(tipo), [formulacoes[p] for p in posicoes])
+            for posicao, resultado in zip(posicoes, pontuados):
+                resultados[posicao] = resultado
 
-        if agua_key and poliol_key and componentes_input.get(agua_key) and componentes_input.get(poliol_key):
-            agua_atual = componentes_input[agua_key]
-            poliol_atual = componentes_input[poliol_key]
-            relacao_atual = agua_atual / poliol_atual if poliol_atual > 0 else 0
-
-            # Calcula relação histórica média
-            relacoes_hist = []
-            for r in registros_historicos:
-                agua_hist = r.get(agua_key)
-                poliol_hist = r.get(poliol_key)
-                if agua_hist and poliol_hist and poliol_hist > 0:
-                    relacoes_hist.append(agua_hist / poliol_hist)
-
-            if len(relacoes_hist) >= 3:
-                media_relacao = sum(relacoes_hist) / len(relacoes_hist)
-                desvio_relacao = ((relacao_atual / media_relacao) - 1) * 100
-                
-                if abs(desvio_relacao) > 10:
-                    alertas.append({
-                        'severidade': 'alerta',
-                        'mensagem': f'Relação Água/Políol {relacao_atual:.3f} ({desvio_relacao:+.1f}% vs {media_relacao:.3f}) → pode afetar tamanho da célula'
-                    })
-
-        # -----------------------------------------------------------------
-        # Análise 3.4: Produções não conformes no histórico (correlação)
-        # -----------------------------------------------------------------
-        nao_conformes = [p for p in historico if p.conformidade == 'Não Conforme']
-        if len(nao_conformes) > 0:
-            taxa_nao_conforme = (len(nao_conformes) / len(historico)) * 100
-            
-            if taxa_nao_conforme > 15:  # Mais de 15% de não conformidades
-                alertas.append({
-                    'severidade': 'alerta',
-                    'mensagem': f'⚠️ {taxa_nao_conforme:.0f}% das últimas produções deste tipo foram Não Conformes'
-                })
-
-        # =================================================================
-        # 💡 4. Gera Recomendação Contextual
-        # =================================================================
-        recomendacao = ''
-        
-        if any(a['severidade'] == 'critico' for a in alertas):
-            recomendacao = '🔴 Recomendado: consultar técnico antes de iniciar a batida'
-        elif len(alertas) >= 2:
-            recomendacao = '🟡 Dica: revise os parâmetros ou faça ajuste gradual para manter estabilidade'
-        elif alertas:
-            recomendacao = 'ℹ️ Valores ligeiramente fora do padrão. Monitorar resultado final.'
-        else:
-            recomendacao = '✅ Formulação dentro dos parâmetros históricos'
-
-        return jsonify({
-            'alertas': alertas,
-            'recomendacao': recomendacao,
-            'base_historica': len(historico)
-        })   
+        return jsonify({'resultados': resultados})
 
 
 
@@ -933,13 +1206,125 @@ def routes(app):
     def laudo_tecnico():
         return render_template('laudo-tecnico.html')
 
+    # -----------------------
+    # Laudos técnicos: gravação (um ou em lote) e deriva de densidade
+    # -----------------------
+    def _laudo_para_dict(laudo):
+        return {
+            "id": laudo.id,
+            "numero_bloco": laudo.numero_bloco,
+            "tipo_espuma": laudo.tipo_espuma,
+            "data": laudo.data.isoformat(),
+            "posicao_lamina": laudo.posicao_lamina,
+            "peso_kg": laudo.peso_kg,
+            "volume_m3": laudo.volume_m3,
+            "densidade": laudo.densidade,
+        }
+
+    @app.route('/laudo-tecnico', methods=['POST'])
+    @login_required
+    def salvar_laudo_tecnico():
+        gravados, erros = registrar_laudos([request.get_json(silent=True) or request.form.to_dict()], current_user.id)
+        if erros:
+            return jsonify({"erro": "; ".join(erros[0]["erros"])}), 400
+        db.session.commit()
+        return jsonify(gravados[0]), 201
+
+    @app.route('/api/laudos/lote', methods=['POST'])
+    @login_required
+    def api_laudos_lote():
+        dados = request.get_json(silent=True) or {}
+        laudos = dados.get("laudos") if isinstance(dados, dict) else dados
+        if not isinstance(laudos, list):
+            return jsonify({"erro": "Envie {'laudos': [...]}"}), 400
+        try:
+            gravados, erros = registrar_laudos(laudos, current_user.id)
+        except ErroLaudo as e:
+            return jsonify({"erro": str(e)}), 400
+        if gravados:
+            db.session.commit()
+        return jsonify({"gravados": len(gravados), "laudos": gravados, "erros": erros}), 201 if gravados else 400
+
+    @app.route('/api/laudos/densidade')
+    def api_deriva_densidade():
+        try:
+            data_inicio = datetime.strptime(request.args["data_inicio"], "%Y-%m-%d").date() if request.args.get("data_inicio") else None
+            data_fim = datetime.strptime(request.args["data_fim"], "%Y-%m-%d").date() if request.args.get("data_fim") else None
+        except ValueError:
+            return jsonify({"erro": "Datas no formato AAAA-MM-DD"}), 400
+        return jsonify(deriva_densidade(request.args.get("tipo_espuma") or None, data_inicio, data_fim))
+
+    @app.route('/api/laudos/bloco/<numero_bloco>')
+    def api_laudos_do_bloco(numero_bloco):
+        return jsonify([_laudo_para_dict(laudo) for laudo in laudos_do_bloco(numero_bloco)])
+
     @app.route('/lean-six-sigma')
     def lean_six_sigma():
         return render_template('lean.html')
 
+    @app.route('/lean-six-sigma/analise', methods=['POST'])
+    @login_required
+    def analise_lean_six_sigma():
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            return jsonify({"erro": "Selecione a planilha de garantia (.xlsx)"}), 400
+        try:
+            resultado, do_cache = analisar_planilha(arquivo.read(), cache_dmaic)
+        except ErroPlanilhaDmaic as e:
+            return jsonify({"erro": str(e)}), 400
+        resposta = jsonify(resultado)
+        resposta.headers["X-Cache"] = "HIT" if do_cache else "MISS"
+        return resposta
+
+    # -----------------------
+    # Análise preditiva de defeitos (planilhas de garantia no servidor)
+    # -----------------------
     @app.route('/analise_preditiva')
     def analise_preditiva():
-        return render_template('analise_preditiva.html')
+        return render_template('analise_preditiva.html', resumo=resumo_garantia(), opcoes=opcoes_previsao(),
+                               excluidos=app.config.get('DEFEITOS_EXCLUIDOS', DEFEITOS_EXCLUIDOS_PADRAO))
+
+    @app.route('/analise_preditiva/planilha', methods=['POST'])
+    @login_required
+    def enviar_planilha_garantia():
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            return jsonify({"erro": "Selecione um arquivo .xlsx, .xls ou .csv"}), 400
+        try:
+            planilha, nova = importar_planilha_garantia(arquivo.read(), arquivo.filename, current_user.id)
+            db.session.commit()
+        except ErroPlanilhaGarantia as e:
+            db.session.rollback()
+            return jsonify({"erro": str(e)}), 400
+
+        resumo = resumo_garantia()
+        return jsonify({
+            "planilha": {"id": planilha.id, "nome": planilha.nome_arquivo, "linhas": planilha.linhas},
+            "nova": nova,
+            "registros": resumo["registros"],
+            "defeitos": resumo["defeitos"],
+            **opcoes_previsao()
+        })
+
+    @app.route('/analise_preditiva/planilha/<int:planilha_id>/remover', methods=['POST'])
+    @login_required
+    def remover_planilha_garantia(planilha_id):
+        planilha = PlanilhaGarantia.query.get_or_404(planilha_id)
+        remover_planilha(planilha)
+        db.session.commit()
+        flash(f"Planilha '{planilha.nome_arquivo}' removida do histórico.", "success")
+        return redirect(url_for('analise_preditiva'))
+
+    @app.route('/api/analise-preditiva/previsao')
+    def api_previsao_defeitos():
+        produto = (request.args.get('produto') or '').strip()
+        grupo = (request.args.get('grupo') or '').strip()
+        if not produto or not grupo:
+            return jsonify({"erro": "Informe produto e grupo"}), 400
+        previsao = prever_defeitos(produto, grupo, app.config.get('DEFEITOS_EXCLUIDOS', DEFEITOS_EXCLUIDOS_PADRAO))
+        if not previsao["previsoes"]:
+            return jsonify({"erro": "Nenhuma planilha de garantia importada"}), 404
+        return jsonify(previsao)
 
    
 
@@ -956,94 +1341,99 @@ def routes(app):
         data_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").date() if data_inicio else None
         data_fim = datetime.strptime(data_fim, "%Y-%m-%d").date() if data_fim else None
 
-        # Query base de produções não canceladas
-        query = Producao.query.filter(Producao.status != "C")
-        if data_inicio:
-            query = query.filter(Producao.data_producao >= data_inicio)
-        if data_fim:
-            query = query.filter(Producao.data_producao <= data_fim)
-        producoes = query.order_by(Producao.data_producao).all()
-
-        # CARD: total de produções no período
-        total_producoes = len(producoes)
-
-        # CARD: total de tipos de espuma distintos usados
-        tipos_distintos = db.session.query(Producao.tipo_espuma).filter(
-            Producao.status != "C"
+        # Tudo vem do rollup producao_diaria (mantido no lançamento/cancelamento),
+        # em cache por período até a próxima escrita
+        resumo = cache_dashboard.obter_ou_calcular(
+            data_inicio, data_fim, lambda: resumo_dashboard(data_inicio, data_fim)
         )
-        if data_inicio:
-            tipos_distintos = tipos_distintos.filter(Producao.data_producao >= data_inicio)
-        if data_fim:
-            tipos_distintos = tipos_distintos.filter(Producao.data_producao <= data_fim)
-        tipos_distintos = tipos_distintos.distinct().count()
-
-        # CARD: total de componentes usados no período
-        total_componentes = db.session.query(
-            func.sum(ComponenteProducao.quantidade_usada)
-        ).join(Producao).filter(Producao.status != "C")
-        if data_inicio:
-            total_componentes = total_componentes.filter(Producao.data_producao >= data_inicio)
-        if data_fim:
-            total_componentes = total_componentes.filter(Producao.data_producao <= data_fim)
-        total_componentes = total_componentes.scalar() or 0
-
-        # HISTÓRICO DIÁRIO: produção por dia
-        historico = db.session.query(
-            Producao.data_producao,
-            func.count(Producao.id)
-        ).filter(Producao.status != "C")
-        if data_inicio:
-            historico = historico.filter(Producao.data_producao >= data_inicio)
-        if data_fim:
-            historico = historico.filter(Producao.data_producao <= data_fim)
-        historico = historico.group_by(Producao.data_producao).order_by(Producao.data_producao).all()
-        datas = [h[0].strftime("%d/%m/%Y") for h in historico]
-        totais_dia = [h[1] for h in historico]
-
-        # PRODUÇÃO POR TIPO DE ESPUMA
-        tipos_query = db.session.query(
-            Producao.tipo_espuma,
-            func.count(Producao.id)
-        ).filter(Producao.status != "C")
-        if data_inicio:
-            tipos_query = tipos_query.filter(Producao.data_producao >= data_inicio)
-        if data_fim:
-            tipos_query = tipos_query.filter(Producao.data_producao <= data_fim)
-        tipos_query = tipos_query.group_by(Producao.tipo_espuma).all()
-        tipos = [t[0] for t in tipos_query]
-        totais_tipo = [t[1] for t in tipos_query]
-
-        # COMPONENTES USADOS
-        componentes_query = db.session.query(
-            ComponenteProducao.componente_id,
-            func.sum(ComponenteProducao.quantidade_usada)
-        ).join(Producao).filter(Producao.status != "C")
-        if data_inicio:
-            componentes_query = componentes_query.filter(Producao.data_producao >= data_inicio)
-        if data_fim:
-            componentes_query = componentes_query.filter(Producao.data_producao <= data_fim)
-        componentes_query = componentes_query.group_by(ComponenteProducao.componente_id).all()
-        nomes_componentes = [db.session.get(Componente, c[0]).nome for c in componentes_query]
-        totais_componentes = [c[1] for c in componentes_query]
 
         return render_template(
             "dashboard.html",
-            datas=datas,
-            totais_dia=totais_dia,
-            tipos=tipos,
-            totais_tipo=totais_tipo,
-            nomes_componentes=nomes_componentes,
-            totais_componentes=totais_componentes,
-            total_producoes=total_producoes,
-            tipos_distintos=tipos_distintos,
-            total_componentes=total_componentes,
+            **resumo,
             data_inicio=data_inicio,
             data_fim=data_fim
         )
 
+    @app.route("/dashboard/cache")
+    @login_required
+    def dashboard_cache():
+        # Contadores de acerto/erro do cache do dashboard (somados entre workers)
+        return jsonify(cache_dashboard.estatisticas())
+
+    # -----------------------
+    # Métricas por rota (Prometheus / JSON)
+    # -----------------------
+    @app.route('/metrics')
+    def metricas():
+        coletor = app.extensions.get("metricas")
+        if coletor is None:
+            return jsonify({"erro": "Métricas desligadas (ligue com METRICAS=1)"}), 404
+        # Coletor: "Authorization: Bearer <METRICAS_TOKEN>"; sem token, só usuário logado
+        token = app.config.get('METRICAS_TOKEN')
+        autorizado = (bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+                      or current_user.is_authenticated)
+        if not autorizado:
+            return jsonify({"erro": "Não autorizado"}), 401
+        series = coletor.consolidado()
+        if request.args.get("formato") == "json":
+            return jsonify({"rotas": resumo_json(series)})
+        return app.response_class(formato_prometheus(series), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    # -----------------------
+    # Relatórios (executados em segundo plano)
+    # -----------------------
+    def _execucao_resposta(execucao, incluir_resultado=False):
+        dados = execucao_para_dict(execucao, incluir_resultado)
+        dados["url_status"] = url_for('status_relatorio', execucao_id=execucao.id)
+        dados["url_download"] = {formato: url_for('download_relatorio', execucao_id=execucao.id, formato=formato)
+                                 for formato in FORMATOS_RELATORIO}
+        return dados
+
     @app.route('/relatorios')
     def relatorios():
-        return render_template('relatorios.html')
+        recentes = RelatorioExecucao.query.order_by(RelatorioExecucao.criado_em.desc()).limit(10).all()
+        return render_template(
+            'relatorios.html',
+            relatorios=RELATORIOS,
+            tipos_espuma=[t.nome for t in TipoEspuma.query.order_by(TipoEspuma.nome)],
+            recentes=[_execucao_resposta(e) for e in recentes]
+        )
+
+    @app.route('/api/relatorios/<tipo>', methods=['POST'])
+    @login_required
+    def solicitar_relatorio(tipo):
+        dados = request.get_json(silent=True) or request.form.to_dict()
+        try:
+            execucao, _ = motor_relatorios.solicitar(tipo, dados, current_user.id)
+        except ErroRelatorio as e:
+            return jsonify({"erro": str(e)}), 400
+        # Pronto (cache) = 200 com o resultado; senão 202 e o cliente consulta url_status
+        if execucao.status == CONCLUIDO:
+            return jsonify(_execucao_resposta(execucao, incluir_resultado=True))
+        return jsonify(_execucao_resposta(execucao)), 202, {"Retry-After": "1"}
+
+    @app.route('/api/relatorios/execucoes/<execucao_id>')
+    @login_required
+    def status_relatorio(execucao_id):
+        execucao = db.session.get(RelatorioExecucao, execucao_id)
+        if execucao is None:
+            return jsonify({"erro": "Execução não encontrada"}), 404
+        return jsonify(_execucao_resposta(execucao, incluir_resultado=True))
+
+    @app.route('/relatorios/execucoes/<execucao_id>.<formato>')
+    @login_required
+    def download_relatorio(execucao_id, formato):
+        execucao = db.session.get(RelatorioExecucao, execucao_id)
+        if execucao is None or formato not in FORMATOS_RELATORIO:
+            return jsonify({"erro": "Execução não encontrada"}), 404
+        if execucao.status != CONCLUIDO:
+            return jsonify({"erro": f"Relatório ainda não concluído (status: {execucao.status})"}), 409
+        try:
+            conteudo, mimetype, nome = arquivo_relatorio(execucao, formato)
+        except ErroRelatorio as e:
+            return jsonify({"erro": str(e)}), 400
+        return app.response_class(conteudo, mimetype=mimetype,
+                                  headers={"Content-Disposition": f"attachment; filename={nome}"})
     
 
 
@@ -0,0 +1,201 @@
+# snapshot_parquet.py
+# ----------------------------------------------------------------
+# Snapshot colunar (Parquet) do histórico de produção × consumo para leitores
+# analíticos (DashEspumas.py, análises offline), fora do banco transacional.
+#
+#   <destino>/mes=AAAA-MM/dados.parquet   uma partição por mês de produção
+#   <destino>/_manifesto.json             marca d'água, cancelamentos, partições
+#
+# Incremental: só lê do SQLite as produções com id acima da marca d'água e o
+# conjunto de canceladas; reescreve apenas os meses tocados (novas produções
+# ou mudanças de status). Mudança de esquema ou --completo refaz tudo.
+#
+# Uso:  python snapshot_parquet.py [--banco instance/producao.db]
+#                                  [--destino instance/snapshots] [--completo]
+#       flask exportar-snapshot [--completo]
+# ----------------------------------------------------------------
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from carga_producoes import SQL_PRODUCOES, SQL_CANCELADAS, converter_tipos
+
+MANIFESTO = "_manifesto.json"
+ARQUIVO_PARTICAO = "dados.parquet"
+SEM_DATA = "sem-data"
+
+COLUNAS = ["producao_id_interno", "bloco", "data_producao", "tipo_espuma", "cor", "altura",
+           "conformidade", "observacoes", "status", "componente", "quantidade_usada"]
+
+# dtypes gravados no Parquet (datas e números já convertidos para o leitor)
+DTYPES = {
+    "producao_id_interno": "int64",
+    "bloco": "string",
+    "tipo_espuma": "string",
+    "cor": "string",
+    "altura": "float64",
+    "conformidade": "string",
+    "observacoes": "string",
+    "status": "string",
+    "componente": "string",
+    "quantidade_usada": "float64",
+}
+
+
+def _mes(datas):
+    return datas.dt.strftime("%Y-%m").fillna(SEM_DATA)
+
+
+def _caminho_particao(destino, mes):
+    return os.path.join(destino, f"mes={mes}", ARQUIVO_PARTICAO)
+
+
+def _gravar_atomico(df, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    df.to_parquet(temporario, engine="pyarrow", index=False)
+    os.replace(temporario, caminho)
+
+
+def ler_manifesto(destino):
+    try:
+        with open(os.path.join(destino, MANIFESTO), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _gravar_manifesto(destino, manifesto):
+    caminho = os.path.join(destino, MANIFESTO)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def _manifesto_vazio(versao_esquema):
+    return {"versao_esquema": versao_esquema, "marca_dagua": 0, "canceladas": [], "particoes": {}}
+
+
+# ----------------------------------------------------------------
+# Exportação
+# ----------------------------------------------------------------
+def exportar_snapshot(caminho_banco, destino, completo=False):
+    """
+    Atualiza o snapshot em `destino` a partir do banco. Retorna um resumo
+    {'tipo', 'linhas_novas', 'meses_reescritos'}.
+    """
+    os.makedirs(destino, exist_ok=True)
+    conn = sqlite3.connect(f"file:{caminho_banco}?mode=ro", uri=True)
+    try:
+        versao_esquema = conn.execute("PRAGMA schema_version").fetchone()[0]
+        maior_id = conn.execute("SELECT MAX(id) FROM producao").fetchone()[0] or 0
+
+        manifesto = ler_manifesto(destino)
+        recarga = (completo or manifesto is None
+                   or manifesto["versao_esquema"] != versao_esquema
+                   or maior_id < manifesto["marca_dagua"])
+        if recarga:
+            for nome in os.listdir(destino):
+                if nome.startswith("mes="):
+                    shutil.rmtree(os.path.join(destino, nome))
+            manifesto = _manifesto_vazio(versao_esquema)
+
+        novas = converter_tipos(pd.read_sql_query(SQL_PRODUCOES, conn, params=(manifesto["marca_dagua"],)))
+        canceladas = {r[0] for r in conn.execute(SQL_CANCELADAS)}
+        mudaram = canceladas.symmetric_difference(manifesto["canceladas"])
+
+        # Meses das produções que mudaram de status (já estão no snapshot)
+        meses_status = set()
+        if mudaram:
+            marcadores = ",".join("?" * len(mudaram))
+            datas = pd.read_sql_query(
+                f"SELECT data_producao FROM producao WHERE id IN ({marcadores})", conn, params=list(mudaram))
+            meses_status = set(_mes(pd.to_datetime(datas["data_producao"], errors="coerce")))
+    finally:
+        conn.close()
+
+    novas = novas.astype(DTYPES)
+    novas["mes"] = _mes(novas["data_producao"])
+    meses = set(novas["mes"]) | meses_status
+
+    for mes in sorted(meses):
+        caminho = _caminho_particao(destino, mes)
+        partes = [novas[novas["mes"] == mes].drop(columns="mes")]
+        if os.path.exists(caminho):
+            partes.insert(0, pd.read_parquet(caminho))
+        particao = pd.concat(partes, ignore_index=True)
+        particao["status"] = particao["status"].where(
+            ~particao["producao_id_interno"].isin(canceladas),
+            "C"
+        ).mask(
+            particao["producao_id_interno"].isin(mudaram - canceladas),
+            "A"
+        )
+        _gravar_atomico(particao, caminho)
+        manifesto["particoes"][mes] = {"linhas": len(particao), "atualizado_em": datetime.now().isoformat()}
+
+    if not novas.empty:
+        manifesto["marca_dagua"] = int(novas["producao_id_interno"].max())
+    manifesto["canceladas"] = sorted(canceladas)
+    manifesto["gerado_em"] = datetime.now().isoformat()
+    _gravar_manifesto(destino, manifesto)
+
+    return {
+        "tipo": "completa" if recarga else "incremental",
+        "linhas_novas": len(novas),
+        "meses_reescritos": sorted(meses),
+    }
+
+
+# ----------------------------------------------------------------
+# Leitura
+# ----------------------------------------------------------------
+def particoes(destino):
+    """(mes, caminho, mtime) de cada partição existente, em ordem de mês."""
+    manifesto = ler_manifesto(destino) or {"particoes": {}}
+    resultado = []
+    for mes in sorted(manifesto["particoes"]):
+        caminho = _caminho_particao(destino, mes)
+        if os.path.exists(caminho):
+            resultado.append((mes, caminho, os.path.getmtime(caminho)))
+    return resultado
+
+
+def ler_particao(caminho):
+    return pd.read_parquet(caminho, engine="pyarrow")
+
+
+def ler_snapshot(destino, mes_inicio=None, mes_fim=None):
+    """
+    DataFrame com o histórico do snapshot (mesmas colunas da carga do banco).
+    mes_inicio/mes_fim ('AAAA-MM') podam partições sem abri-las.
+    """
+    frames = [
+        ler_particao(caminho)
+        for mes, caminho, _ in particoes(destino)
+        if (mes_inicio is None or mes >= mes_inicio) and (mes_fim is None or mes <= mes_fim)
+    ]
+    if not frames:
+        return converter_tipos(pd.DataFrame(columns=COLUNAS)).astype(DTYPES)
+    return pd.concat(frames, ignore_index=True)
+
+
+__all__ = ["exportar_snapshot", "ler_manifesto", "particoes", "ler_particao", "ler_snapshot", "DTYPES"]
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Exporta o histórico de produção para Parquet particionado por mês")
+    parser.add_argument("--banco", default=os.path.join(base_dir, "instance", "producao.db"))
+    parser.add_argument("--destino", default=os.path.join(base_dir, "instance", "snapshots"))
+    parser.add_argument("--completo", action="store_true", help="refaz todas as partições")
+    args = parser.parse_args()
+
+    resumo = exportar_snapshot(args.banco, args.destino, completo=args.completo)
+    print(f"✅ Snapshot {resumo['tipo']}: {resumo['linhas_novas']} linha(s) nova(s), "
+          f"{len(resumo['meses_reescritos'])} mês(es) reescrito(s) em {args.destino}")
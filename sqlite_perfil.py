@@ -0,0 +1,63 @@
+# sqlite_perfil.py
+# -----------------------
+# Perfil de produção do SQLite: PRAGMAs aplicados em TODA conexão aberta
+# pelo engine (evento "connect" do SQLAlchemy). Reduz os erros
+# "database is locked" com vários workers do gunicorn + o dashboard Streamlit.
+# -----------------------
+import os
+from sqlalchemy import event
+
+# Valores padrão (podem ser sobrescritos por variáveis de ambiente ou app.config)
+PERFIL_PADRAO = {
+    "journal_mode": "WAL",        # leitores não bloqueiam o escritor
+    "synchronous": "NORMAL",      # seguro com WAL, bem menos fsync
+    "busy_timeout": 5000,         # ms esperando o lock antes de "database is locked"
+    "mmap_size": 268435456,       # 256 MB de leitura via mmap
+    "cache_size": -64000,         # negativo = KiB (≈ 64 MB por conexão)
+    "temp_store": "MEMORY",       # tabelas temporárias / ordenações em memória
+}
+
+
+def perfil_do_ambiente(base=None):
+    """
+    Monta o perfil a partir do padrão + variáveis SQLITE_<PRAGMA>.
+    Retorna None se SQLITE_PERFIL=0 (desliga o perfil).
+    """
+    if os.environ.get("SQLITE_PERFIL", "1") == "0":
+        return None
+
+    perfil = dict(PERFIL_PADRAO if base is None else base)
+    for pragma, valor in perfil.items():
+        valor_env = os.environ.get(f"SQLITE_{pragma.upper()}")
+        if valor_env is not None:
+            perfil[pragma] = int(valor_env) if isinstance(valor, int) else valor_env
+    return perfil
+
+
+def aplicar_perfil_sqlite(engine, perfil=None):
+    """
+    Registra o listener que executa os PRAGMAs em cada nova conexão do engine.
+    Ignora engines que não são SQLite. Retorna o perfil aplicado.
+    """
+    if engine.dialect.name != "sqlite":
+        return None
+
+    perfil = PERFIL_PADRAO if perfil is None else perfil
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # busy_timeout primeiro: a troca de journal_mode também precisa de lock
+            if "busy_timeout" in perfil:
+                cursor.execute(f"PRAGMA busy_timeout={int(perfil['busy_timeout'])}")
+            for pragma, valor in perfil.items():
+                if pragma != "busy_timeout":
+                    cursor.execute(f"PRAGMA {pragma}={valor}")
+        finally:
+            cursor.close()
+
+    return perfil
+
+
+__all__ = ["PERFIL_PADRAO", "perfil_do_ambiente", "aplicar_perfil_sqlite"]
@@ -0,0 +1,62 @@
+# tendencia_consumo.py
+# -----------------------
+# Agregações de consumo usadas pelo DashEspumas.py, 100% vetorizadas:
+#   - início do período (dia/semana/mês) por aritmética de datetime64,
+#     sem .apply por linha
+#   - agrupamento pela data de início (inteiro) e pelos códigos das
+#     categóricas (observed=True), não por strings formatadas
+#   - ordenação cronológica; o rótulo dd/mm/aaaa só é formatado no
+#     resultado agregado (poucas linhas)
+# -----------------------
+import pandas as pd
+
+AGRUPAMENTOS = ("Dia", "Semana", "Mês")
+FORMATO_ROTULO = "%d/%m/%Y"
+
+
+def inicio_periodo(datas, agrupamento):
+    """
+    Data de início do período de cada linha (datetime64, vetorizado).
+    Semana começa na segunda-feira, como dt.to_period("W").start_time.
+    """
+    dia = datas.dt.normalize()
+    if agrupamento == "Dia":
+        return dia
+    if agrupamento == "Semana":
+        return dia - pd.to_timedelta(dia.dt.dayofweek, unit="D")
+    if agrupamento == "Mês":
+        return dia - pd.to_timedelta(dia.dt.day - 1, unit="D")
+    raise ValueError(f"Agrupamento inválido: {agrupamento}")
+
+
+def _com_rotulo(df):
+    df["periodo_str"] = df["periodo"].dt.strftime(FORMATO_ROTULO)
+    return df
+
+
+def consumo_por_componente(df):
+    """Consumo total por componente, do maior para o menor."""
+    return (
+        df.groupby("componente", observed=True)["quantidade_usada"].sum()
+        .reset_index()
+        .sort_values("quantidade_usada", ascending=False)
+    )
+
+
+def consumo_por_periodo(df, agrupamento):
+    """
+    (total, detalhado): consumo por período e por período × componente,
+    em ordem cronológica, com coluna `periodo` (datetime) e `periodo_str`.
+    """
+    periodo = inicio_periodo(df["data_producao"], agrupamento).rename("periodo")
+    quantidade = df["quantidade_usada"]
+
+    total = quantidade.groupby(periodo, sort=True).sum().reset_index()
+    detalhado = (
+        quantidade.groupby([periodo, df["componente"]], sort=True, observed=True).sum()
+        .reset_index()
+    )
+    return _com_rotulo(total), _com_rotulo(detalhado)
+
+
+__all__ = ["AGRUPAMENTOS", "inicio_periodo", "consumo_por_componente", "consumo_por_periodo"]
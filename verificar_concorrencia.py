@@ -0,0 +1,135 @@
+# verificar_concorrencia.py
+# ----------------------------------------------------------------
+# Teste de concorrência do lançamento de produção: várias threads postam
+# blocos ao mesmo tempo em /cadastro_producao (cada uma com seu test client
+# e sua conexão) pedindo mais componente do que há em estoque.
+# Falha (exit 1) se:
+#   - algum saldo ficar negativo (venda a descoberto)
+#   - o saldo não bater com as movimentações (estoque inicial - saídas)
+#   - forem aceitos mais ou menos blocos do que o estoque permite
+#   - alguma produção ficar sem todos os componentes/movimentações
+#   - alguma requisição der erro (HTTP 500 / "database is locked")
+# Reporta a vazão (lançamentos/s) alcançada.
+#
+# Uso:  python verificar_concorrencia.py [--threads 16] [--blocos 40]
+# ----------------------------------------------------------------
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "concorrencia.db")
+os.environ.setdefault("TAREFAS_WORKERS", "0")  # sem tarefas agendadas disputando o banco
+os.environ.setdefault("DASHBOARD_CACHE", "0")
+
+from app import app  # noqa: E402  (DB_PATH precisa estar definido antes)
+from models import (db, Componente, Estoque, Movimentacao, Producao, ComponenteProducao,  # noqa: E402
+                    FichaTecnica, FichaTecnicaComponente, TipoEspuma, Usuario)
+
+EMAIL, SENHA = "concorrencia@bonsono.com.br", "concorrencia"
+# componente: (estoque inicial, consumo por bloco)
+COMPONENTES = {"POLIOL": (1000.0, 5.0), "ÁGUA": (800.0, 2.0), "TDI": (900.0, 3.0)}
+
+
+def popular_banco():
+    usuario = Usuario(nome="Concorrência", email=EMAIL)
+    usuario.set_senha(SENHA)
+    db.session.add(usuario)
+
+    componentes = {nome: Componente(nome=nome, ativo=True) for nome in COMPONENTES}
+    db.session.add_all(componentes.values())
+    tipo = TipoEspuma(nome="D20")
+    db.session.add(tipo)
+    db.session.flush()
+
+    ficha = FichaTecnica(tipo_espuma_id=tipo.id, descricao="Ficha D20")
+    db.session.add(ficha)
+    db.session.flush()
+    for nome, componente in componentes.items():
+        db.session.add(Estoque(componente_id=componente.id, quantidade=COMPONENTES[nome][0]))
+        db.session.add(FichaTecnicaComponente(ficha_tecnica_id=ficha.id, componente_id=componente.id))
+    db.session.commit()
+    return tipo.id, {nome: c.id for nome, c in componentes.items()}
+
+
+def postar(tipo_id, ids, prefixo, blocos, inicio, erros):
+    client = app.test_client()
+    client.post("/login", data={"email": EMAIL, "senha": SENHA})
+    inicio.wait()
+    for i in range(blocos):
+        formulario = {"producao_id": f"{prefixo}-{i:04d}", "tipo_espuma": tipo_id, "cor": "BRANCA",
+                      "altura": 60, "conformidade": "Conforme"}
+        formulario.update({f"componente_{ids[nome]}": consumo for nome, (_, consumo) in COMPONENTES.items()})
+        try:
+            resposta = client.post("/cadastro_producao", data=formulario)
+            if resposta.status_code >= 500:
+                erros.append(f"{prefixo}-{i}: HTTP {resposta.status_code}")
+        except Exception as e:  # noqa: BLE001  (qualquer exceção é falha do teste)
+            erros.append(f"{prefixo}-{i}: {e}")
+
+
+def verificar(threads, blocos):
+    with app.app_context():
+        tipo_id, ids = popular_banco()
+
+    erros = []
+    inicio = threading.Barrier(threads + 1)
+    trabalhadores = [threading.Thread(target=postar, args=(tipo_id, ids, f"T{t:02d}", blocos, inicio, erros))
+                     for t in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    inicio.wait()
+    t0 = time.perf_counter()
+    for t in trabalhadores:
+        t.join()
+    duracao = time.perf_counter() - t0
+
+    falhas = [f"requisição com erro: {e}" for e in erros[:5]]
+    with app.app_context():
+        aceitas = Producao.query.count()
+        esperadas = min(threads * blocos, *(int(estoque // consumo) for estoque, consumo in COMPONENTES.values()))
+        if aceitas != esperadas:
+            falhas.append(f"{aceitas} bloco(s) aceito(s), o estoque permite exatamente {esperadas}")
+
+        saldos = dict(db.session.query(Estoque.componente_id, Estoque.quantidade))
+        saidas = dict(db.session.query(Movimentacao.componente_id, db.func.sum(Movimentacao.quantidade))
+                      .filter(Movimentacao.tipo == "saida").group_by(Movimentacao.componente_id))
+        for nome, (estoque, consumo) in COMPONENTES.items():
+            cid = ids[nome]
+            if saldos[cid] < 0:
+                falhas.append(f"saldo negativo de {nome}: {saldos[cid]}")
+            if abs(saldos[cid] - (estoque - saidas.get(cid, 0))) > 1e-6:
+                falhas.append(f"saldo de {nome} ({saldos[cid]}) diverge das movimentações ({estoque - saidas.get(cid, 0)})")
+            if abs(saidas.get(cid, 0) - aceitas * consumo) > 1e-6:
+                falhas.append(f"saídas de {nome} ({saidas.get(cid, 0)}) ≠ blocos aceitos × consumo ({aceitas * consumo})")
+
+        incompletas = (db.session.query(Producao.id)
+                       .outerjoin(ComponenteProducao, ComponenteProducao.producao_id == Producao.id)
+                       .group_by(Producao.id)
+                       .having(db.func.count(ComponenteProducao.id) != len(COMPONENTES))
+                       .count())
+        if incompletas:
+            falhas.append(f"{incompletas} produção(ões) sem todos os componentes")
+
+    total = threads * blocos
+    print(f"🔧 {threads} thread(s) × {blocos} bloco(s) = {total} lançamento(s) em {duracao:.2f}s "
+          f"→ {total / duracao:.0f} lançamento(s)/s ({aceitas} aceito(s), {total - aceitas - len(erros)} recusado(s) por saldo)")
+    for nome in COMPONENTES:
+        print(f"   {nome:<7} saldo final {saldos[ids[nome]]:8.2f}")
+    return falhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lançamentos concorrentes de produção: sem venda a descoberto")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--blocos", type=int, default=40, help="blocos postados por thread")
+    args = parser.parse_args()
+
+    falhas = verificar(args.threads, args.blocos)
+    if falhas:
+        for falha in falhas:
+            print(f"❌ {falha}")
+        sys.exit(1)
+    print("\n✅ Nenhuma venda a descoberto; saldos batem com as movimentações")
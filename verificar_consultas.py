@@ -0,0 +1,132 @@
+# verificar_consultas.py
+# ----------------------------------------------------------------
+# Regressão de N+1: sobe o app contra um banco temporário com dados de
+# exemplo, chama as rotas pelo test client do Flask e falha (exit 1) se
+# alguma rota disparar mais comandos SQL que o máximo permitido ou responder
+# com um status HTTP diferente do esperado.
+# Os máximos não dependem da quantidade de linhas: um lazy load por linha
+# estoura o limite na hora. O diagnóstico de SQL (diagnostico_sql.py) também
+# fica ligado: qualquer N+1 apontado por ele reprova a verificação.
+#
+# Uso:  python verificar_consultas.py
+# ----------------------------------------------------------------
+import os
+import sys
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "consultas.db")
+os.environ.setdefault("TAREFAS_WORKERS", "0")  # sem tarefas agendadas disputando o banco
+
+from app import app  # noqa: E402  (DB_PATH precisa estar definido antes)
+from models import (db, Componente, Estoque, Producao, ComponenteProducao, FichaTecnica,  # noqa: E402
+                    FichaTecnicaComponente, TipoEspuma, Usuario)
+from contador_sql import assert_max_consultas  # noqa: E402
+from diagnostico_sql import instalar_diagnostico_sql  # noqa: E402
+
+EMAIL, SENHA = "verificacao@bonsono.com.br", "verificacao"
+QTD_PRODUCOES = 30
+LAUDO = {"peso_kg": "13,8", "largura_m": "1,9", "comprimento_m": "1,3", "altura_m": "0,2",
+         "densidade_nominal": "D28", "data": "2025-06-01"}
+
+
+def popular_banco():
+    """Dados de exemplo: 3 tipos/fichas, 4 componentes, QTD_PRODUCOES produções."""
+    usuario = Usuario(nome="Verificação", email=EMAIL)
+    usuario.set_senha(SENHA)
+    db.session.add(usuario)
+
+    componentes = [Componente(nome=n, ativo=True) for n in ("POLIOL", "ÁGUA", "TDI", "SILICONE")]
+    db.session.add_all(componentes)
+    db.session.flush()
+    for c in componentes:
+        db.session.add(Estoque(componente_id=c.id, quantidade=1000))
+
+    for nome in ("D20", "D28", "D33"):
+        tipo = TipoEspuma(nome=nome)
+        db.session.add(tipo)
+        db.session.flush()
+        ficha = FichaTecnica(tipo_espuma_id=tipo.id, descricao=f"Ficha {nome}")
+        db.session.add(ficha)
+        db.session.flush()
+        for c in componentes:
+            db.session.add(FichaTecnicaComponente(ficha_tecnica_id=ficha.id, componente_id=c.id))
+
+    db.session.flush()
+    for i in range(QTD_PRODUCOES):
+        producao = Producao(producao_id=f"V{i:04d}", tipo_espuma="D28", cor="BRANCA",
+                            conformidade="Conforme", altura=100, usuario_id=usuario.id, status="A")
+        db.session.add(producao)
+        db.session.flush()
+        for c in componentes:
+            db.session.add(ComponenteProducao(producao_id=producao.id, componente_id=c.id, quantidade_usada=1))
+
+    db.session.commit()
+    return producao.id
+
+
+def verificar():
+    with app.app_context():
+        ultima_producao = popular_banco()
+        ficha = FichaTecnica.query.order_by(FichaTecnica.id).first()
+        ficha_id, tipo_id = ficha.id, ficha.tipo_espuma_id
+        diagnostico = app.extensions.get("diagnostico_sql") or instalar_diagnostico_sql(
+            app, db.engine, os.path.join(os.path.dirname(os.environ["DB_PATH"]), "sql_diagnostico.log"))
+
+    client = app.test_client()
+    client.post("/login", data={"email": EMAIL, "senha": SENHA})
+
+    # (descrição, máximo de comandos SQL, status HTTP esperado, chamada); as
+    # rotas que gravam contam +1 do incremento de versao_dados no mesmo commit,
+    # e o /dashboard sem cache lê a versão antes e depois do cálculo
+    casos = [
+        ("GET /controle-producao", 12, 200, lambda: client.get("/controle-producao")),
+        ("GET /api/producoes", 4, 200, lambda: client.get("/api/producoes")),
+        ("GET /ComponentesProducao/<id>", 6, 200, lambda: client.get(f"/ComponentesProducao/{ultima_producao}")),
+        ("GET /relatorios", 4, 200, lambda: client.get("/relatorios")),
+        ("GET /dashboard", 5, 200, lambda: client.get("/dashboard?data_inicio=2025-01-01&data_fim=2025-12-31")),
+        ("GET /componentes_por_tipo/<id>", 3, 200, lambda: client.get(f"/componentes_por_tipo/{tipo_id}")),
+        ("GET /get_componentes_ficha/<id>", 4, 200, lambda: client.get(f"/get_componentes_ficha/{tipo_id}")),
+        ("GET /ficha-tecnica/editar/<id>", 6, 200, lambda: client.get(f"/ficha-tecnica/editar/{ficha_id}")),
+        ("POST /api/ia-analise-producao", 3, 200, lambda: client.post("/api/ia-analise-producao", json={
+            "tipo_espuma_id": 2, "altura": 100, "componentes": {"componente_1": 1.2, "componente_2": 0.9}})),
+        # medidas nan/inf são rejeitadas por laudo: o lote grava só o válido (201)
+        # e um lote só com medidas não finitas não grava nada (400)
+        ("POST /api/laudos/lote (nan/inf)", 6, 201, lambda: client.post("/api/laudos/lote", json={"laudos": [
+            {**LAUDO, "numero_bloco": "V0001"}, {**LAUDO, "peso_kg": "nan"},
+            {**LAUDO, "largura_m": "inf"}, {**LAUDO, "altura_m": "1e309"}]})),
+        ("POST /api/laudos/lote (só inf)", 2, 400, lambda: client.post("/api/laudos/lote", json={"laudos": [
+            {**LAUDO, "peso_kg": "Infinity"}, {**LAUDO, "comprimento_m": "-inf"}]})),
+        ("POST /cadastro_producao", 14, 302, lambda: client.post("/cadastro_producao", data={
+            "producao_id": "V9999", "tipo_espuma": 2, "cor": "BRANCA", "altura": 100, "conformidade": "Conforme",
+            "componente_1": 1.2, "componente_2": 0.9, "componente_3": 1.0, "componente_4": 0.1})),
+        ("POST /producao/<id>/cancelar", 14, 302, lambda: client.post(f"/producao/{ultima_producao}/cancelar")),
+    ]
+
+    falhas = 0
+    with app.app_context():
+        engine = db.engine
+    for descricao, maximo, status, chamada in casos:
+        try:
+            resposta, contador = assert_max_consultas(engine, maximo, chamada)
+        except AssertionError as e:
+            falhas += 1
+            print(f"❌ {descricao}: {e}")
+            continue
+        if resposta.status_code != status:
+            falhas += 1
+            print(f"❌ {descricao}: HTTP {resposta.status_code} (esperado {status})")
+            continue
+        print(f"✅ {descricao}: {contador.total} comando(s) (máximo {maximo}) → HTTP {resposta.status_code}")
+
+    if diagnostico.n_mais_1:
+        falhas += 1
+        print(f"❌ {diagnostico.n_mais_1} padrão(ões) N+1 — detalhes em {diagnostico.logger.handlers[0].baseFilename}")
+    return falhas
+
+
+if __name__ == "__main__":
+    falhas = verificar()
+    if falhas:
+        print(f"\n❌ {falhas} rota(s) acima do limite de consultas")
+        sys.exit(1)
+    print("\n✅ Todas as rotas dentro do limite de consultas")
@@ -0,0 +1,116 @@
+# verificar_indices.py
+# ----------------------------------------------------------------
+# Regressão de plano de consulta: roda EXPLAIN QUERY PLAN nas consultas
+# quentes (dashboard, IA, estoque, movimentações) contra um banco temporário
+# criado a partir de models.py e falha (exit 1) se alguma cair em SCAN.
+#
+# Uso:  python verificar_indices.py
+# ----------------------------------------------------------------
+import os
+import sys
+import tempfile
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import func, update
+from sqlalchemy.dialects import sqlite
+
+from models import (db, Producao, ComponenteProducao, Movimentacao, Estoque, ProducaoDiaria, FrequenciaDefeito, Laudo,
+                    RelatorioExecucao, Tarefa)
+
+INICIO = date(2025, 1, 1)
+FIM = date(2025, 1, 31)
+
+
+def consultas_quentes():
+    """(nome, statement) das consultas que precisam usar índice."""
+    def periodo(q):
+        return q.filter(Producao.status != "C",
+                        Producao.data_producao >= INICIO,
+                        Producao.data_producao <= FIM)
+
+    return [
+        ("dashboard: produções do período",
+         periodo(db.session.query(Producao)).order_by(Producao.data_producao)),
+        ("dashboard: total de componentes",
+         periodo(db.session.query(func.sum(ComponenteProducao.quantidade_usada)).join(Producao))),
+        ("dashboard: histórico diário",
+         periodo(db.session.query(Producao.data_producao, func.count(Producao.id)))
+         .group_by(Producao.data_producao)),
+        ("dashboard: produção por tipo",
+         periodo(db.session.query(Producao.tipo_espuma, func.count(Producao.id)))
+         .group_by(Producao.tipo_espuma)),
+        ("dashboard: componentes usados",
+         periodo(db.session.query(ComponenteProducao.componente_id,
+                                  func.sum(ComponenteProducao.quantidade_usada)).join(Producao))
+         .group_by(ComponenteProducao.componente_id)),
+        ("dashboard: rollup diário do período",
+         db.session.query(ProducaoDiaria.data, ProducaoDiaria.tipo_espuma, ProducaoDiaria.quantidade_producoes)
+         .filter(ProducaoDiaria.componente_id == 0,
+                 ProducaoDiaria.data >= INICIO, ProducaoDiaria.data <= FIM)
+         .order_by(ProducaoDiaria.data)),
+        ("ia: histórico por tipo de espuma",
+         Producao.query.filter_by(tipo_espuma="D28").order_by(Producao.data_producao.desc()).limit(50)),
+        ("componentes de uma produção",
+         ComponenteProducao.query.filter_by(producao_id=1)),
+        ("movimentações de um componente",
+         Movimentacao.query.filter_by(componente_id=1).order_by(Movimentacao.id.desc())),
+        ("movimentações de uma produção",
+         Movimentacao.query.filter_by(producao_id=1)),
+        ("estoque por componente",
+         Estoque.query.filter_by(componente_id=1)),
+        ("análise preditiva: frequências de (produto, grupo)",
+         db.session.query(FrequenciaDefeito.defeito, FrequenciaDefeito.quantidade)
+         .filter(FrequenciaDefeito.produto == "COLCHÃO", FrequenciaDefeito.grupo == "SUL")),
+        ("laudos: deriva de densidade por tipo e dia",
+         db.session.query(Laudo.data, func.avg(Laudo.densidade))
+         .filter(Laudo.tipo_espuma == "D33", Laudo.densidade.isnot(None),
+                 Laudo.data >= INICIO, Laudo.data <= FIM)
+         .group_by(Laudo.data)),
+        ("laudos de um bloco",
+         Laudo.query.filter_by(numero_bloco="62").order_by(Laudo.data.desc())),
+        ("relatórios: execução reaproveitável (chave + versão dos dados)",
+         RelatorioExecucao.query.filter(RelatorioExecucao.chave == "0" * 64, RelatorioExecucao.versao_dados == 3)),
+        ("fila de tarefas: próxima pendente",
+         db.session.query(Tarefa.id).filter(Tarefa.status == "pendente", Tarefa.agendada_para <= FIM)
+         .order_by(Tarefa.agendada_para, Tarefa.id).limit(1)),
+        ("razão: delta de estoque",
+         update(Estoque).where(Estoque.componente_id == 1).values(quantidade=Estoque.quantidade + 1)),
+    ]
+
+
+def plano(statement):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN de um statement/query ORM."""
+    if hasattr(statement, "statement"):
+        statement = statement.statement
+    sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    linhas = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall()
+    return [linha[-1] for linha in linhas]
+
+
+def verificar():
+    falhas = 0
+    for nome, statement in consultas_quentes():
+        detalhes = plano(statement)
+        scans = [d for d in detalhes if d.startswith("SCAN ")]
+        status = "❌" if scans else "✅"
+        print(f"{status} {nome}")
+        for d in detalhes:
+            print(f"     {d}")
+        falhas += bool(scans)
+    return falhas
+
+
+if __name__ == "__main__":
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plano.db')}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        falhas = verificar()
+
+    if falhas:
+        print(f"\n❌ {falhas} consulta(s) sem índice (SCAN)")
+        sys.exit(1)
+    print("\n✅ Todas as consultas quentes usam índice")
@@ -0,0 +1,80 @@
+# versao_dados.py
+# -----------------------
+# Versão dos dados de negócio, guardada no próprio banco (tabela versao_dados):
+#   - todo commit que grava em tabelas de negócio (produção, estoque,
+#     laudos, garantia, ...) incrementa o contador NA MESMA TRANSAÇÃO, então
+#     a versão nunca fica atrás dos dados, com ou sem o cache do dashboard
+#   - detectado por eventos da sessão: objetos novos/alterados/removidos e
+#     INSERT/UPDATE/DELETE executados pela sessão (db.session.execute)
+#   - tabelas de controle (relatórios, tarefas, o próprio contador) não contam
+# SQL textual (text(...)) não é detectado: junto dele deve haver alguma
+# alteração ORM na mesma transação, ou chame marcar_alteracao(session).
+# -----------------------
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, VersaoDados
+
+TABELAS_IGNORADAS = frozenset({"relatorio_execucao", "tarefa", "versao_dados", "alembic_version"})
+CHAVE_ALTERADO = "versao_dados_alterado"
+
+
+def _tabela_de_negocio(nome):
+    return nome not in TABELAS_IGNORADAS
+
+
+def marcar_alteracao(session):
+    """Faz o próximo commit da sessão incrementar a versão."""
+    session.info[CHAVE_ALTERADO] = True
+
+
+def _ao_executar(estado):
+    """do_orm_execute: INSERT/UPDATE/DELETE em tabela de negócio marca a sessão."""
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return
+    tabela = getattr(estado.statement, "table", None)
+    if tabela is not None and _tabela_de_negocio(tabela.name):
+        marcar_alteracao(estado.session)
+
+
+def _objetos_alterados(session):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tabela = getattr(obj, "__table__", None)
+        if tabela is not None and _tabela_de_negocio(tabela.name):
+            return True
+    return False
+
+
+def _antes_do_flush(session, contexto, instancias):
+    if _objetos_alterados(session):
+        marcar_alteracao(session)
+
+
+def _antes_do_commit(session):
+    # Objetos pendentes ainda não passaram pelo flush neste ponto
+    if session.info.pop(CHAVE_ALTERADO, False) or _objetos_alterados(session):
+        stmt = sqlite_insert(VersaoDados).values(id=1, valor=1)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[VersaoDados.id], set_={"valor": VersaoDados.valor + 1}
+        ))
+        session.info.pop(CHAVE_ALTERADO, None)
+
+
+def _depois_do_rollback(session):
+    session.info.pop(CHAVE_ALTERADO, None)
+
+
+def instalar_versao_dados(session=db.session):
+    """Registra os eventos na sessão (idempotente)."""
+    for nome, funcao in (("do_orm_execute", _ao_executar), ("before_flush", _antes_do_flush),
+                         ("before_commit", _antes_do_commit), ("after_rollback", _depois_do_rollback)):
+        if not event.contains(session, nome, funcao):
+            event.listen(session, nome, funcao)
+
+
+def versao_atual():
+    """Versão atual dos dados (0 antes da primeira alteração)."""
+    return db.session.execute(select(VersaoDados.valor).where(VersaoDados.id == 1)).scalar() or 0
+
+
+__all__ = ["TABELAS_IGNORADAS", "marcar_alteracao", "instalar_versao_dados", "versao_atual"]